@@ -17,7 +17,7 @@ def main():
     logger.info("Starting tweet collection process")
     
     # Create engine once for reuse
-    engine = db_utils.get_db_engine()
+    engine = db_utils.get_engine()
     
     total_stored = 0
     for tweet_batch in collect_llm_tweets(logger, max_tweets=2500, batch_size=10):
@@ -27,6 +27,8 @@ def main():
             logger.info(f"Total tweets stored so far: {total_stored}")
     
     logger.info(f"Tweet collection process completed. Total tweets stored: {total_stored}")
+    stats = db_utils.get_connection_stats()
+    logger.info(f"DB connections opened: {stats['opened']} (pool checkouts: {stats['checkouts']})")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -30,7 +30,7 @@ def main():
         logger.info(f"Collection date range: {date_info}")
     
     # Create engine once for reuse
-    engine = db_utils.get_db_engine()
+    engine = db_utils.get_engine()
     
     total_posts_stored = 0
     total_comments_stored = 0
@@ -65,6 +65,8 @@ def main():
         logger.info(f"Completed r/{subreddit}. Total so far: {total_posts_stored} posts, {total_comments_stored} comments")
     
     logger.info(f"Reddit collection process completed. Total stored: {total_posts_stored} posts, {total_comments_stored} comments")
+    stats = db_utils.get_connection_stats()
+    logger.info(f"DB connections opened: {stats['opened']} (pool checkouts: {stats['checkouts']})")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -27,10 +27,10 @@ def main():
     arxiv_codes = sorted(arxiv_codes)[::-1]
     # arxiv_codes = ["2404.05961"]
 
+    notes_map = paper_db.get_extended_notes(arxiv_codes, expected_tokens=3000)
+
     for arxiv_code in tqdm(arxiv_codes):
-        paper_notes = paper_db.get_extended_notes(
-            arxiv_code=arxiv_code, expected_tokens=3000
-        )
+        paper_notes = notes_map.get(arxiv_code)
         paper_title = title_map[arxiv_code]
 
         ## Convert notes to Markdown format and store.
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+PROJECT_PATH = os.environ.get("PROJECT_PATH")
+sys.path.append(PROJECT_PATH)
+
+from utils.hnsw_index import HNSWIndex
+
+
+def load_vectors(args) -> np.ndarray:
+    """Load cached paper embeddings or generate a clustered synthetic set."""
+    if args.synthetic:
+        rng = np.random.default_rng(42)
+        centers = rng.standard_normal((100, args.dim))
+        vectors = centers[rng.integers(0, 100, args.n)] + 0.5 * rng.standard_normal((args.n, args.dim))
+        return vectors.astype(np.float32)
+    import utils.db.embedding_db as embedding_db
+
+    matrix, _ = embedding_db.load_cached_embedding_matrix(args.doc_type, args.embedding_type)
+    return np.asarray(matrix[: args.n], dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k of the HNSW index vs exact cosine search.")
+    parser.add_argument("--n", type=int, default=10_000)
+    parser.add_argument("--dim", type=int, default=4096, help="Synthetic dimension.")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef", type=int, nargs="+", default=[32, 64, 128])
+    parser.add_argument("--synthetic", action="store_true")
+    parser.add_argument("--embedding-type", default="nv")
+    parser.add_argument("--doc-type", default="recursive_summary")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [str(i) for i in range(len(vectors))]
+
+    start = time.perf_counter()
+    index = HNSWIndex(dimension=vectors.shape[1])
+    index.add_batch(vectors, ids)
+    print(f"Built index over {len(vectors)} vectors in {time.perf_counter() - start:.1f}s")
+
+    rng = np.random.default_rng(0)
+    query_rows = rng.choice(len(vectors), size=min(args.queries, len(vectors)), replace=False)
+    scores = vectors[query_rows] @ vectors.T
+    scores[np.arange(len(query_rows)), query_rows] = -np.inf
+    exact = np.argsort(-scores, axis=1)[:, : args.k]
+
+    print(f"{'ef':>5} {'recall@' + str(args.k):>10} {'ms/query':>10}")
+    for ef in args.ef:
+        hits = 0
+        start = time.perf_counter()
+        for row, truth in zip(query_rows, exact):
+            found, _ = index.search(vectors[row], args.k + 1, ef=ef)
+            found = [int(f) for f in found if int(f) != row][: args.k]
+            hits += len(set(found) & set(truth.tolist()))
+        elapsed = time.perf_counter() - start
+        print(f"{ef:>5} {hits / (len(query_rows) * args.k):>10.3f} {1000 * elapsed / len(query_rows):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import os
+import sys
+import time
+import argparse
+import resource
+import multiprocessing as mp
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+PROJECT_PATH = os.environ.get("PROJECT_PATH")
+sys.path.append(PROJECT_PATH)
+
+import utils.db.db_utils as db_utils
+import utils.db.embedding_db as embedding_db
+
+BENCH_DOC_TYPE = "bench_transport"
+EMBEDDING_TYPE = "nv"
+
+
+def load_text(queue: mp.Queue) -> None:
+    """Legacy path: fetch vectors as text and parse them into Python float lists."""
+    dimension = embedding_db.EMBEDDING_DIMENSIONS[EMBEDDING_TYPE]
+    start = time.perf_counter()
+    rows = db_utils.execute_read_query(
+        f"""SELECT arxiv_code, embedding::text FROM arxiv_embeddings_{dimension}
+            WHERE doc_type = :doc_type AND embedding_type = :embedding_type ORDER BY arxiv_code""",
+        {"doc_type": BENCH_DOC_TYPE, "embedding_type": EMBEDDING_TYPE},
+        as_dataframe=False,
+    )
+    embeddings = {code: [float(x) for x in emb.strip("[]").split(",")] for code, emb in rows}
+    matrix = np.array([embeddings[code] for code in embeddings])
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, matrix.shape))
+
+
+def load_binary(queue: mp.Queue) -> None:
+    """Binary path: vector_send() payloads decoded straight into a float32 matrix."""
+    start = time.perf_counter()
+    matrix, _ = embedding_db.load_embedding_matrix(None, BENCH_DOC_TYPE, EMBEDDING_TYPE)
+    elapsed = time.perf_counter() - start
+    queue.put((elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, matrix.shape))
+
+
+def run_isolated(target) -> tuple:
+    """Run a loader in a fresh process so peak RSS is measured independently."""
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=target, args=(queue,))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark text vs binary embedding transport.")
+    parser.add_argument("--rows", type=int, default=10_000)
+    args = parser.parse_args()
+
+    dimension = embedding_db.EMBEDDING_DIMENSIONS[EMBEDDING_TYPE]
+    rng = np.random.default_rng(42)
+    codes = [f"bench.{i:06d}" for i in range(args.rows)]
+
+    print(f"Seeding {args.rows}x{dimension} vectors...")
+    for i in range(0, args.rows, 1000):
+        batch = rng.standard_normal((len(codes[i:i + 1000]), dimension), dtype=np.float32)
+        embedding_db.store_embeddings_batch(codes[i:i + 1000], BENCH_DOC_TYPE, EMBEDDING_TYPE, batch)
+
+    try:
+        print(f"{'path':>8} {'seconds':>10} {'peak RSS (MB)':>15}")
+        for name, target in [("text", load_text), ("binary", load_binary)]:
+            elapsed, max_rss_kb, shape = run_isolated(target)
+            print(f"{name:>8} {elapsed:>10.2f} {max_rss_kb / 1024:>15,.0f}  {shape}")
+    finally:
+        db_utils.execute_write_query(
+            f"DELETE FROM arxiv_embeddings_{dimension} WHERE doc_type = :doc_type",
+            {"doc_type": BENCH_DOC_TYPE},
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import os
+import sys
+import argparse
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+PROJECT_PATH = os.environ.get("PROJECT_PATH")
+sys.path.append(PROJECT_PATH)
+
+import utils.db.embedding_db as embedding_db
+from utils.app_utils import query_config
+
+DEFAULT_QUERIES = [
+    "retrieval augmented generation for open-domain question answering",
+    "reinforcement learning from human feedback reward model overoptimization",
+    "mixture of experts routing and load balancing in large language models",
+    "chain-of-thought prompting improves multi-step arithmetic reasoning",
+    "hallucination detection in LLM generated summaries",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-leg latency of the hybrid (vector + full-text) search.")
+    parser.add_argument("--queries", nargs="+", default=DEFAULT_QUERIES)
+    parser.add_argument("--embedding-model", default="voyage")
+    parser.add_argument("--limit", type=int, default=30)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    timings = {"vector": [], "lexical": [], "fusion": []}
+    for _ in range(args.repeats):
+        for question in args.queries:
+            criteria = {"semantic_search_queries": [question], "limit": args.limit, "response_length": 300}
+            documents = embedding_db.hybrid_search(criteria, query_config, embedding_model=args.embedding_model)
+            for leg, seconds in documents.attrs["timings"].items():
+                timings[leg].append(1000 * seconds)
+
+    print(f"{'leg':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for leg, values in timings.items():
+        print(f"{leg:>8} {np.percentile(values, 50):>8.1f} {np.percentile(values, 95):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
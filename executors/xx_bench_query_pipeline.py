@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import argparse
+from unittest.mock import patch
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+PROJECT_PATH = os.environ.get("PROJECT_PATH")
+sys.path.append(PROJECT_PATH)
+
+import utils.app_utils as au
+import utils.pydantic_objects as po
+
+N_DOCUMENTS = 30
+
+
+def make_stubs(args):
+    """Sleep-based stand-ins for each LLM / DB stage with the given latencies."""
+
+    def decide(user_question, llm_model=None):
+        time.sleep(args.decide)
+        return po.QueryDecision(llm_query=True, other_query=False, comment_query=False)
+
+    def criteria(user_question, llm_model):
+        time.sleep(args.criteria)
+        return po.SearchCriteria(semantic_search_queries=["q1", "q2", "q3"])
+
+    def search(criteria_dict, config, embedding_model=None, include_notes=True):
+        time.sleep(args.search + (args.notes if include_notes else 0))
+        documents = pd.DataFrame({
+            "arxiv_code": [f"2401.{i:05d}" for i in range(N_DOCUMENTS)],
+            "title": "Title",
+            "published_date": pd.Timestamp("2024-01-01"),
+            "citations": 1,
+            "abstract": "Abstract",
+            "notes": "Notes" if include_notes else None,
+            "similarity_score": 0.8,
+        })
+        documents.attrs["timings"] = {}
+        return documents
+
+    def notes(arxiv_codes, expected_tokens):
+        time.sleep(args.notes)
+        return {code: "Notes" for code in arxiv_codes}
+
+    def rerank(user_question, documents, llm_model=None):
+        time.sleep(args.rerank)
+        return po.RerankedDocuments(documents=[
+            po.DocumentAnalysis(document_id=i, analysis="", selected=1.0) for i in range(10)
+        ])
+
+    def resolve(user_question, documents, response_length, llm_model, custom_instructions=None):
+        time.sleep(args.resolve)
+        return po.ResolveQuery(brainstorm="", sketch="", response="Answer.")
+
+    return decide, criteria, search, notes, rerank, resolve
+
+
+def sequential(question, stubs):
+    """The pipeline as it ran before: every stage blocks on the previous one."""
+    decide, criteria, search, notes, rerank, resolve = stubs
+    decide(question)
+    criteria(question, None)
+    documents = search({}, {}, include_notes=True)
+    rerank(question, documents)
+    resolve(question, documents, 500, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Wall-clock of the Q&A pipeline with stubbed stage latencies.")
+    parser.add_argument("--decide", type=float, default=0.8)
+    parser.add_argument("--criteria", type=float, default=2.0)
+    parser.add_argument("--search", type=float, default=0.3)
+    parser.add_argument("--notes", type=float, default=0.15)
+    parser.add_argument("--rerank", type=float, default=3.0)
+    parser.add_argument("--resolve", type=float, default=5.0)
+    args = parser.parse_args()
+
+    stubs = make_stubs(args)
+    decide, criteria, search, notes, rerank, resolve = stubs
+    question = "What are the latest techniques for KV cache compression?"
+
+    start = time.perf_counter()
+    sequential(question, stubs)
+    sequential_time = time.perf_counter() - start
+
+    with patch.object(au, "decide_query_action", decide), \
+         patch.object(au, "generate_query_object", criteria), \
+         patch.object(au.embedding_db, "hybrid_search", search), \
+         patch.object(au.embedding_db, "load_search_notes", notes), \
+         patch.object(au, "rerank_documents_new", rerank), \
+         patch.object(au, "resolve_query", resolve), \
+         patch.object(au, "add_links_to_text_blob", lambda x: x):
+        concurrent_times = {}
+        for speculative in (False, True):
+            with patch.object(au, "SPECULATIVE_QUERY_OBJECT", speculative):
+                start = time.perf_counter()
+                au.query_llmpedia_new(question, progress_callback=print, use_cache=False)
+                concurrent_times[speculative] = time.perf_counter() - start
+
+    print(f"Sequential: {sequential_time:.2f}s")
+    for speculative, concurrent_time in concurrent_times.items():
+        label = "Concurrent (speculative criteria)" if speculative else "Concurrent"
+        print(f"{label}: {concurrent_time:.2f}s ({1 - concurrent_time / sequential_time:.0%} faster)")
+    ## The speculative call is only wasted on non-LLM questions and cache hits, where it costs tokens, not time.
+    print(f"Speculative criteria saves {concurrent_times[False] - concurrent_times[True]:.2f}s per LLM question")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+PROJECT_PATH = os.environ.get("PROJECT_PATH")
+sys.path.append(PROJECT_PATH)
+
+from utils.similarity import cosine_top_k, normalize_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the blocked exact cosine top-k kernel.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 200_000])
+    parser.add_argument("--dim", type=int, default=4096)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--block-mb", type=int, default=256)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--baseline", action="store_true", help="Also time sklearn NearestNeighbors.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'docs':>8} {'dim':>6} {'kernel (s)':>11} {'docs/s':>10} {'sklearn (s)':>12}")
+    for n_docs in args.sizes:
+        vectors = normalize_rows(rng.standard_normal((n_docs, args.dim), dtype=np.float32))
+
+        start = time.perf_counter()
+        cosine_top_k(
+            vectors,
+            k=args.k,
+            exclude_self=True,
+            normalized=True,
+            max_block_bytes=args.block_mb * 1024 * 1024,
+            n_threads=args.threads,
+        )
+        elapsed = time.perf_counter() - start
+
+        baseline = "-"
+        if args.baseline:
+            from sklearn.neighbors import NearestNeighbors
+
+            start = time.perf_counter()
+            nbrs = NearestNeighbors(n_neighbors=args.k + 1, metric="euclidean").fit(vectors)
+            nbrs.kneighbors(vectors)
+            baseline = f"{time.perf_counter() - start:.1f}"
+
+        print(f"{n_docs:>8} {args.dim:>6} {elapsed:>11.1f} {n_docs / elapsed:>10,.0f} {baseline:>12}")
+        del vectors
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import random
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv()
+PROJECT_PATH = os.environ.get("PROJECT_PATH")
+sys.path.append(PROJECT_PATH)
+
+import utils.paper_utils as pu
+import utils.app_utils as au
+from utils.token_budget import count_tokens, fit_to_budget, split_sections
+
+## (step, model, old character cut, declared token budget)
+STEPS = [
+    ("d2_summarize_full", "claude-3-7-sonnet-20250219", 5000 * 4, 5000),
+    ("b0_download_paper", "gemini/gemini-2.5-pro-preview-05-06", 5000, 1500),
+]
+
+
+def back_matter_share(text: str, model: str) -> float:
+    """Fraction of a (trimmed) document's tokens that are references / appendices."""
+    total = count_tokens(text, model)
+    back = sum(count_tokens(t, model) for t, is_back in split_sections(text) if is_back)
+    return back / total if total else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokens per paper sent to LLMs: character cuts vs token budgets.")
+    parser.add_argument("--papers", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    codes = pu.list_s3_directories("arxiv-md")
+    random.Random(args.seed).shuffle(codes)
+    documents = []
+    for arxiv_code in codes:
+        content, ok = au.get_paper_markdown(arxiv_code)
+        if ok:
+            documents.append(content)
+        if len(documents) >= args.papers:
+            break
+    print(f"Loaded {len(documents)} papers")
+
+    print(f"{'step':<20} {'method':<8} {'tok/paper':>10} {'max tok':>8} {'over':>5} {'back%':>6}")
+    for step, model, char_limit, budget in STEPS:
+        for method, trim in [
+            ("chars", lambda d: d[:char_limit]),
+            ("tokens", lambda d: fit_to_budget(d, budget, llm_model=model)),
+        ]:
+            trimmed = [trim(d) for d in documents]
+            tokens = [count_tokens(t, model) for t in trimmed]
+            over = sum(t > budget for t in tokens)
+            back = sum(back_matter_share(t, model) for t in trimmed) / len(trimmed)
+            print(
+                f"{step:<20} {method:<8} {sum(tokens) / len(tokens):>10.0f} "
+                f"{max(tokens):>8} {over:>5} {100 * back:>5.1f}%"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+PROJECT_PATH = os.environ.get("PROJECT_PATH")
+sys.path.append(PROJECT_PATH)
+
+import utils.db.db_utils as db_utils
+
+BENCH_TABLE = "bench_upload_dataframe"
+
+
+def make_frame(n_rows: int) -> pd.DataFrame:
+    """Create a frame shaped like the similar_documents / topics uploads."""
+    rng = np.random.default_rng(42)
+    codes = [f"2401.{i:05d}" for i in range(n_rows)]
+    return pd.DataFrame(
+        {
+            "arxiv_code": codes,
+            "topic": rng.choice(["Agents", "Reasoning", "Retrieval", "Alignment"], n_rows),
+            "dim1": rng.normal(size=n_rows),
+            "dim2": rng.normal(size=n_rows),
+            "similar_docs": [db_utils.list_to_pg_array(codes[max(0, i - 10):i]) for i in range(n_rows)],
+            "tstp": pd.Timestamp.now(),
+        }
+    )
+
+
+def time_upload(df: pd.DataFrame, method: str, if_exists: str) -> float:
+    """Upload the frame into the bench table and return elapsed seconds."""
+    db_utils.execute_write_query(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+    if if_exists == "replace":
+        ## Pre-populate so replace has something to swap out.
+        db_utils.upload_dataframe(df.head(100), BENCH_TABLE, method="copy")
+    start = time.perf_counter()
+    db_utils.upload_dataframe(df, BENCH_TABLE, if_exists=if_exists, method=method)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark to_sql vs COPY uploads.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--if-exists", default="append", choices=["append", "replace"])
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'to_sql rows/s':>15} {'copy rows/s':>15} {'speedup':>8}")
+    try:
+        for n_rows in args.sizes:
+            df = make_frame(n_rows)
+            t_sql = time_upload(df, "to_sql", args.if_exists)
+            t_copy = time_upload(df, "copy", args.if_exists)
+            print(f"{n_rows:>8} {n_rows / t_sql:>15,.0f} {n_rows / t_copy:>15,.0f} {t_sql / t_copy:>7.1f}x")
+    finally:
+        db_utils.execute_write_query(f"DROP TABLE IF EXISTS {BENCH_TABLE}")
+
+
+if __name__ == "__main__":
+    main()
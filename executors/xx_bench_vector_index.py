@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+load_dotenv()
+PROJECT_PATH = os.environ.get("PROJECT_PATH")
+sys.path.append(PROJECT_PATH)
+
+import utils.db.db_utils as db_utils
+import utils.db.embedding_db as embedding_db
+
+
+def search_query(dimension: int, rerank_k: int) -> str:
+    """Top-k query shaped so the planner can use the partial HNSW index for this table."""
+    expression, _, operator = embedding_db.ann_index_expression(dimension)
+    table = f"arxiv_embeddings_{dimension}"
+    filters = "embedding_type = :embedding_type AND doc_type = :doc_type"
+    if operator == "<~>":
+        ## Hamming search over the binary index, then exact cosine rerank.
+        return f"""
+            SELECT arxiv_code FROM (
+                SELECT arxiv_code, embedding FROM {table}
+                WHERE {filters}
+                ORDER BY {expression} <~> binary_quantize(CAST(:q AS vector({dimension})))
+                LIMIT {rerank_k}
+            ) c
+            ORDER BY embedding <=> CAST(:q AS vector({dimension}))
+            LIMIT :k
+        """
+    cast = f"CAST(:q AS vector({dimension}))"
+    if expression != "embedding":
+        cast = f"CAST(:q AS halfvec({dimension}))"
+    return f"""
+        SELECT arxiv_code FROM {table}
+        WHERE {filters}
+        ORDER BY {expression} <=> {cast}
+        LIMIT :k
+    """
+
+
+def run(conn, sql: str, queries: np.ndarray, params: dict, indexed: bool, ef_search: int):
+    """Run each query; returns (latencies in ms, result lists)."""
+    conn.execute(text(f"SET enable_indexscan = {'on' if indexed else 'off'}"))
+    conn.execute(text(f"SET hnsw.ef_search = {ef_search}"))
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        rows = conn.execute(text(sql), {**params, "q": embedding_db.vector_literal(query)}).fetchall()
+        latencies.append(1000 * (time.perf_counter() - start))
+        results.append([r[0] for r in rows])
+    return np.array(latencies), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="p50/p95 latency and recall@k with vs without HNSW index.")
+    parser.add_argument("--embedding-type", default="voyage")
+    parser.add_argument("--doc-type", default="abstract")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[40, 100, 200])
+    parser.add_argument("--rerank-k", type=int, default=200, help="Binary-index candidates reranked (4096-d only).")
+    parser.add_argument("--noise", type=float, default=0.05)
+    args = parser.parse_args()
+
+    dimension = embedding_db.EMBEDDING_DIMENSIONS[args.embedding_type]
+    matrix, _ = embedding_db.load_cached_embedding_matrix(args.doc_type, args.embedding_type)
+    rng = np.random.default_rng(0)
+    rows = rng.choice(len(matrix), size=min(args.queries, len(matrix)), replace=False)
+    ## Perturbed stored vectors stand in for real queries.
+    queries = np.asarray(matrix[np.sort(rows)], dtype=np.float32)
+    queries += args.noise * rng.standard_normal(queries.shape).astype(np.float32) * queries.std()
+
+    sql = search_query(dimension, args.rerank_k)
+    params = {"embedding_type": args.embedding_type, "doc_type": args.doc_type, "k": args.k}
+    with db_utils.get_engine().connect() as conn:
+        exact_ms, exact = run(conn, sql, queries, params, indexed=False, ef_search=args.ef_search[0])
+        print(f"{'mode':>12} {'p50 ms':>8} {'p95 ms':>8} {'recall@' + str(args.k):>10}")
+        print(f"{'exact':>12} {np.percentile(exact_ms, 50):>8.1f} {np.percentile(exact_ms, 95):>8.1f} {1.0:>10.3f}")
+        for ef in args.ef_search:
+            ann_ms, ann = run(conn, sql, queries, params, indexed=True, ef_search=ef)
+            recall = np.mean([len(set(a) & set(e)) / max(len(e), 1) for a, e in zip(ann, exact)])
+            label = f"hnsw ef={ef}"
+            print(f"{label:>12} {np.percentile(ann_ms, 50):>8.1f} {np.percentile(ann_ms, 95):>8.1f} {recall:>10.3f}")
+        conn.rollback()
+
+
+if __name__ == "__main__":
+    main()
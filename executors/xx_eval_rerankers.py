@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+PROJECT_PATH = os.environ.get("PROJECT_PATH")
+sys.path.append(PROJECT_PATH)
+
+import utils.app_utils as au
+from utils.db import db_utils, embedding_db
+from utils.rerankers import get_reranker
+
+
+def load_questions(n: int) -> list:
+    """Most recent distinct questions from the Q&A logs."""
+    rows = db_utils.execute_read_query(
+        """
+        SELECT user_question FROM (
+            SELECT DISTINCT ON (user_question) user_question, tstp
+            FROM qna_logs
+            WHERE user_question IS NOT NULL AND user_question <> ''
+            ORDER BY user_question, tstp DESC
+        ) q
+        ORDER BY tstp DESC
+        LIMIT :n
+        """,
+        {"n": n},
+        as_dataframe=False,
+    )
+    return [row[0] for row in rows]
+
+
+def candidate_documents(question: str, query_llm_model: str, max_sources: int) -> list:
+    """Retrieve the candidates the reranker would see in query_llmpedia_new."""
+    query_obj = au.generate_query_object(question, llm_model=query_llm_model)
+    query_obj.topic_categories = None
+    criteria = query_obj.model_dump(exclude_none=True)
+    criteria["limit"] = max_sources + max_sources // 2
+    documents = embedding_db.hybrid_search(
+        criteria, au.query_config, embedding_model=au.VS_EMBEDDING_MODEL, include_notes=False
+    )
+    return [
+        au.Document(
+            arxiv_code=d["arxiv_code"],
+            title=d["title"],
+            published_date=d["published_date"].to_pydatetime(),
+            citations=int(d["citations"]),
+            abstract=d["abstract"],
+            notes="",
+            distance=float(d["similarity_score"]),
+        )
+        for d in documents.to_dict(orient="records")
+    ]
+
+
+def selected(reranked, min_label: float) -> set:
+    return {int(d.document_id) for d in reranked.documents if d.selected >= min_label}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fast rerankers against the LLM reranker on logged questions.")
+    parser.add_argument("--n", type=int, default=50)
+    parser.add_argument("--rerankers", nargs="+", default=["embedding", "cross_encoder"])
+    parser.add_argument("--rerank-llm-model", default="gemini/gemini-2.0-flash")
+    parser.add_argument("--query-llm-model", default="claude-3-7-sonnet-20250219")
+    parser.add_argument("--max-sources", type=int, default=25)
+    args = parser.parse_args()
+
+    questions = load_questions(args.n)
+    reference = get_reranker("llm", llm_model=args.rerank_llm_model)
+    candidates = {name: get_reranker(name) for name in args.rerankers}
+    results = {name: {"precision": [], "recall": [], "high_recall": [], "seconds": []} for name in ["llm"] + args.rerankers}
+
+    for i, question in enumerate(questions):
+        documents = candidate_documents(question, args.query_llm_model, args.max_sources)
+        if not documents:
+            continue
+        start = time.perf_counter()
+        truth = reference.rerank(question, documents)
+        results["llm"]["seconds"].append(time.perf_counter() - start)
+        truth_any, truth_high = selected(truth, 0.5), selected(truth, 1.0)
+
+        for name, reranker in candidates.items():
+            start = time.perf_counter()
+            pred = reranker.rerank(question, documents)
+            results[name]["seconds"].append(time.perf_counter() - start)
+            pred_any = selected(pred, 0.5)
+            overlap = len(pred_any & truth_any)
+            results[name]["precision"].append(overlap / len(pred_any) if pred_any else float(not truth_any))
+            results[name]["recall"].append(overlap / len(truth_any) if truth_any else 1.0)
+            results[name]["high_recall"].append(len(pred_any & truth_high) / len(truth_high) if truth_high else 1.0)
+        print(f"[{i + 1}/{len(questions)}] {question[:80]}")
+
+    print(f"\n{'reranker':>14} {'precision':>10} {'recall':>8} {'recall@1.0':>11} {'p50 s':>7}")
+    for name, metrics in results.items():
+        if not metrics["seconds"]:
+            continue
+        if name == "llm":
+            print(f"{name:>14} {'-':>10} {'-':>8} {'-':>11} {np.median(metrics['seconds']):>7.2f}")
+            continue
+        print(
+            f"{name:>14} {np.mean(metrics['precision']):>10.3f} {np.mean(metrics['recall']):>8.3f} "
+            f"{np.mean(metrics['high_recall']):>11.3f} {np.median(metrics['seconds']):>7.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+load_dotenv()
+PROJECT_PATH = os.getenv('PROJECT_PATH', '/app')
+sys.path.append(PROJECT_PATH)
+
+import utils.db.db_utils as db_utils
+import utils.db.embedding_db as embedding_db
+from utils.logging_utils import setup_logger
+
+logger = setup_logger(__name__, "vector_indexes.log")
+
+
+def index_ddl(embedding_type: str, doc_type: str, dimension: int, m: int, ef_construction: int) -> str:
+    """Build the CREATE INDEX statement for a partial HNSW index on one (embedding_type, doc_type) pair."""
+    expression, opclass, _ = embedding_db.ann_index_expression(dimension)
+    name = embedding_db.ann_index_name(dimension, embedding_type, doc_type)
+    return f"""
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS {name}
+        ON arxiv_embeddings_{dimension}
+        USING hnsw ({expression} {opclass})
+        WITH (m = {m}, ef_construction = {ef_construction})
+        WHERE embedding_type = '{embedding_type}' AND doc_type = '{doc_type}'
+    """
+
+
+def index_size(name: str) -> int:
+    """Get an index's on-disk size in bytes (0 if missing)."""
+    rows = db_utils.execute_read_query(
+        "SELECT COALESCE(pg_relation_size(to_regclass(:name)), 0)",
+        {"name": name},
+        as_dataframe=False,
+    )
+    return rows[0][0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or drop partial HNSW indexes on arxiv_embeddings tables.")
+    parser.add_argument("--action", choices=["create", "drop", "report"], default="create")
+    parser.add_argument("--embedding-type", help="Only this embedding type.")
+    parser.add_argument("--doc-type", help="Only this doc type.")
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--maintenance-work-mem", default="1GB")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    pairs = [
+        (embedding_type, doc_type, dimension)
+        for embedding_type, doc_type, dimension in embedding_db.list_embedding_pairs()
+        if (args.embedding_type is None or embedding_type == args.embedding_type)
+        and (args.doc_type is None or doc_type == args.doc_type)
+    ]
+    if not pairs:
+        logger.info("No matching (embedding_type, doc_type) pairs found")
+        return
+
+    ## CONCURRENTLY cannot run inside a transaction block.
+    engine = db_utils.get_engine().execution_options(isolation_level="AUTOCOMMIT")
+    for embedding_type, doc_type, dimension in pairs:
+        name = embedding_db.ann_index_name(dimension, embedding_type, doc_type)
+        if args.action == "create":
+            ddl = index_ddl(embedding_type, doc_type, dimension, args.m, args.ef_construction)
+            if args.dry_run:
+                print(ddl)
+                continue
+            logger.info(f"Building {name}...")
+            start = time.perf_counter()
+            with engine.connect() as conn:
+                conn.execute(text(f"SET maintenance_work_mem = '{args.maintenance_work_mem}'"))
+                conn.execute(text(ddl))
+            elapsed = time.perf_counter() - start
+            logger.info(f"Built {name} in {elapsed:.1f}s ({index_size(name) / 1024 ** 2:.1f} MB)")
+        elif args.action == "drop":
+            if args.dry_run:
+                print(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+                continue
+            with engine.connect() as conn:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            logger.info(f"Dropped {name}")
+        else:
+            size = index_size(name)
+            status = f"{size / 1024 ** 2:.1f} MB" if size else "missing"
+            print(f"{name:<70} {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+-- Cosine scores aligned with similar_documents.similar_docs, written by workflow/i2_similar_docs.py.
+ALTER TABLE similar_documents ADD COLUMN IF NOT EXISTS similar_scores real[];
+
+-- A full rebuild through to_sql once created the column as TEXT; convert it in place.
+ALTER TABLE similar_documents
+    ALTER COLUMN similar_scores TYPE real[] USING similar_scores::real[];
+
+COMMENT ON COLUMN similar_documents.similar_scores IS 'Cosine similarity of each entry in similar_docs (same order)';
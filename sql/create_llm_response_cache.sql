@@ -0,0 +1,15 @@
+CREATE TABLE IF NOT EXISTS llm_response_cache (
+    key VARCHAR(64) PRIMARY KEY,
+    process_id VARCHAR(100),
+    llm_model VARCHAR(100) NOT NULL,
+    response TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    tstp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_access TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS llm_response_cache_last_access_idx ON llm_response_cache (last_access);
+
+COMMENT ON TABLE llm_response_cache IS 'LLM responses keyed on sha256 of (model, messages, response schema, temperature, kwargs)';
+COMMENT ON COLUMN llm_response_cache.response IS 'JSON: pydantic model_dump_json for structured responses, JSON string otherwise';
@@ -0,0 +1,28 @@
+CREATE TABLE IF NOT EXISTS qna_answer_cache (
+    id SERIAL PRIMARY KEY,
+    question TEXT NOT NULL,
+    question_embedding vector(1024) NOT NULL,
+    embedding_type VARCHAR(50) NOT NULL,
+    response_length INTEGER NOT NULL,
+    instructions_hash VARCHAR(64) NOT NULL,
+    settings_hash VARCHAR(64) NOT NULL DEFAULT '',
+    answer TEXT NOT NULL,
+    referenced_codes TEXT[] NOT NULL DEFAULT '{}',
+    other_codes TEXT[] NOT NULL DEFAULT '{}',
+    tstp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_hit TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    hit_count INTEGER NOT NULL DEFAULT 0
+);
+
+-- Tables created before settings were part of the key; old rows never match a lookup.
+ALTER TABLE qna_answer_cache ADD COLUMN IF NOT EXISTS settings_hash VARCHAR(64) NOT NULL DEFAULT '';
+DROP INDEX IF EXISTS qna_answer_cache_key_idx;
+CREATE INDEX IF NOT EXISTS qna_answer_cache_settings_key_idx
+    ON qna_answer_cache (embedding_type, response_length, instructions_hash, settings_hash);
+CREATE INDEX IF NOT EXISTS qna_answer_cache_embedding_idx
+    ON qna_answer_cache USING hnsw (question_embedding vector_cosine_ops);
+
+COMMENT ON TABLE qna_answer_cache IS 'Generated Q&A answers reused for semantically equivalent questions';
+COMMENT ON COLUMN qna_answer_cache.instructions_hash IS 'sha256 of the custom instructions (empty string if none)';
+COMMENT ON COLUMN qna_answer_cache.settings_hash IS 'sha256 of the query/rerank/response models, max_sources and reranker';
+COMMENT ON COLUMN qna_answer_cache.last_hit IS 'Last time the entry was served or stored, used for size eviction';
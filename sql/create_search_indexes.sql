@@ -0,0 +1,10 @@
+-- Full-text search indexes used by embedding_db.hybrid_search and the title filter.
+-- Expressions must match DETAILS_TSVECTOR / NOTES_TSVECTOR in utils/db/embedding_db.py.
+CREATE INDEX IF NOT EXISTS arxiv_details_fts_idx
+    ON arxiv_details USING GIN (to_tsvector('english', COALESCE(title, '') || ' ' || COALESCE(summary, '')));
+
+CREATE INDEX IF NOT EXISTS arxiv_details_title_fts_idx
+    ON arxiv_details USING GIN (to_tsvector('english', title));
+
+CREATE INDEX IF NOT EXISTS summary_notes_fts_idx
+    ON summary_notes USING GIN (to_tsvector('english', summary));
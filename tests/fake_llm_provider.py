@@ -0,0 +1,80 @@
+"""Local stand-in for an LLM provider: configurable latency, rate limits and failures."""
+
+import time
+import asyncio
+from types import SimpleNamespace
+from typing import Optional
+
+
+class FakeRateLimitError(Exception):
+    """Mimics a provider 429 carrying a Retry-After header."""
+
+    status_code = 429
+
+    def __init__(self, retry_after: Optional[float] = None):
+        super().__init__("429 Too Many Requests")
+        self.headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+
+
+class FakeServerError(Exception):
+    status_code = 503
+
+
+class FakeProvider:
+    """Async/sync completion stand-in.
+
+    Returns 429 when more than `rpm` requests arrive within a minute window
+    (or for the first `fail_first_429` calls) and a 503 for the first
+    `fail_first_5xx` calls. Tracks the peak number of concurrent requests.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.01,
+        rpm: Optional[int] = None,
+        retry_after: Optional[float] = 0.05,
+        fail_first_429: int = 0,
+        fail_first_5xx: int = 0,
+    ):
+        self.latency = latency
+        self.rpm = rpm
+        self.retry_after = retry_after
+        self.fail_first_429 = fail_first_429
+        self.fail_first_5xx = fail_first_5xx
+        self.calls = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._window = []
+
+    def _check(self) -> None:
+        self.calls += 1
+        now = time.monotonic()
+        self._window = [t for t in self._window if now - t < 60]
+        if self.calls <= self.fail_first_5xx:
+            raise FakeServerError("503 Service Unavailable")
+        if self.calls <= self.fail_first_429 or (self.rpm is not None and len(self._window) >= self.rpm):
+            self.rate_limited += 1
+            raise FakeRateLimitError(self.retry_after)
+        self._window.append(now)
+
+    @staticmethod
+    def _response(content: str):
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=5)
+        message = SimpleNamespace(content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    async def acompletion(self, content: str = "ok", **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            self._check()
+            return self._response(content)
+        finally:
+            self.in_flight -= 1
+
+    def completion(self, content: str = "ok", **kwargs):
+        time.sleep(self.latency)
+        self._check()
+        return self._response(content)
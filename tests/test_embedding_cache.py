@@ -0,0 +1,49 @@
+"""Test the local memory-mapped embedding cache."""
+
+import pytest
+import numpy as np
+from datetime import datetime
+import os, sys
+from dotenv import load_dotenv
+load_dotenv()
+
+PROJECT_PATH = os.getenv('PROJECT_PATH', '/app')
+sys.path.append(PROJECT_PATH)
+
+from utils.db.embedding_cache import EmbeddingMatrixCache
+
+DIMENSION = 16
+
+@pytest.fixture
+def cache(tmp_path):
+    """Create an empty cache in a temporary directory."""
+    return EmbeddingMatrixCache("nv", "abstract", DIMENSION, cache_dir=str(tmp_path))
+
+def test_reset_and_append_roundtrip(cache, tmp_path):
+    """Appended rows are visible through the memory-mapped view and survive reopening."""
+    first = np.random.rand(3, DIMENSION).astype(np.float32)
+    second = np.random.rand(2, DIMENSION).astype(np.float32)
+    cache.reset(first, ["a", "b", "c"], datetime(2024, 1, 1))
+    cache.append(second, ["d", "e"], datetime(2024, 1, 2))
+
+    reopened = EmbeddingMatrixCache("nv", "abstract", DIMENSION, cache_dir=str(tmp_path))
+    view = reopened.view()
+    assert isinstance(view, np.memmap)
+    assert reopened.ids == ["a", "b", "c", "d", "e"]
+    assert reopened.max_tstp == datetime(2024, 1, 2)
+    np.testing.assert_array_equal(view, np.vstack([first, second]))
+    assert reopened.validate()
+
+def test_validate_detects_corruption(cache):
+    """A modified byte in the matrix file fails checksum validation."""
+    cache.reset(np.ones((4, DIMENSION), dtype=np.float32), ["a", "b", "c", "d"], datetime(2024, 1, 1))
+    with open(cache.matrix_path, "r+b") as f:
+        f.seek(-4, os.SEEK_END)
+        f.write(np.float32(2.0).tobytes())
+    assert not cache.validate()
+
+def test_dimension_change_starts_empty(cache, tmp_path):
+    """An index written for another dimension is ignored."""
+    cache.reset(np.ones((1, DIMENSION), dtype=np.float32), ["a"], None)
+    other = EmbeddingMatrixCache("nv", "abstract", DIMENSION * 2, cache_dir=str(tmp_path))
+    assert len(other) == 0
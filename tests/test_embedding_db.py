@@ -100,4 +100,66 @@ def test_store_embeddings_batch(mock_engine_begin, mock_new_write, sample_embedd
     # Assert
     assert legacy_result == new_result, "store_embeddings_batch() return value differs"
     assert mock_new_write.called, "New implementation should call execute_write_query"
-    assert mock_conn.execute.called, "Legacy implementation should call conn.execute" 
\ No newline at end of file
+    assert mock_conn.execute.called, "Legacy implementation should call conn.execute" 
+
+## Query plan tests - using real DB
+
+def test_semantic_search_uses_vector_index():
+    """Each per-query CTE in the semantic search should be served by an ANN index scan."""
+    from sqlalchemy import text
+    from utils.db.db_utils import get_engine
+
+    embedding_model = "voyage"
+    dimension = embedding_db.EMBEDDING_DIMENSIONS[embedding_model]
+    indexes = db_utils_read_indexes(f"arxiv_embeddings_{dimension}")
+    if not any("hnsw" in idx or "ivfflat" in idx for idx in indexes):
+        pytest.skip("No ANN index on the embeddings table")
+
+    query_vectors = [np.random.rand(dimension).tolist() for _ in range(2)]
+    criteria = {"semantic_search_queries": ["q1", "q2"], "limit": 10, "response_length": 300}
+    query, params = embedding_db.generate_semantic_search_query(
+        criteria, {}, embedding_model=embedding_model, query_vectors=query_vectors
+    )
+    assert "ARRAY[" not in query, "Vectors should be bound parameters, not inlined"
+    assert query.count("<=>") == len(query_vectors), "Distance should be computed once per query"
+
+    with get_engine().begin() as conn:
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = "\n".join(row[0] for row in conn.execute(text("EXPLAIN " + query), params))
+    assert plan.count("Index Scan using") >= len(query_vectors), plan
+
+def db_utils_read_indexes(table: str) -> list:
+    """Get index definitions for a table."""
+    from utils.db.db_utils import execute_read_query
+    rows = execute_read_query(
+        "SELECT indexdef FROM pg_indexes WHERE tablename = :table",
+        {"table": table},
+        as_dataframe=False,
+    )
+    return [row[0].lower() for row in rows]
+
+def test_reciprocal_rank_fusion_prefers_agreement():
+    """Papers ranked by both legs outrank papers found by only one."""
+    fused = embedding_db.reciprocal_rank_fusion([["a", "b", "c"], ["c", "d", "a"]])
+    codes = [code for code, _ in fused]
+    assert set(codes[:2]) == {"a", "c"}
+    assert codes.index("b") < codes.index("d")
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 63)
+
+def test_lexical_search_uses_gin_index():
+    """The full-text leg should be served by the GIN expression indexes, not a sequential scan."""
+    from sqlalchemy import text
+    from utils.db.db_utils import get_engine
+
+    if not any("gin" in idx for idx in db_utils_read_indexes("summary_notes")):
+        pytest.skip("No full-text index on summary_notes")
+
+    criteria = {"semantic_search_queries": ["retrieval augmented generation"], "title": "attention"}
+    config = {"title": "to_tsvector('english', a.title) @@ plainto_tsquery('english', :title)"}
+    query, params = embedding_db.generate_lexical_search_query(criteria, config)
+    assert "LIKE" not in query
+
+    with get_engine().begin() as conn:
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        plan = "\n".join(row[0] for row in conn.execute(text("EXPLAIN " + query), params))
+    assert "Bitmap Index Scan" in plan, plan
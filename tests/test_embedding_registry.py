@@ -0,0 +1,88 @@
+"""Test the embedding model registry: lazy loading, reuse and idle eviction with a fake loader and clock."""
+
+import pytest
+import threading
+from types import SimpleNamespace
+import os, sys
+from dotenv import load_dotenv
+load_dotenv()
+
+PROJECT_PATH = os.getenv('PROJECT_PATH', '/app')
+sys.path.append(PROJECT_PATH)
+
+import utils.embeddings as embeddings
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(embeddings, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+@pytest.fixture
+def loads():
+    return []
+
+@pytest.fixture
+def registry(loads):
+    def loader(model_name):
+        loads.append(model_name)
+        return SimpleNamespace(name=model_name)
+    return embeddings.EmbeddingModelRegistry(idle_timeout=60, loader=loader)
+
+def test_loads_lazily_and_reuses(registry, loads, clock):
+    assert registry.loaded_models() == [] and loads == []
+    model = registry.get("voyage")
+    assert model.name == "voyage" and loads == ["voyage"]
+    assert registry.get("voyage") is model
+    assert loads == ["voyage"]
+
+def test_evicts_idle_models(registry, loads, clock):
+    registry.get("voyage")
+    clock.now += 30
+    registry.get("gte")
+    clock.now += 45
+    ## voyage idle for 75s (> 60), gte for 45s.
+    assert registry.evict_idle() == ["voyage"]
+    assert registry.loaded_models() == ["gte"]
+    registry.get("voyage")
+    assert loads == ["voyage", "gte", "voyage"]
+
+def test_get_refreshes_idle_timer_and_keeps_requested_model(registry, loads, clock):
+    registry.get("voyage")
+    clock.now += 50
+    registry.get("voyage")
+    clock.now += 50
+    assert registry.evict_idle() == []
+    clock.now += 100
+    ## The requested model is never evicted by its own lookup, even if idle.
+    registry.get("voyage")
+    assert loads == ["voyage"]
+
+def test_concurrent_first_use_loads_once(loads, clock):
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_loader(model_name):
+        loads.append(model_name)
+        started.set()
+        release.wait(1)
+        return object()
+
+    registry = embeddings.EmbeddingModelRegistry(idle_timeout=60, loader=slow_loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("voyage"))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    started.wait(1)
+    release.set()
+    for t in threads:
+        t.join(1)
+    assert loads == ["voyage"]
+    assert len(results) == 4 and all(r is results[0] for r in results)
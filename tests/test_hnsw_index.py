@@ -0,0 +1,63 @@
+"""Test HNSW index inserts and in-place vector updates against exact search."""
+
+import numpy as np
+import os, sys
+from dotenv import load_dotenv
+load_dotenv()
+
+PROJECT_PATH = os.getenv('PROJECT_PATH', '/app')
+sys.path.append(PROJECT_PATH)
+
+from utils.hnsw_index import HNSWIndex
+
+def build(n=500, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    ids = [str(i) for i in range(n)]
+    index = HNSWIndex(dimension=dim, M=8, ef_construction=64)
+    index.add_batch(vectors, ids)
+    return index, vectors, ids
+
+def test_search_finds_inserted_vector():
+    """Every inserted vector is its own nearest neighbour."""
+    index, vectors, ids = build()
+    found, dists = index.search(vectors[42], 1)
+    assert found == ["42"] and dists[0] < 1e-5
+
+def test_update_replaces_vector_and_relinks():
+    """An updated node is found at its new position, not at its old one."""
+    index, vectors, ids = build()
+    rng = np.random.default_rng(1)
+    new_vector = rng.standard_normal(vectors.shape[1]).astype(np.float32)
+    index.update(new_vector, "7")
+
+    assert len(index) == len(ids)
+    np.testing.assert_allclose(index.vector("7"), new_vector / np.linalg.norm(new_vector), atol=1e-6)
+    found, _ = index.search(new_vector, 1)
+    assert found == ["7"]
+    ## The old position no longer returns the moved id.
+    found, _ = index.search(vectors[7], 1)
+    assert found != ["7"]
+
+def test_update_keeps_recall():
+    """Recall against exact search holds after many in-place updates."""
+    index, vectors, ids = build()
+    rng = np.random.default_rng(2)
+    moved = rng.choice(len(ids), size=50, replace=False)
+    vectors[moved] = rng.standard_normal((50, vectors.shape[1]))
+    for i in moved:
+        index.update(vectors[i], ids[i])
+
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    hits = 0
+    for i in moved:
+        exact = np.argsort(-(normed @ normed[i]))[:10]
+        found, _ = index.search(vectors[i], 10, ef=100)
+        hits += len(set(found) & {ids[j] for j in exact})
+    assert hits / (len(moved) * 10) > 0.9
+
+def test_update_unknown_id_adds_it():
+    """Updating an id that isn't indexed inserts it."""
+    index, vectors, _ = build(n=20)
+    index.update(vectors[0] + 1.0, "new")
+    assert "new" in index and len(index) == 21
@@ -0,0 +1,92 @@
+"""Test batch submission, resume and result mapping with the local file-based provider."""
+
+import pytest
+import os, sys
+from pydantic import BaseModel
+from dotenv import load_dotenv
+load_dotenv()
+
+PROJECT_PATH = os.getenv('PROJECT_PATH', '/app')
+sys.path.append(PROJECT_PATH)
+
+import utils.llm_batch as llm_batch
+from utils.llm_batch import BatchRequest, BatchJobStore, LocalBatchProvider
+
+class Repo(BaseModel):
+    url: str
+
+def request(code, content="notes", model=None):
+    return BatchRequest(
+        key=code,
+        messages=[{"role": "system", "content": "sys"}, {"role": "user", "content": f"{code}: {content}"}],
+        llm_model="claude-3-7-sonnet-20250219",
+        temperature=0.5,
+        process_id="test",
+        model=model,
+    )
+
+@pytest.fixture
+def store(tmp_path):
+    return BatchJobStore("test_stage", directory=str(tmp_path / "jobs"))
+
+def test_results_map_back_to_keys(tmp_path, store):
+    """Dotted arxiv codes survive the custom_id mapping."""
+    provider = LocalBatchProvider(directory=str(tmp_path / "local"))
+    codes = ["2401.00001", "2401.00002", "2401.00003"]
+    results = llm_batch.run_batch("test_stage", [request(c) for c in codes], provider=provider, poll_seconds=0, store=store)
+    assert set(results) == set(codes)
+    for code in codes:
+        assert results[code].response == f"{code}: notes"
+        assert results[code].error is None
+    assert store.open_jobs() == []
+
+def test_no_wait_resumes_without_resubmitting(tmp_path, store):
+    """An unfinished job is picked up by the next run instead of being submitted again."""
+    provider = LocalBatchProvider(directory=str(tmp_path / "local"), ready_after=1)
+    requests = [request("2401.00001"), request("2401.00002")]
+    assert llm_batch.run_batch("test_stage", requests, provider=provider, wait=False, store=store) == {}
+    assert len(store.open_jobs()) == 1
+
+    results = llm_batch.run_batch("test_stage", requests, provider=provider, wait=False, store=store)
+    assert set(results) == {"2401.00001", "2401.00002"}
+    assert len(provider.submitted) == 1
+
+def test_only_new_keys_are_submitted(tmp_path, store):
+    provider = LocalBatchProvider(directory=str(tmp_path / "local"), ready_after=5)
+    llm_batch.run_batch("test_stage", [request("a")], provider=provider, wait=False, store=store)
+    llm_batch.run_batch("test_stage", [request("a"), request("b")], provider=provider, wait=False, store=store)
+    assert len(provider.submitted) == 2
+    assert sorted(list(job["ids"].values()) for job in store.open_jobs()) == [["a"], ["b"]]
+
+def test_failed_and_structured_requests(tmp_path, store):
+    """Response models are validated; failed or invalid requests carry an error."""
+    def responder(params):
+        content = params["messages"][-1]["content"]
+        if content.startswith("bad"):
+            raise RuntimeError("overloaded")
+        if content.startswith("invalid"):
+            return {"link": "x"}
+        return {"url": "https://github.com/x/y"}
+
+    provider = LocalBatchProvider(directory=str(tmp_path / "local"), responder=responder)
+    requests = [request(code, model=Repo) for code in ["good", "bad", "invalid"]]
+    results = llm_batch.run_batch("test_stage", requests, provider=provider, poll_seconds=0, store=store)
+    assert results["good"].response == Repo(url="https://github.com/x/y")
+    assert "overloaded" in results["bad"].error
+    assert results["invalid"].error.startswith("Invalid response")
+
+def test_anthropic_params_move_cache_control_and_merge_turns():
+    messages = [
+        {"role": "system", "content": "sys"},
+        {"role": "user", "content": "paper", "cache_control": {"type": "ephemeral"}},
+        {"role": "user", "content": "task"},
+    ]
+    req = BatchRequest(key="a", messages=messages, llm_model="anthropic/claude-3-7-sonnet-20250219", model=Repo)
+    params = llm_batch.AnthropicBatchProvider.params(req)
+    assert params["model"] == "claude-3-7-sonnet-20250219"
+    assert params["system"] == [{"type": "text", "text": "sys"}]
+    assert params["messages"] == [{"role": "user", "content": [
+        {"type": "text", "text": "paper", "cache_control": {"type": "ephemeral"}},
+        {"type": "text", "text": "task"},
+    ]}]
+    assert params["tool_choice"] == {"type": "tool", "name": "Repo"}
@@ -0,0 +1,52 @@
+"""Test the content-addressed LLM response cache."""
+
+import pytest
+import os, sys
+from pydantic import BaseModel
+from dotenv import load_dotenv
+load_dotenv()
+
+PROJECT_PATH = os.getenv('PROJECT_PATH', '/app')
+sys.path.append(PROJECT_PATH)
+
+import utils.llm_cache as llm_cache
+
+class Answer(BaseModel):
+    text: str
+    score: float
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+@pytest.fixture
+def backend(tmp_path):
+    return llm_cache.SQLiteLLMCache(path=str(tmp_path / "cache.sqlite"), max_entries=2)
+
+def test_cache_key_covers_request():
+    """Any change to model, messages, schema, temperature or kwargs changes the key."""
+    base = llm_cache.cache_key("gpt-4o", MESSAGES, Answer, 0.5, {"max_tokens": 100})
+    assert base == llm_cache.cache_key("gpt-4o", list(MESSAGES), Answer, 0.5, {"max_tokens": 100})
+    assert base != llm_cache.cache_key("gpt-4o-mini", MESSAGES, Answer, 0.5, {"max_tokens": 100})
+    assert base != llm_cache.cache_key("gpt-4o", MESSAGES, None, 0.5, {"max_tokens": 100})
+    assert base != llm_cache.cache_key("gpt-4o", MESSAGES, Answer, 0.7, {"max_tokens": 100})
+    assert base != llm_cache.cache_key("gpt-4o", MESSAGES, Answer, 0.5, {"max_tokens": 200})
+
+def test_pydantic_roundtrip(backend):
+    """Structured responses come back as model instances."""
+    answer = Answer(text="hi", score=0.5)
+    backend.set("k", "step", "gpt-4o", llm_cache.serialize_response(answer), 10, 5)
+    response, prompt_tokens, completion_tokens = backend.get("k", "step")
+    assert llm_cache.deserialize_response(response, Answer) == answer
+    assert (prompt_tokens, completion_tokens) == (10, 5)
+
+def test_ttl_and_size_eviction(backend, monkeypatch):
+    """Entries past their process TTL miss, and the least recently used is evicted past max_entries."""
+    backend.set("a", "short", "m", '"a"', 1, 1)
+    monkeypatch.setitem(llm_cache.LLM_CACHE_TTLS, "short", -1)
+    assert backend.get("a", "short") is None
+    assert backend.get("a", "other") is not None
+
+    backend.set("b", None, "m", '"b"', 1, 1)
+    backend.get("a", None)
+    backend.set("c", None, "m", '"c"', 1, 1)
+    assert backend.get("b", None) is None
+    assert backend.get("a", None) is not None
@@ -0,0 +1,159 @@
+"""Test retry backoff, retry-after handling and circuit breakers against a flaky fake provider."""
+
+import asyncio
+import pytest
+import os, sys
+from dotenv import load_dotenv
+load_dotenv()
+
+PROJECT_PATH = os.getenv('PROJECT_PATH', '/app')
+sys.path.append(PROJECT_PATH)
+
+from utils.llm_retry import Retrier, RetryPolicy, CircuitOpenError, is_retryable
+from utils.llm_scheduler import LLMScheduler
+from fake_llm_provider import FakeProvider, FakeRateLimitError, FakeServerError
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+LIMITS = {
+    "max_retries": 4,
+    "default_retry_after": 0.01,
+    "retry": {"base_delay": 1.0, "max_delay": 8.0},
+    "circuit_breaker": {"failure_threshold": 3, "reset_timeout": 30.0},
+}
+
+def make_retrier(**overrides):
+    clock = FakeClock()
+    sleeps = []
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock.sleep(seconds)
+    retrier = Retrier({**LIMITS, **overrides}, sleep=sleep, clock=clock)
+    return retrier, sleeps, clock
+
+def test_server_errors_back_off_exponentially():
+    """Each retry waits longer, within [d/2, d] for d = base * 2**attempt."""
+    provider = FakeProvider(latency=0.0, fail_first_5xx=2)
+    retrier, sleeps, _ = make_retrier(circuit_breaker={"failure_threshold": 10, "reset_timeout": 30.0})
+    response = retrier.call(provider.completion, "fake")
+    assert response.choices[0].message.content == "ok"
+    assert provider.calls == 3
+    assert 0.5 <= sleeps[0] <= 1.0 and 1.0 <= sleeps[1] <= 2.0
+    stats = retrier.metrics["fake"]
+    assert (stats["calls"], stats["attempts"], stats["retries"]) == (1, 3, 2)
+    assert stats["wait_seconds"] == pytest.approx(sum(sleeps))
+
+def test_backoff_is_capped_and_jittered():
+    policy = RetryPolicy(base_delay=1.0, max_delay=8.0)
+    delays = [policy.backoff(10) for _ in range(50)]
+    assert all(4.0 <= d <= 8.0 for d in delays)
+    assert len(set(delays)) > 1
+
+def test_rate_limit_waits_for_retry_after():
+    provider = FakeProvider(latency=0.0, fail_first_429=1, retry_after=7)
+    retrier, sleeps, _ = make_retrier()
+    retrier.call(provider.completion, "fake")
+    assert sleeps == [7.0]
+    ## Throttling is not an outage.
+    assert retrier.metrics["fake"]["failures"] == 0
+
+def test_client_errors_are_not_retried():
+    retrier, sleeps, _ = make_retrier()
+    def bad_request():
+        raise ValueError("invalid schema")
+    with pytest.raises(ValueError):
+        retrier.call(bad_request, "fake")
+    assert sleeps == [] and retrier.metrics["fake"]["attempts"] == 1
+    assert not is_retryable(ValueError())
+    assert is_retryable(FakeServerError()) and is_retryable(FakeRateLimitError())
+
+def test_breaker_fails_fast_then_probes():
+    """After the threshold the provider is not called until the reset timeout has passed."""
+    provider = FakeProvider(latency=0.0, fail_first_5xx=3)
+    retrier, _, clock = make_retrier(max_retries=5)
+    with pytest.raises(CircuitOpenError):
+        retrier.call(provider.completion, "fake")
+    assert provider.calls == 3
+    assert retrier.breaker("fake").state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        retrier.call(provider.completion, "fake")
+    assert provider.calls == 3
+    assert retrier.metrics["fake"]["breaker_rejections"] == 2
+
+    clock.now += 30.0
+    assert retrier.breaker("fake").state == "half_open"
+    retrier.call(provider.completion, "fake")
+    assert provider.calls == 4
+    assert retrier.breaker("fake").state == "closed"
+    assert retrier.metrics["fake"]["breaker_trips"] == 1
+
+def test_failed_probe_reopens_breaker():
+    provider = FakeProvider(latency=0.0, fail_first_5xx=4)
+    retrier, _, clock = make_retrier(max_retries=0)
+    for _ in range(3):
+        with pytest.raises(FakeServerError):
+            retrier.call(provider.completion, "fake")
+    clock.now += 30.0
+    with pytest.raises(FakeServerError):
+        retrier.call(provider.completion, "fake")
+    assert retrier.breaker("fake").state == "open"
+    assert retrier.metrics["fake"]["breaker_trips"] == 2
+
+def test_scheduler_retries_server_errors():
+    """The async path shares the policy: 5xx retried with backoff, counted per provider."""
+    provider = FakeProvider(latency=0.0, fail_first_5xx=2)
+    limits = {
+        "providers": {"default": {"max_concurrency": 2, "rpm": 6000, "tpm": 10_000_000}},
+        **LIMITS,
+        "retry": {"base_delay": 0.01, "max_delay": 0.02},
+    }
+    scheduler = LLMScheduler(limits)
+    async def main():
+        return await scheduler.run(lambda: provider.acompletion(), "fake-model", 10)
+    assert asyncio.run(main()).choices[0].message.content == "ok"
+    stats = scheduler.retrier.metrics["default"]
+    assert (stats["attempts"], stats["retries"], stats["failures"]) == (3, 2, 2)
+
+def test_interrupted_probe_is_released():
+    """A probe that ends without an outcome must not leave the breaker rejecting every call."""
+    provider = FakeProvider(latency=0.0, fail_first_5xx=3)
+    retrier, _, clock = make_retrier(max_retries=0)
+    for _ in range(3):
+        with pytest.raises(FakeServerError):
+            retrier.call(provider.completion, "fake")
+    clock.now += 30.0
+    def interrupted():
+        raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        retrier.call(interrupted, "fake")
+    assert retrier.breaker("fake").state == "half_open"
+    retrier.call(provider.completion, "fake")
+    assert retrier.breaker("fake").state == "closed"
+
+def test_cancelled_scheduler_probe_is_released():
+    provider = FakeProvider(latency=0.0)
+    limits = {
+        "providers": {"default": {"max_concurrency": 2, "rpm": 6000, "tpm": 10_000_000}},
+        **LIMITS,
+    }
+    scheduler = LLMScheduler(limits)
+    breaker = scheduler.retrier.breaker("default")
+    breaker.opened_at = breaker.clock() - 60.0
+    async def hang():
+        await asyncio.sleep(10)
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(scheduler.run(hang, "fake-model", 10), 0.05)
+        assert not breaker.probing
+        return await scheduler.run(lambda: provider.acompletion(), "fake-model", 10)
+    assert asyncio.run(main()).choices[0].message.content == "ok"
+    assert breaker.state == "closed"
@@ -0,0 +1,76 @@
+"""Test the per-provider LLM scheduler against a fake provider."""
+
+import time
+import asyncio
+import pytest
+import os, sys
+from dotenv import load_dotenv
+load_dotenv()
+
+PROJECT_PATH = os.getenv('PROJECT_PATH', '/app')
+sys.path.append(PROJECT_PATH)
+
+from utils.llm_scheduler import LLMScheduler, TokenBucket, provider_for, retry_after_seconds
+from fake_llm_provider import FakeProvider, FakeRateLimitError
+
+def make_scheduler(max_concurrency=4, rpm=6000, tpm=10_000_000, max_retries=5):
+    return LLMScheduler({
+        "providers": {"default": {"max_concurrency": max_concurrency, "rpm": rpm, "tpm": tpm}},
+        "max_retries": max_retries,
+        "default_retry_after": 0.01,
+    })
+
+def run_many(scheduler, provider, n, model="fake-model"):
+    async def main():
+        return await scheduler.map([
+            {"call": lambda: provider.acompletion(), "llm_model": model, "estimated_tokens": 10}
+            for _ in range(n)
+        ])
+    return asyncio.run(main())
+
+def test_provider_mapping():
+    assert provider_for("claude-3-7-sonnet-20250219") == "anthropic"
+    assert provider_for("gemini/gemini-2.0-flash") == "gemini"
+    assert provider_for("gpt-4o") == "openai"
+    assert provider_for("o3-mini") == "openai"
+
+def test_concurrency_cap():
+    """No more than max_concurrency requests are in flight at once."""
+    provider = FakeProvider(latency=0.02)
+    results = run_many(make_scheduler(max_concurrency=3), provider, 20)
+    assert all(not isinstance(r, Exception) for r in results)
+    assert provider.max_in_flight == 3
+
+def test_retries_429_after_retry_after():
+    """Throttled calls wait for retry-after and eventually succeed."""
+    provider = FakeProvider(latency=0.0, fail_first_429=3, retry_after=0.05)
+    scheduler = make_scheduler(max_concurrency=1)
+    start = time.perf_counter()
+    results = run_many(scheduler, provider, 2)
+    assert all(not isinstance(r, Exception) for r in results)
+    assert scheduler.stats["rate_limited"] == 3
+    assert time.perf_counter() - start >= 0.15
+
+def test_gives_up_after_max_retries():
+    provider = FakeProvider(latency=0.0, fail_first_429=10, retry_after=0.0)
+    results = run_many(make_scheduler(max_retries=2), provider, 1)
+    assert isinstance(results[0], FakeRateLimitError)
+    assert provider.calls == 3
+
+def test_token_bucket_paces_requests():
+    """A 600 rpm bucket (10/s) with 1 unit left needs ~0.1s per further request."""
+    async def main():
+        bucket = TokenBucket(600)
+        bucket.tokens = 1
+        start = time.perf_counter()
+        for _ in range(3):
+            await bucket.acquire(1)
+        return time.perf_counter() - start
+    assert asyncio.run(main()) >= 0.18
+
+def test_retry_after_parsing():
+    assert retry_after_seconds(FakeRateLimitError(7)) == 7.0
+    assert retry_after_seconds(FakeRateLimitError(None)) is None
+    error = FakeRateLimitError(None)
+    error.headers = {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}
+    assert retry_after_seconds(error) == 0.0
@@ -143,4 +143,32 @@ def test_get_papers_since():
     cutoff_time = datetime.now() - timedelta(hours=24)
     legacy_df = db.get_papers_since(cutoff_time)
     new_df = paper_db.get_papers_since(cutoff_time)
-    assert_dataframes_equal(legacy_df, new_df, f"get_papers_since({cutoff_time}) differs") 
\ No newline at end of file
+    assert_dataframes_equal(legacy_df, new_df, f"get_papers_since({cutoff_time}) differs")
+
+
+def test_bulk_lookups_match_single():
+    """Bulk get_extended_notes / get_extended_content / load_repositories match per-code calls."""
+    arxiv_codes = sorted(paper_db.load_summary_notes().index.unique())[-10:]
+    repo_df = paper_db.load_repositories()
+    if not repo_df.empty:
+        arxiv_codes += sorted(repo_df.index.unique())[-5:]
+    arxiv_codes.append("0000.00000")  # Unknown code, missing from every result
+
+    for kwargs in [{"expected_tokens": 500}, {"expected_tokens": 3000}, {"level": 1}, {}]:
+        bulk = paper_db.get_extended_notes(arxiv_codes, **kwargs)
+        for arxiv_code in arxiv_codes:
+            single = paper_db.get_extended_notes(arxiv_code, **kwargs)
+            assert bulk.get(arxiv_code) == single, f"get_extended_notes({arxiv_code}, {kwargs}) differs"
+
+    bulk = paper_db.get_extended_content(arxiv_codes)
+    for arxiv_code in arxiv_codes:
+        single_df = paper_db.get_extended_content(arxiv_code)
+        if single_df.empty:
+            assert arxiv_code not in bulk
+        else:
+            assert_dataframes_equal(single_df, bulk[arxiv_code], f"get_extended_content({arxiv_code}) differs")
+
+    bulk = paper_db.load_repositories(arxiv_codes)
+    for arxiv_code in arxiv_codes:
+        single_df = paper_db.load_repositories(arxiv_code)
+        assert_dataframes_equal(single_df, bulk[arxiv_code], f"load_repositories({arxiv_code}) differs")
@@ -0,0 +1,87 @@
+"""Test the two-level query embedding cache: LRU eviction, SQLite persistence and TTL expiry."""
+
+import pytest
+from types import SimpleNamespace
+import os, sys
+from dotenv import load_dotenv
+load_dotenv()
+
+PROJECT_PATH = os.getenv('PROJECT_PATH', '/app')
+sys.path.append(PROJECT_PATH)
+
+import utils.query_embedding_cache as qec
+from utils.query_embedding_cache import QueryEmbeddingCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(qec, "time", SimpleNamespace(time=clock.time))
+    return clock
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "query_embeddings.sqlite")
+
+def vec(i):
+    return [float(i), 0.5, -1.0]
+
+def test_normalized_queries_share_an_entry(path, clock):
+    cache = QueryEmbeddingCache(path=path)
+    cache.put_many(["  KV cache   Compression "], [vec(1)], "voyage")
+    assert cache.get_many(["kv cache compression"], "voyage") == {"kv cache compression": vec(1)}
+    assert cache.get_many(["kv cache compression"], "gte") == {}
+
+def test_memory_lru_evicts_least_recently_used(clock):
+    cache = QueryEmbeddingCache(path=None, memory_entries=2)
+    cache.put_many(["a", "b"], [vec(1), vec(2)], "voyage")
+    cache.get_many(["a"], "voyage")
+    cache.put_many(["c"], [vec(3)], "voyage")
+    ## 'b' was the least recently used entry.
+    assert set(cache.get_many(["a", "b", "c"], "voyage")) == {"a", "c"}
+    assert cache.stats == {"memory_hits": 3, "disk_hits": 0, "misses": 1}
+
+def test_sqlite_persists_across_instances(path, clock):
+    QueryEmbeddingCache(path=path).put_many(["a", "b"], [vec(1), vec(2)], "voyage")
+    cache = QueryEmbeddingCache(path=path)
+    assert cache.get_many(["a", "b", "c"], "voyage") == {"a": vec(1), "b": vec(2)}
+    assert cache.stats == {"memory_hits": 0, "disk_hits": 2, "misses": 1}
+    ## Disk hits are promoted to memory.
+    cache.get_many(["a"], "voyage")
+    assert cache.stats["memory_hits"] == 1
+
+def test_disk_evicts_least_recently_accessed(path, clock):
+    cache = QueryEmbeddingCache(path=path, disk_entries=2)
+    cache.put_many(["a"], [vec(1)], "voyage")
+    clock.now += 1
+    cache.put_many(["b"], [vec(2)], "voyage")
+    clock.now += 1
+    QueryEmbeddingCache(path=path).get_many(["a"], "voyage")
+    clock.now += 1
+    cache.put_many(["c"], [vec(3)], "voyage")
+    assert set(QueryEmbeddingCache(path=path).get_many(["a", "b", "c"], "voyage")) == {"a", "c"}
+
+def test_ttl_expires_memory_and_disk_entries(path, clock):
+    cache = QueryEmbeddingCache(path=path, ttl_seconds=100)
+    cache.put_many(["a"], [vec(1)], "voyage")
+    clock.now += 50
+    assert cache.get_many(["a"], "voyage") == {"a": vec(1)}
+    clock.now += 51
+    ## Expired in memory, and also on disk, so it is a miss rather than a stale hit.
+    assert cache.get_many(["a"], "voyage") == {}
+    assert QueryEmbeddingCache(path=path, ttl_seconds=100).get_many(["a"], "voyage") == {}
+
+def test_ttl_counts_from_creation_for_promoted_entries(path, clock):
+    QueryEmbeddingCache(path=path, ttl_seconds=100).put_many(["a"], [vec(1)], "voyage")
+    clock.now += 80
+    cache = QueryEmbeddingCache(path=path, ttl_seconds=100)
+    assert cache.get_many(["a"], "voyage") == {"a": vec(1)}
+    clock.now += 30
+    ## Promoting to memory at t=80 does not extend the entry's life past t=100.
+    assert cache.get_many(["a"], "voyage") == {}
@@ -0,0 +1,74 @@
+"""Test the fast rerankers' score labelling and dispatch with fake embeddings and cross-encoder scores."""
+
+import pytest
+import numpy as np
+from types import SimpleNamespace
+from unittest.mock import patch
+import os, sys
+from dotenv import load_dotenv
+load_dotenv()
+
+PROJECT_PATH = os.getenv('PROJECT_PATH', '/app')
+sys.path.append(PROJECT_PATH)
+
+import utils.rerankers as rerankers
+
+def documents(codes):
+    return [SimpleNamespace(arxiv_code=code, title=f"Title {code}", abstract="Abstract") for code in codes]
+
+def labels(reranked):
+    return [d.selected for d in sorted(reranked.documents, key=lambda d: d.document_id)]
+
+def unit(angle):
+    """2-d unit vector at `angle` radians, so its cosine with [1, 0] is cos(angle)."""
+    return [np.cos(angle), np.sin(angle)]
+
+def test_label_scores_thresholds_are_inclusive():
+    reranked = rerankers.label_scores(np.array([0.7, 0.69, 0.55, 0.54]), 0.7, 0.55, "test")
+    assert labels(reranked) == [1.0, 0.5, 0.5, 0.0]
+    assert [d.document_id for d in reranked.documents] == [0, 1, 2, 3]
+
+def test_embedding_reranker_labels_by_cosine():
+    ## Cosines with the question: 0.9, 0.6, 0.3; the last code has no stored vector.
+    codes = ["a", "b", "c", "missing"]
+    matrix = np.array([unit(np.arccos(c)) for c in (0.9, 0.6, 0.3)], dtype=np.float32) * 5
+    with patch.object(rerankers.embedding_db, "load_embedding_matrix", return_value=(matrix, ["a", "b", "c"])), \
+         patch.object(rerankers, "convert_query_to_vector", return_value=[2.0, 0.0]):
+        reranked = rerankers.EmbeddingReranker().rerank("question", documents(codes))
+    assert labels(reranked) == [1.0, 0.5, 0.0, 0.0]
+
+def test_embedding_reranker_custom_thresholds():
+    matrix = np.array([unit(np.arccos(0.6))], dtype=np.float32)
+    with patch.object(rerankers.embedding_db, "load_embedding_matrix", return_value=(matrix, ["a"])), \
+         patch.object(rerankers, "convert_query_to_vector", return_value=[1.0, 0.0]):
+        reranked = rerankers.EmbeddingReranker(high_threshold=0.5).rerank("question", documents(["a"]))
+    assert labels(reranked) == [1.0]
+
+def test_cross_encoder_reranker_labels_by_sigmoid():
+    ## Logits whose sigmoids are ~0.88, 0.5, ~0.27 and ~0.05.
+    logits = [2.0, 0.0, -1.0, -3.0]
+
+    class FakeCrossEncoder:
+        def predict(self, pairs, batch_size):
+            assert pairs[0] == ("question", "Title a. Abstract")
+            return logits[: len(pairs)]
+
+    with patch.object(rerankers, "_load_cross_encoder", return_value=FakeCrossEncoder()):
+        reranked = rerankers.CrossEncoderReranker().rerank("question", documents(["a", "b", "c", "d"]))
+    assert labels(reranked) == [1.0, 1.0, 0.5, 0.0]
+
+@pytest.mark.parametrize("name, cls", [
+    ("llm", rerankers.LLMReranker),
+    ("embedding", rerankers.EmbeddingReranker),
+    ("cross_encoder", rerankers.CrossEncoderReranker),
+])
+def test_get_reranker_dispatch(name, cls):
+    reranker = rerankers.get_reranker(name)
+    assert type(reranker) is cls and reranker.name == name
+
+def test_get_reranker_passes_kwargs_and_rejects_unknown():
+    assert rerankers.get_reranker("embedding", high_threshold=0.8).high_threshold == 0.8
+    with pytest.raises(ValueError):
+        rerankers.get_reranker("bm25")
+    with pytest.raises(TypeError):
+        rerankers.Reranker()
@@ -0,0 +1,71 @@
+"""Test token budgeting: back matter goes first, cuts land on paragraph boundaries."""
+
+import os, sys
+from dotenv import load_dotenv
+load_dotenv()
+
+PROJECT_PATH = os.getenv('PROJECT_PATH', '/app')
+sys.path.append(PROJECT_PATH)
+
+import utils.token_budget as token_budget
+from utils.token_budget import count_tokens, fit_to_budget, split_sections
+
+class WordEncoding:
+    """One token per whitespace-separated word, so tests need no tiktoken download."""
+
+    name = "words"
+
+    def encode(self, text, disallowed_special=()):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+ENC = WordEncoding()
+
+def paragraph(n, word="body"):
+    return " ".join([word] * n) + "\n\n"
+
+PAPER = (
+    "# Title\n\n" + paragraph(20)
+    + "## 1 Introduction\n\n" + paragraph(30) + paragraph(30)
+    + "## 2 Method\n\n" + paragraph(40)
+    + "## References\n\n" + paragraph(100, "ref")
+    + "## A Appendix\n\n" + paragraph(100, "app")
+)
+
+def test_split_sections_flags_back_matter():
+    flags = [is_back for _, is_back in split_sections(PAPER)]
+    assert flags == [False, False, False, True, True]
+
+def test_short_document_is_untouched():
+    assert fit_to_budget(PAPER, 10_000, encoding=ENC) == PAPER
+
+def test_back_matter_dropped_before_body():
+    trimmed = fit_to_budget(PAPER, 200, encoding=ENC)
+    assert "ref" not in trimmed and "app" not in trimmed
+    assert trimmed.endswith(paragraph(40))
+
+def test_body_cut_on_paragraph_boundary():
+    marker = "\n\n[cut]"
+    trimmed = fit_to_budget(PAPER, 80, encoding=ENC, marker=marker)
+    assert count_tokens(trimmed, encoding=ENC) <= 80
+    assert trimmed.endswith(marker)
+    body = trimmed[: -len(marker)]
+    assert body.rstrip().endswith("body") and "Method" not in body
+    assert body.count("body") in (20, 50)
+
+def test_oversized_first_paragraph_is_hard_cut():
+    trimmed = fit_to_budget(paragraph(500), 50, encoding=ENC)
+    assert count_tokens(trimmed, encoding=ENC) <= 50
+
+def test_budget_smaller_than_marker_never_grows_the_text():
+    document = paragraph(50)
+    trimmed = fit_to_budget(document, 2, encoding=ENC, marker=" ...[continued] marker text")
+    assert trimmed == " ...[continued] marker text"
+
+def test_count_cache_keeps_digests_not_texts():
+    document = paragraph(30, "cached")
+    assert count_tokens(document, encoding=ENC) == 30
+    assert count_tokens(document, encoding=ENC) == 30
+    assert all(document not in key for key in token_budget._token_counts)
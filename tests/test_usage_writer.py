@@ -0,0 +1,167 @@
+"""Test the background token usage writer: batching, non-blocking submits and spool replay."""
+
+import glob
+import json
+import time
+import pytest
+import subprocess
+import os, sys
+from dotenv import load_dotenv
+load_dotenv()
+
+PROJECT_PATH = os.getenv('PROJECT_PATH', '/app')
+sys.path.append(PROJECT_PATH)
+
+from utils.db.usage_writer import UsageLogWriter
+
+class FakeTable:
+    """Stand-in for insert_token_usage_rows; `down` simulates an unreachable DB."""
+
+    def __init__(self, delay=0.0):
+        self.rows = []
+        self.batches = []
+        self.down = False
+        self.delay = delay
+        self.bad_ids = set()
+
+    def insert_rows(self, rows):
+        time.sleep(self.delay)
+        if self.down:
+            raise ConnectionError("could not connect to server")
+        if any(r["id"] in self.bad_ids for r in rows):
+            raise ValueError("invalid input syntax")
+        self.batches.append(len(rows))
+        self.rows.extend(rows)
+
+def record(i):
+    return {"id": str(i), "model_name": "fake", "prompt_tokens": i}
+
+@pytest.fixture
+def spool(tmp_path):
+    return str(tmp_path / "spool.jsonl")
+
+def test_flushes_in_batches_by_size(spool):
+    table = FakeTable()
+    writer = UsageLogWriter(table.insert_rows, flush_size=10, flush_interval=60, spool_path=spool)
+    for i in range(25):
+        writer.submit(record(i))
+    deadline = time.monotonic() + 2
+    while len(table.rows) < 20 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert table.batches[:2] == [10, 10]
+    writer.close()
+    assert [r["id"] for r in table.rows] == [str(i) for i in range(25)]
+
+def test_flushes_on_interval(spool):
+    table = FakeTable()
+    writer = UsageLogWriter(table.insert_rows, flush_size=100, flush_interval=0.05, spool_path=spool)
+    writer.submit(record(1))
+    time.sleep(0.3)
+    assert len(table.rows) == 1
+    writer.close()
+
+def test_submit_never_blocks_on_slow_db(spool):
+    table = FakeTable(delay=0.5)
+    writer = UsageLogWriter(table.insert_rows, flush_size=1, flush_interval=60, spool_path=spool)
+    start = time.perf_counter()
+    for i in range(50):
+        writer.submit(record(i))
+    assert time.perf_counter() - start < 0.1
+    writer.close(timeout=5)
+    assert len(table.rows) == 50
+
+def test_spools_when_db_down_and_replays(spool):
+    table = FakeTable()
+    table.down = True
+    writer = UsageLogWriter(table.insert_rows, flush_size=100, flush_interval=60, spool_path=spool)
+    for i in range(3):
+        writer.submit(record(i))
+    assert writer.flush()
+    assert table.rows == [] and os.path.exists(spool)
+    assert writer.stats["spooled"] == 3
+
+    ## A later flush, even from another writer (e.g. the next run), replays the spool first.
+    writer.close()
+    table.down = False
+    writer = UsageLogWriter(table.insert_rows, flush_size=100, flush_interval=60, spool_path=spool)
+    writer.submit(record(3))
+    writer.close()
+    assert [r["id"] for r in table.rows] == ["0", "1", "2", "3"]
+    assert table.batches == [4]
+    assert not os.path.exists(spool)
+    assert writer.stats["replayed"] == 3
+
+def test_failed_replay_keeps_spool_intact(spool):
+    table = FakeTable()
+    table.down = True
+    writer = UsageLogWriter(table.insert_rows, flush_size=100, flush_interval=60, spool_path=spool)
+    writer.submit(record(0))
+    writer.flush()
+    writer.submit(record(1))
+    writer.flush()
+    writer.close()
+    with open(spool) as f:
+        assert len(f.readlines()) == 2
+
+def test_rejected_spool_is_quarantined(spool):
+    table = FakeTable()
+    table.bad_ids = {"0"}
+    writer = UsageLogWriter(table.insert_rows, flush_size=100, flush_interval=60, spool_path=spool)
+    writer.submit(record(0))
+    writer.flush()
+    assert table.rows == [] and os.path.exists(spool)
+
+    ## The bad spooled row must not block the fresh ones.
+    writer.submit(record(1))
+    writer.flush()
+    writer.submit(record(2))
+    writer.close()
+    assert [r["id"] for r in table.rows] == ["1", "2"]
+    assert not os.path.exists(spool)
+    with open(f"{spool}.rejected") as f:
+        assert [json.loads(line)["id"] for line in f] == ["0"]
+    assert writer.stats["rejected"] == 1
+
+def test_unreadable_spool_lines_are_rejected(spool):
+    with open(spool, "w") as f:
+        f.write(json.dumps(record(0)) + "\n")
+        f.write('{"id": "1", "model_na\n')
+        f.write(json.dumps(record(2)) + "\n")
+    table = FakeTable()
+    writer = UsageLogWriter(table.insert_rows, flush_size=100, flush_interval=60, spool_path=spool)
+    writer.submit(record(3))
+    writer.close()
+    assert [r["id"] for r in table.rows] == ["0", "2", "3"]
+    with open(f"{spool}.rejected") as f:
+        assert f.read() == '{"id": "1", "model_na\n'
+    assert not glob.glob(f"{spool}.claim.*")
+
+def test_claims_of_dead_processes_are_replayed(spool):
+    ## A process that died between claiming the spool and storing it.
+    child = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    with open(f"{spool}.claim.{int(child.stdout)}.deadbeef", "w") as f:
+        f.write(json.dumps(record(0)) + "\n")
+    ## Claims of live processes are left alone.
+    live_claim = f"{spool}.claim.{os.getppid()}.cafebabe"
+    with open(live_claim, "w") as f:
+        f.write(json.dumps(record(9)) + "\n")
+    table = FakeTable()
+    writer = UsageLogWriter(table.insert_rows, flush_size=100, flush_interval=60, spool_path=spool)
+    writer.submit(record(1))
+    writer.close()
+    assert [r["id"] for r in table.rows] == ["0", "1"]
+    assert glob.glob(f"{spool}.claim.*") == [live_claim]
+
+def test_writer_thread_survives_write_errors(spool):
+    table = FakeTable()
+    writer = UsageLogWriter(table.insert_rows, flush_size=100, flush_interval=60, spool_path=spool)
+    claim_spool = writer._claim_spool
+    def failing_claim():
+        writer._claim_spool = claim_spool
+        raise OSError("disk full")
+    writer._claim_spool = failing_claim
+    writer.submit(record(0))
+    assert writer.flush()
+    writer.submit(record(1))
+    writer.close()
+    assert [r["id"] for r in table.rows] == ["1"]
@@ -1,11 +1,14 @@
 from pydantic import BaseModel
-from typing import List, Tuple, Optional, Callable
+from typing import List, Tuple, Optional, Callable, Iterator
 import pandas as pd
 import numpy as np
 import datetime
 import json
 import os, re
+import time
+import logging
 import boto3
+from concurrent.futures import Future, ThreadPoolExecutor
 
 from langchain.retrievers import ContextualCompressionRetriever
 from langchain.retrievers.document_compressors import CohereRerank
@@ -16,13 +19,16 @@ from langchain.prompts.chat import ChatPromptTemplate
 from langchain.chains import LLMChain
 
 from utils.custom_langchain import NewCohereEmbeddings, NewPGVector
-from utils.instruct import run_instructor_query
+from utils.instruct import run_instructor_query, stream_instructor_query
+from utils.rerankers import LLMReranker, get_reranker
+from utils.embeddings import convert_query_to_vector
 import utils.pydantic_objects as po
 import utils.prompts as ps
 from utils.db import (
     db_utils,
     paper_db,
     embedding_db,
+    answer_cache_db,
 )
 
 CONNECTION_STRING = (
@@ -32,6 +38,13 @@ CONNECTION_STRING = (
 
 VS_EMBEDDING_MODEL = "voyage"
 
+## Shared pool used to overlap the blocking LLM and DB stages of a query.
+query_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llmpedia_query")
+## Start the search criteria call alongside the action decision. Saves the decision's
+## latency on LLM questions, but the call is almost never cancelled in time, so
+## non-LLM questions and cached answers pay for it anyway (see xx_bench_query_pipeline).
+SPECULATIVE_QUERY_OBJECT = os.getenv("LLMPEDIA_SPECULATIVE_QUERY", "false").lower() == "true"
+
 report_sections_map = {
     "scratchpad": "Scratchpad",
     "new_developments_findings": "New Development & Findings",
@@ -132,6 +145,23 @@ def add_links_to_text_blob(response: str):
     return re.sub(r"arxiv:(\d{4}\.\d{4,5})", repl, response)
 
 
+def add_links_to_text_stream(chunks: Iterator[str]) -> Iterator[str]:
+    """Apply `add_links_to_text_blob` to streamed text.
+
+    Text after the last whitespace is held back until more arrives, so an arxiv
+    code split across chunks is linked whole.
+    """
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        cut = max(pending.rfind(" "), pending.rfind("\n"))
+        if cut >= 0:
+            yield add_links_to_text_blob(pending[: cut + 1])
+            pending = pending[cut + 1 :]
+    if pending:
+        yield add_links_to_text_blob(pending)
+
+
 def extract_arxiv_codes(text: str):
     """Extract unique arxiv codes from the text."""
     arxiv_codes = re.findall(r"arxiv:(\d{4}\.\d{4,5})", text)
@@ -225,11 +255,11 @@ class Document(BaseModel):
 
 query_config_json = """
 {
-  "title": "LOWER(a.title) LIKE LOWER('%%%s%%')",
-  "min_publication_date": "a.published >= '%s'",
-  "max_publication_date": "a.published <= '%s'",
-  "topic_categories": "t.topic IN ('%s')",
-  "min_citations": "s.citation_count > %d",
+  "title": "to_tsvector('english', a.title) @@ plainto_tsquery('english', :title)",
+  "min_publication_date": "a.published >= CAST(:min_publication_date AS DATE)",
+  "max_publication_date": "a.published <= CAST(:max_publication_date AS DATE)",
+  "topic_categories": "t.topic = ANY(:topic_categories)",
+  "min_citations": "s.citation_count > :min_citations",
   "semantic_search_queries": "(%s)"
 }
 """
@@ -286,17 +316,7 @@ def generate_query_object(user_question: str, llm_model: str):
 def rerank_documents_new(
     user_question: str, documents: list, llm_model="gpt-4o", temperature=0.2
 ) -> po.RerankedDocuments:
-    system_message = "You are an expert system that can identify and select relevant arxiv papers that can be used to answer a user query."
-    rerank_msg = ps.create_rerank_user_prompt(user_question, documents)
-    response = run_instructor_query(
-        system_message,
-        rerank_msg,
-        po.RerankedDocuments,
-        llm_model=llm_model,
-        temperature=temperature,
-        process_id="rerank_documents",
-    )
-    return response
+    return LLMReranker(llm_model, temperature).rerank(user_question, documents)
 
 
 def resolve_query(
@@ -324,6 +344,32 @@ def resolve_query(
     return response
 
 
+def resolve_query_stream(
+    user_question: str,
+    documents: list[Document],
+    response_length: int,
+    llm_model: str,
+    custom_instructions: Optional[str] = None,
+) -> Iterator[str]:
+    """Streaming variant of `resolve_query`, yielding increments of the `response` field."""
+    system_message = "You are GPT Maestro, an AI expert focused on Large Language Models. Answer the user query leveraging the information provided in the context. Pay close attention to the provided guidelines."
+    user_message = ps.create_resolve_user_prompt(
+        user_question=user_question,
+        documents=documents,
+        response_length=response_length,
+        custom_instructions=custom_instructions,
+    )
+    return stream_instructor_query(
+        system_message=system_message,
+        user_message=user_message,
+        model=po.ResolveQuery,
+        llm_model=llm_model,
+        temperature=0.8,
+        process_id="resolve_query",
+        stream_field="response",
+    )
+
+
 def resolve_query_other(user_question: str) -> str:
     """Decide the query action based on the user question."""
     system_message = "You are the GPT Maestro, maintainer of the LLMpedia, a web-based Large Language Model encyclopedia and collection of research papers. You received the following unrelated comment from a user via our chat based system. Please respond to it in a friendly, yet serious and very concise (less than 20 words) manner."
@@ -338,6 +384,18 @@ def resolve_query_other(user_question: str) -> str:
     return response
 
 
+def report_stage(
+    stage: str,
+    start: float,
+    timings: dict,
+    progress_callback: Optional[Callable[[str], None]] = None,
+) -> None:
+    """Record a stage's wall-clock time and surface it through the progress callback."""
+    timings[stage] = time.perf_counter() - start
+    if progress_callback:
+        progress_callback(f"Finished {stage.replace('_', ' ')} in {timings[stage]:.1f}s")
+
+
 def log_debug(msg: str, data: any = None, indent_level: int = 0):
     """Helper function to print debug information in a clean, structured way."""
     indent = "  " * indent_level
@@ -430,19 +488,28 @@ def get_paper_markdown(arxiv_code: str) -> Tuple[str, bool]:
         return f"Error loading paper content: {str(e)}", False
 
 
-def query_llmpedia_new(
+def select_llmpedia_sources(
     user_question: str,
-    response_length: int = 500,
-    query_llm_model: str = "claude-3-7-sonnet-20250219",
-    rerank_llm_model: str = "gemini/gemini-2.0-flash",
-    response_llm_model: str = "claude-3-7-sonnet-20250219",
-    max_sources: int = 25,
-    debug: bool = False,
-    progress_callback: Optional[Callable[[str], None]] = None,
-    custom_instructions: Optional[str] = None,
-    show_only_sources: bool = False,
-) -> Tuple[str, List[str], List[str]]:
-    """Query LLMpedia with customized response parameters."""
+    response_length: int,
+    query_llm_model: str,
+    rerank_llm_model: str,
+    max_sources: int,
+    debug: bool,
+    progress_callback: Optional[Callable[[str], None]],
+    show_only_sources: bool,
+    timings: dict,
+    reranker: str = "llm",
+    cache_future: Optional[Future] = None,
+) -> Tuple[Optional[Tuple[str, List[str], List[str]]], List[Document]]:
+    """Run the LLMpedia pipeline up to (not including) answer generation.
+
+    Returns (early_result, documents): `early_result` is the final
+    (answer, referenced_codes, other_codes) when no answer needs generating
+    (cached answer, non-LLM question, no sources, or `show_only_sources`);
+    otherwise None and `documents` are the selected sources with their notes loaded.
+    `cache_future` is a pending `lookup_answer_cache`, awaited once the action
+    decision has been submitted so both round-trips overlap.
+    """
     if progress_callback:
         progress_callback("Generating semantic search query...")
     if debug:
@@ -457,14 +524,35 @@ def query_llmpedia_new(
             },
         )
 
-    action = decide_query_action(user_question)
+    start = time.perf_counter()
+    action_future = query_executor.submit(decide_query_action, user_question)
+    query_future = None
+    if SPECULATIVE_QUERY_OBJECT:
+        query_future = query_executor.submit(
+            generate_query_object, user_question=user_question, llm_model=query_llm_model
+        )
+    if cache_future is not None:
+        _, cached = cache_future.result()
+        report_stage("answer_cache_lookup", start, timings, progress_callback)
+        if cached is not None:
+            if query_future is not None:
+                query_future.cancel()
+            if debug:
+                log_debug("Answer served from cache", indent_level=1)
+            return cached, []
+    action = action_future.result()
+    report_stage("query_decision", start, timings, progress_callback)
     if debug:
         log_debug("Query action decision:", action.model_dump(), 1)
 
     if action.llm_query:
-        query_obj = generate_query_object(
-            user_question=user_question, llm_model=query_llm_model
-        )
+        if query_future is not None:
+            query_obj = query_future.result()
+        else:
+            query_obj = generate_query_object(
+                user_question=user_question, llm_model=query_llm_model
+            )
+        report_stage("search_criteria", start, timings, progress_callback)
         if debug:
             log_debug("Generated search criteria:", query_obj.model_dump(), 2)
 
@@ -491,12 +579,28 @@ def query_llmpedia_new(
         ## Fetch results.
         query_obj.topic_categories = None
         criteria_dict = query_obj.model_dump(exclude_none=True)
-        criteria_dict["limit"] = max_sources * 2
-        sql = embedding_db.generate_semantic_search_query(
-            criteria_dict, query_config, embedding_model=VS_EMBEDDING_MODEL
+        ## Fused ranking is tighter than vector-only, so the rerank pool can be smaller.
+        criteria_dict["limit"] = max_sources + max_sources // 2
+        start = time.perf_counter()
+        ## Notes are only needed to resolve, so they are fetched while reranking.
+        documents = embedding_db.hybrid_search(
+            criteria_dict,
+            query_config,
+            embedding_model=VS_EMBEDDING_MODEL,
+            include_notes=False,
+        )
+        report_stage("search", start, timings, progress_callback)
+        if debug:
+            log_debug(
+                "Retrieval latency (ms):",
+                {leg: round(t * 1000) for leg, t in documents.attrs["timings"].items()},
+                2,
+            )
+        notes_future = query_executor.submit(
+            embedding_db.load_search_notes,
+            documents["arxiv_code"].tolist(),
+            per_source_words * 3,
         )
-
-        documents = db_utils.execute_read_query(sql)
 
         documents = documents.to_dict(orient="records")
         documents = [
@@ -506,7 +610,7 @@ def query_llmpedia_new(
                 published_date=d["published_date"].to_pydatetime(),
                 citations=int(d["citations"]),
                 abstract=d["abstract"],
-                notes=d["notes"],
+                notes="",
                 distance=float(d["similarity_score"]),
             )
             for d in documents
@@ -530,12 +634,17 @@ def query_llmpedia_new(
                 "I don't know about that my friend. Try asking something else.",
                 [],
                 [],
-            )
+            ), []
 
         ## Rerank.
-        reranked_documents = rerank_documents_new(
-            user_question, documents, llm_model=rerank_llm_model
-        )
+        start = time.perf_counter()
+        if reranker == "llm":
+            reranked_documents = rerank_documents_new(
+                user_question, documents, llm_model=rerank_llm_model
+            )
+        else:
+            reranked_documents = get_reranker(reranker).rerank(user_question, documents)
+        report_stage("reranking", start, timings, progress_callback)
 
         if debug:
             log_debug("Reranking analysis:", indent_level=2)
@@ -611,7 +720,7 @@ def query_llmpedia_new(
                 "I don't know about that my friend. Try asking something else.",
                 [],
                 [],
-            )
+            ), []
 
         ## Resolve.
         if show_only_sources:
@@ -621,46 +730,301 @@ def query_llmpedia_new(
                     indent_level=2,
                 )
             arxiv_codes = [d.arxiv_code for d in filtered_documents]
-            return f"### Documents related to: *{user_question}*", arxiv_codes, []
-
-        if progress_callback:
-            progress_callback("Generating response...")
-
-        answer_obj = resolve_query(
-            user_question,
-            filtered_documents,
-            response_length,
-            llm_model=response_llm_model,
-            custom_instructions=custom_instructions,
-        )
-        if debug:
-            log_debug("Resolved query:", answer_obj.model_dump(), 2)
-        answer = answer_obj.response
-        answer_augment = add_links_to_text_blob(answer)
-        referenced_arxiv_codes = extract_arxiv_codes(answer_augment)
-        filtered_arxiv_codes = [d.arxiv_code for d in filtered_documents]
-        filtered_arxiv_codes = [
-            d for d in filtered_arxiv_codes if d not in referenced_arxiv_codes
-        ]
-
-        if debug:
-            log_debug(
-                "Response statistics:",
-                {
-                    "response_length": len(answer.split()),
-                    "referenced_papers": len(referenced_arxiv_codes),
-                    "additional_relevant": len(filtered_arxiv_codes),
-                },
-                2,
-            )
+            return (f"### Documents related to: *{user_question}*", arxiv_codes, []), []
 
-        return answer_augment, referenced_arxiv_codes, filtered_arxiv_codes
+        notes = notes_future.result()
+        for doc in filtered_documents:
+            doc.notes = notes.get(doc.arxiv_code, "")
+        return None, filtered_documents
 
     else:
+        ## Discard the speculative criteria (cancel only succeeds if not yet started).
+        if query_future is not None:
+            query_future.cancel()
         if debug:
             log_debug(
                 "Query classified as non-LLM related, generating simple response",
                 indent_level=1,
             )
         answer = resolve_query_other(user_question)
-        return answer, [], []
+        return (answer, [], []), []
+
+
+def answer_cache_settings(
+    query_llm_model: str,
+    rerank_llm_model: str,
+    response_llm_model: str,
+    max_sources: int,
+    reranker: str,
+) -> dict:
+    """Pipeline settings that change the answer, so entries are only reused under the same ones."""
+    return {
+        "query_llm_model": query_llm_model,
+        "rerank_llm_model": rerank_llm_model,
+        "response_llm_model": response_llm_model,
+        "max_sources": max_sources,
+        "reranker": reranker,
+    }
+
+
+def lookup_answer_cache(
+    user_question: str,
+    response_length: int,
+    custom_instructions: Optional[str],
+    settings: dict,
+) -> Tuple[Optional[List[float]], Optional[Tuple[str, List[str], List[str]]]]:
+    """Embed the question and look for a cached answer; returns (embedding, cached_result)."""
+    try:
+        question_embedding = convert_query_to_vector(user_question, VS_EMBEDDING_MODEL)
+        cached = answer_cache_db.get_cached_answer(
+            question_embedding,
+            VS_EMBEDDING_MODEL,
+            response_length,
+            custom_instructions,
+            settings,
+        )
+        return question_embedding, cached
+    except Exception as e:
+        logging.warning(f"Answer cache lookup failed: {e}")
+        return None, None
+
+
+def store_answer_cache(
+    user_question: str,
+    question_embedding: Optional[List[float]],
+    response_length: int,
+    custom_instructions: Optional[str],
+    answer: str,
+    referenced_codes: List[str],
+    other_codes: List[str],
+    settings: dict,
+) -> None:
+    """Store a generated answer; failures never affect the response."""
+    if question_embedding is None:
+        return
+    try:
+        answer_cache_db.store_cached_answer(
+            user_question,
+            question_embedding,
+            VS_EMBEDDING_MODEL,
+            response_length,
+            custom_instructions,
+            answer,
+            referenced_codes,
+            other_codes,
+            settings,
+        )
+    except Exception as e:
+        logging.warning(f"Answer cache store failed: {e}")
+
+
+def query_llmpedia_new(
+    user_question: str,
+    response_length: int = 500,
+    query_llm_model: str = "claude-3-7-sonnet-20250219",
+    rerank_llm_model: str = "gemini/gemini-2.0-flash",
+    response_llm_model: str = "claude-3-7-sonnet-20250219",
+    max_sources: int = 25,
+    debug: bool = False,
+    progress_callback: Optional[Callable[[str], None]] = None,
+    custom_instructions: Optional[str] = None,
+    show_only_sources: bool = False,
+    reranker: str = "llm",
+    use_cache: bool = True,
+) -> Tuple[str, List[str], List[str]]:
+    """Query LLMpedia with customized response parameters.
+
+    `reranker` picks the relevance stage: "llm" (uses `rerank_llm_model`),
+    or the faster "embedding" / "cross_encoder" (see utils.rerankers).
+    With `use_cache`, answers to near-identical questions (same length,
+    custom instructions, models, `max_sources` and reranker) are served from
+    the answer cache.
+    """
+    timings = {}
+    question_embedding = None
+    cache_settings = answer_cache_settings(
+        query_llm_model, rerank_llm_model, response_llm_model, max_sources, reranker
+    )
+    cache_future = None
+    if use_cache and not show_only_sources:
+        cache_future = query_executor.submit(
+            lookup_answer_cache,
+            user_question,
+            response_length,
+            custom_instructions,
+            cache_settings,
+        )
+
+    early_result, filtered_documents = select_llmpedia_sources(
+        user_question,
+        response_length,
+        query_llm_model,
+        rerank_llm_model,
+        max_sources,
+        debug,
+        progress_callback,
+        show_only_sources,
+        timings,
+        reranker,
+        cache_future,
+    )
+    if early_result is not None:
+        return early_result
+    if cache_future is not None:
+        question_embedding, _ = cache_future.result()
+
+    if progress_callback:
+        progress_callback("Generating response...")
+
+    start = time.perf_counter()
+    answer_obj = resolve_query(
+        user_question,
+        filtered_documents,
+        response_length,
+        llm_model=response_llm_model,
+        custom_instructions=custom_instructions,
+    )
+    report_stage("response", start, timings, progress_callback)
+    if debug:
+        log_debug("Resolved query:", answer_obj.model_dump(), 2)
+        log_debug("Stage timings (s):", {k: round(v, 2) for k, v in timings.items()}, 2)
+    answer = answer_obj.response
+    answer_augment = add_links_to_text_blob(answer)
+    referenced_arxiv_codes = extract_arxiv_codes(answer_augment)
+    filtered_arxiv_codes = [d.arxiv_code for d in filtered_documents]
+    filtered_arxiv_codes = [
+        d for d in filtered_arxiv_codes if d not in referenced_arxiv_codes
+    ]
+
+    if debug:
+        log_debug(
+            "Response statistics:",
+            {
+                "response_length": len(answer.split()),
+                "referenced_papers": len(referenced_arxiv_codes),
+                "additional_relevant": len(filtered_arxiv_codes),
+            },
+            2,
+        )
+
+    store_answer_cache(
+        user_question,
+        question_embedding,
+        response_length,
+        custom_instructions,
+        answer_augment,
+        referenced_arxiv_codes,
+        filtered_arxiv_codes,
+        cache_settings,
+    )
+    return answer_augment, referenced_arxiv_codes, filtered_arxiv_codes
+
+
+class AnswerStream:
+    """Iterable of answer text increments (e.g. for `st.write_stream`).
+
+    `answer`, `referenced_codes` and `other_codes` are complete once the
+    stream has been exhausted, at which point `on_complete` is called.
+    """
+
+    def __init__(
+        self,
+        chunks: Iterator[str],
+        source_codes: List[str],
+        referenced_codes: Optional[List[str]] = None,
+        on_complete: Optional[Callable[["AnswerStream"], None]] = None,
+    ):
+        self._chunks = chunks
+        self.source_codes = source_codes
+        self.answer = ""
+        self.referenced_codes = referenced_codes or []
+        self.other_codes = []
+        self._fixed_references = referenced_codes is not None
+        self._on_complete = on_complete
+
+    def __iter__(self) -> Iterator[str]:
+        for chunk in self._chunks:
+            self.answer += chunk
+            yield chunk
+        if not self._fixed_references:
+            self.referenced_codes = extract_arxiv_codes(self.answer)
+        self.other_codes = [
+            code for code in self.source_codes if code not in self.referenced_codes
+        ]
+        if self._on_complete is not None:
+            self._on_complete(self)
+
+
+def query_llmpedia_stream(
+    user_question: str,
+    response_length: int = 500,
+    query_llm_model: str = "claude-3-7-sonnet-20250219",
+    rerank_llm_model: str = "gemini/gemini-2.0-flash",
+    response_llm_model: str = "claude-3-7-sonnet-20250219",
+    max_sources: int = 25,
+    debug: bool = False,
+    progress_callback: Optional[Callable[[str], None]] = None,
+    custom_instructions: Optional[str] = None,
+    show_only_sources: bool = False,
+    reranker: str = "llm",
+    use_cache: bool = True,
+) -> AnswerStream:
+    """Streaming counterpart of `query_llmpedia_new`; links are added to the text as it arrives."""
+    timings = {}
+    question_embedding = None
+    cache_settings = answer_cache_settings(
+        query_llm_model, rerank_llm_model, response_llm_model, max_sources, reranker
+    )
+    cache_future = None
+    if use_cache and not show_only_sources:
+        cache_future = query_executor.submit(
+            lookup_answer_cache,
+            user_question,
+            response_length,
+            custom_instructions,
+            cache_settings,
+        )
+
+    early_result, filtered_documents = select_llmpedia_sources(
+        user_question,
+        response_length,
+        query_llm_model,
+        rerank_llm_model,
+        max_sources,
+        debug,
+        progress_callback,
+        show_only_sources,
+        timings,
+        reranker,
+        cache_future,
+    )
+    if early_result is not None:
+        answer, referenced_codes, other_codes = early_result
+        return AnswerStream(iter([answer]), other_codes, referenced_codes)
+    if cache_future is not None:
+        question_embedding, _ = cache_future.result()
+
+    if progress_callback:
+        progress_callback("Generating response...")
+
+    chunks = resolve_query_stream(
+        user_question,
+        filtered_documents,
+        response_length,
+        llm_model=response_llm_model,
+        custom_instructions=custom_instructions,
+    )
+    return AnswerStream(
+        add_links_to_text_stream(chunks),
+        [d.arxiv_code for d in filtered_documents],
+        on_complete=lambda stream: store_answer_cache(
+            user_question,
+            question_embedding,
+            response_length,
+            custom_instructions,
+            stream.answer,
+            stream.referenced_codes,
+            stream.other_codes,
+            cache_settings,
+        ),
+    )
@@ -0,0 +1,154 @@
+"""Database operations for the semantic Q&A answer cache."""
+
+import os
+import json
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from .db_utils import execute_write_query, get_engine
+from .embedding_db import vector_literal
+
+## Cosine similarity between questions required to reuse an answer.
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", 0.95))
+ANSWER_CACHE_TTL_DAYS = int(os.getenv("ANSWER_CACHE_TTL_DAYS", 30))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 10_000))
+## A new paper this similar to a cached question would have been a search candidate.
+ANSWER_CACHE_INVALIDATION_SIMILARITY = float(os.getenv("ANSWER_CACHE_INVALIDATION_SIMILARITY", 0.6))
+
+
+def instructions_hash(custom_instructions: Optional[str]) -> str:
+    return hashlib.sha256((custom_instructions or "").strip().encode()).hexdigest()
+
+
+def settings_hash(settings: Optional[Dict[str, Any]]) -> str:
+    """sha256 of the pipeline settings (models, max_sources, reranker) that shape an answer."""
+    return hashlib.sha256(json.dumps(settings or {}, sort_keys=True).encode()).hexdigest()
+
+
+def get_cached_answer(
+    question_embedding: List[float],
+    embedding_type: str,
+    response_length: int,
+    custom_instructions: Optional[str] = None,
+    settings: Optional[Dict[str, Any]] = None,
+    min_similarity: float = ANSWER_CACHE_SIMILARITY,
+) -> Optional[Tuple[str, List[str], List[str]]]:
+    """Get (answer, referenced_codes, other_codes) for the closest cached question, if similar enough."""
+    query = """
+        WITH best AS (
+            SELECT id, answer, referenced_codes, other_codes,
+                   1 - (question_embedding <=> CAST(:embedding AS vector(1024))) AS similarity
+            FROM qna_answer_cache
+            WHERE embedding_type = :embedding_type
+            AND response_length = :response_length
+            AND instructions_hash = :instructions_hash
+            AND settings_hash = :settings_hash
+            AND tstp > NOW() - make_interval(days => :ttl_days)
+            ORDER BY question_embedding <=> CAST(:embedding AS vector(1024))
+            LIMIT 1
+        )
+        UPDATE qna_answer_cache c
+        SET last_hit = NOW(), hit_count = c.hit_count + 1
+        FROM best
+        WHERE c.id = best.id AND best.similarity >= :min_similarity
+        RETURNING best.answer, best.referenced_codes, best.other_codes
+    """
+    params = {
+        "embedding": vector_literal(question_embedding),
+        "embedding_type": embedding_type,
+        "response_length": response_length,
+        "instructions_hash": instructions_hash(custom_instructions),
+        "settings_hash": settings_hash(settings),
+        "ttl_days": ANSWER_CACHE_TTL_DAYS,
+        "min_similarity": min_similarity,
+    }
+    with get_engine().begin() as conn:
+        row = conn.execute(text(query), params).fetchone()
+    if row is None:
+        return None
+    answer, referenced_codes, other_codes = row
+    return answer, list(referenced_codes), list(other_codes)
+
+
+def store_cached_answer(
+    question: str,
+    question_embedding: List[float],
+    embedding_type: str,
+    response_length: int,
+    custom_instructions: Optional[str],
+    answer: str,
+    referenced_codes: List[str],
+    other_codes: List[str],
+    settings: Optional[Dict[str, Any]] = None,
+) -> bool:
+    """Store a generated answer and evict expired / least recently hit entries beyond the size limit."""
+    execute_write_query(
+        """
+        INSERT INTO qna_answer_cache (
+            question, question_embedding, embedding_type, response_length,
+            instructions_hash, settings_hash, answer, referenced_codes, other_codes
+        )
+        VALUES (
+            :question, CAST(:embedding AS vector(1024)), :embedding_type, :response_length,
+            :instructions_hash, :settings_hash, :answer, :referenced_codes, :other_codes
+        )
+        """,
+        {
+            "question": question,
+            "embedding": vector_literal(question_embedding),
+            "embedding_type": embedding_type,
+            "response_length": response_length,
+            "instructions_hash": instructions_hash(custom_instructions),
+            "settings_hash": settings_hash(settings),
+            "answer": answer,
+            "referenced_codes": list(referenced_codes),
+            "other_codes": list(other_codes),
+        },
+    )
+    return evict_cached_answers()
+
+
+def evict_cached_answers(
+    ttl_days: int = ANSWER_CACHE_TTL_DAYS, max_entries: int = ANSWER_CACHE_MAX_ENTRIES
+) -> bool:
+    """Drop entries older than the TTL, then the least recently hit beyond `max_entries`."""
+    return execute_write_query(
+        """
+        DELETE FROM qna_answer_cache
+        WHERE tstp <= NOW() - make_interval(days => :ttl_days)
+        OR id IN (
+            SELECT id FROM qna_answer_cache
+            ORDER BY last_hit DESC
+            OFFSET :max_entries
+        )
+        """,
+        {"ttl_days": ttl_days, "max_entries": max_entries},
+    )
+
+
+def invalidate_cached_answers(
+    arxiv_codes: List[str],
+    embedding_type: str = "voyage",
+    min_similarity: float = ANSWER_CACHE_INVALIDATION_SIMILARITY,
+) -> bool:
+    """Drop cached answers whose question matches any of the given (new) papers' abstracts."""
+    if not arxiv_codes:
+        return True
+    return execute_write_query(
+        """
+        DELETE FROM qna_answer_cache c
+        USING arxiv_embeddings_1024 e
+        WHERE e.arxiv_code = ANY(:arxiv_codes)
+        AND e.doc_type = 'abstract'
+        AND e.embedding_type = :embedding_type
+        AND c.embedding_type = :embedding_type
+        AND 1 - (c.question_embedding <=> e.embedding) > :min_similarity
+        """,
+        {
+            "arxiv_codes": list(arxiv_codes),
+            "embedding_type": embedding_type,
+            "min_similarity": min_similarity,
+        },
+    )
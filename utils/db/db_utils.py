@@ -1,10 +1,13 @@
 """Core database utilities for managing connections and executing queries."""
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.engine import Engine
 from contextlib import contextmanager
 import pandas as pd
+import csv
+import io
 import os
+import threading
 from typing import Any, Union, Optional, Dict, List, Generator
 import psycopg2
 
@@ -19,31 +22,101 @@ db_params = {
 
 database_url = f"postgresql+psycopg2://{db_params['user']}:{db_params['password']}@{db_params['host']}:{db_params['port']}/{db_params['dbname']}"
 
+## Connection pool settings (overridable through environment).
+pool_params = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+    "max_overflow": int(os.getenv("DB_POOL_MAX_OVERFLOW", 10)),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+}
+
+## Process-wide engine state.
+_engine: Optional[Engine] = None
+_engine_pid: Optional[int] = None
+_engine_lock = threading.Lock()
+_connection_stats = {"opened": 0, "checkouts": 0}
+
+
+def _count_connect(dbapi_conn, connection_record) -> None:
+    """Count new physical connections (i.e. TCP+auth handshakes)."""
+    _connection_stats["opened"] += 1
+
+
+def _count_checkout(dbapi_conn, connection_record, connection_proxy) -> None:
+    """Count connection checkouts from the pool."""
+    _connection_stats["checkouts"] += 1
+
+
+def get_engine() -> Engine:
+    """Get the lazily-created, process-wide pooled engine."""
+    global _engine, _engine_pid
+    if _engine is not None and _engine_pid == os.getpid():
+        return _engine
+    with _engine_lock:
+        if _engine is not None and _engine_pid != os.getpid():
+            ## Inherited from parent process; drop its sockets without closing them.
+            _engine.dispose(close=False)
+            _engine = None
+        if _engine is None:
+            _engine = create_engine(database_url, **pool_params)
+            event.listen(_engine, "connect", _count_connect)
+            event.listen(_engine, "checkout", _count_checkout)
+            _engine_pid = os.getpid()
+    return _engine
+
+
+def reset_engine() -> None:
+    """Discard the pooled engine after a fork so the child opens its own connections."""
+    global _engine, _engine_pid, _engine_lock
+    ## The lock may have been held by another parent thread at fork time; that
+    ## thread doesn't exist in the child, so the inherited lock would never be released.
+    _engine_lock = threading.Lock()
+    if _engine is not None:
+        _engine.dispose(close=False)
+    _engine = None
+    _engine_pid = None
+    _connection_stats["opened"] = 0
+    _connection_stats["checkouts"] = 0
+
+
+def dispose_engine() -> None:
+    """Close all pooled connections (e.g. at the end of a workflow step)."""
+    global _engine, _engine_pid
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+        _engine = None
+        _engine_pid = None
+
+
+def get_connection_stats() -> Dict[str, int]:
+    """Get the number of physical connections opened and pool checkouts in this process."""
+    return dict(_connection_stats)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_engine)
+
+
 @contextmanager
 def get_db_engine() -> Generator[Engine, None, None]:
-    """Context manager for database engine to ensure proper disposal."""
-    engine = create_engine(database_url)
-    try:
-        yield engine
-    finally:
-        engine.dispose()
+    """Context manager yielding the shared pooled engine (kept alive across calls)."""
+    yield get_engine()
 
 def execute_read_query(query_string: str, params: Optional[dict] = None, as_dataframe: bool = True) -> Union[pd.DataFrame, Any]:
     """Execute a read query and return results as DataFrame or raw data."""
-    with get_db_engine() as engine:
-        with engine.begin() as conn:
-            if as_dataframe:
-                return pd.read_sql(text(query_string), conn, params=params)
-            else:
-                result = conn.execute(text(query_string), params or {})
-                return result.fetchall()
+    with get_engine().begin() as conn:
+        if as_dataframe:
+            return pd.read_sql(text(query_string), conn, params=params)
+        else:
+            result = conn.execute(text(query_string), params or {})
+            return result.fetchall()
 
 def execute_write_query(query_string: str, params: Optional[dict] = None) -> bool:
     """Execute a write query (INSERT/UPDATE/DELETE) and return success status."""
     try:
-        with get_db_engine() as engine:
-            with engine.begin() as conn:
-                conn.execute(text(query_string), params or {})
+        with get_engine().begin() as conn:
+            conn.execute(text(query_string), params or {})
         return True
     except Exception as e:
         raise e
@@ -114,8 +187,8 @@ def simple_select_query(
             query += f" LIMIT {conditions['LIMIT']}"
         
         # Execute query
-        with get_db_engine() as engine:
-            df = pd.read_sql(text(query), engine, params=params)
+        with get_engine().connect() as conn:
+            df = pd.read_sql(text(query), conn, params=params)
         
         # Post-process DataFrame
         if not df.empty:
@@ -133,10 +206,9 @@ def simple_select_query(
 def get_arxiv_id_list(table_name: str = "arxiv_details") -> List[str]:
     """Get a list of all arxiv codes in the specified table."""
     try:
-        with psycopg2.connect(**db_params) as conn:
-            with conn.cursor() as cur:
-                cur.execute(f"SELECT DISTINCT arxiv_code FROM {table_name}")
-                return [row[0] for row in cur.fetchall() if row[0] and len(row[0]) > 0]
+        with get_engine().connect() as conn:
+            rows = conn.execute(text(f"SELECT DISTINCT arxiv_code FROM {table_name}")).fetchall()
+            return [row[0] for row in rows if row[0] and len(row[0]) > 0]
     except Exception as e:
         raise e
 
@@ -166,19 +238,53 @@ def get_max_table_date(table_name: str, date_col: str = "date") -> Optional[pd.T
     return df["max_date"].iloc[0] if not df.empty else None
 
 
+def _quote_ident(name: str) -> str:
+    """Quote a SQL identifier."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _table_exists(conn, table: str) -> bool:
+    """Check whether a table exists in the current search path."""
+    return conn.execute(text("SELECT to_regclass(:table) IS NOT NULL"), {"table": table}).scalar()
+
+
+def copy_dataframe(
+    conn,
+    df: pd.DataFrame,
+    table: str,
+    chunk_size: Optional[int] = None,
+) -> int:
+    """Stream a DataFrame into an existing table through COPY FROM STDIN (CSV)."""
+    columns = ", ".join(_quote_ident(c) for c in df.columns)
+    copy_sql = f"COPY {_quote_ident(table)} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+    chunk_size = chunk_size or 50_000
+    with conn.connection.cursor() as cur:
+        for start in range(0, len(df), chunk_size):
+            buffer = io.StringIO()
+            df.iloc[start:start + chunk_size].to_csv(
+                buffer, index=False, header=False, na_rep="\\N", quoting=csv.QUOTE_MINIMAL
+            )
+            buffer.seek(0)
+            cur.copy_expert(copy_sql, buffer)
+    return len(df)
+
+
 def upload_dataframe(
     df: pd.DataFrame,
     table: str,
     if_exists: str = "append",
     index: bool = False,
-    chunk_size: Optional[int] = None
+    chunk_size: Optional[int] = None,
+    method: str = "to_sql",
 ) -> bool:
     """ Upload a pandas DataFrame to the specified database table. """
     try:
-        with get_db_engine() as engine:
+        if method == "copy":
+            return upload_dataframe_copy(df, table, if_exists=if_exists, index=index, chunk_size=chunk_size)
+        with get_engine().begin() as conn:
             df.to_sql(
                 name=table,
-                con=engine,
+                con=conn,
                 if_exists=if_exists,
                 index=index,
                 chunksize=chunk_size
@@ -188,6 +294,40 @@ def upload_dataframe(
         raise e
 
 
+def upload_dataframe_copy(
+    df: pd.DataFrame,
+    table: str,
+    if_exists: str = "append",
+    index: bool = False,
+    chunk_size: Optional[int] = None,
+) -> bool:
+    """Bulk load a DataFrame with COPY in one transaction; 'replace' swaps in a freshly loaded table."""
+    if if_exists not in ("append", "replace", "fail"):
+        raise ValueError(f"Invalid if_exists value: {if_exists}")
+    if index:
+        df = df.reset_index()
+
+    with get_engine().begin() as conn:
+        exists = _table_exists(conn, table)
+        if exists and if_exists == "fail":
+            raise ValueError(f"Table '{table}' already exists.")
+
+        if if_exists == "replace" and exists:
+            ## Load into a staging table and swap it in atomically; readers keep
+            ## seeing the old table until the transaction commits.
+            staging = f"{table}__staging"
+            conn.execute(text(f"DROP TABLE IF EXISTS {_quote_ident(staging)}"))
+            df.head(0).to_sql(name=staging, con=conn, if_exists="fail", index=False)
+            copy_dataframe(conn, df, staging, chunk_size)
+            conn.execute(text(f"DROP TABLE {_quote_ident(table)}"))
+            conn.execute(text(f"ALTER TABLE {_quote_ident(staging)} RENAME TO {_quote_ident(table)}"))
+        else:
+            if not exists:
+                df.head(0).to_sql(name=table, con=conn, if_exists="fail", index=False)
+            copy_dataframe(conn, df, table, chunk_size)
+    return True
+
+
 def list_to_pg_array(lst):
     lst = [str(x).replace("arxiv_code:", "") for x in lst]
     lst = [x.replace("arxiv:", "") for x in lst]
@@ -0,0 +1,129 @@
+"""Local memory-mapped mirror of the arxiv_embeddings tables."""
+
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+PROJECT_PATH = os.getenv("PROJECT_PATH", "/app")
+CACHE_DIR = os.path.join(PROJECT_PATH, "data", "embedding_cache")
+
+## Fixed .npy (v1.0) header size so the row count can be rewritten in place on append.
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+NPY_HEADER_SIZE = 128
+
+
+def _npy_header(n_rows: int, dimension: int) -> bytes:
+    """Build a padded .npy header for a C-ordered float32 (n_rows, dimension) array."""
+    header = "{'descr': '<f4', 'fortran_order': False, 'shape': (%d, %d), }" % (n_rows, dimension)
+    pad = NPY_HEADER_SIZE - len(NPY_MAGIC) - 2 - len(header) - 1
+    if pad < 0:
+        raise ValueError("Embedding cache header overflow.")
+    header = (header + " " * pad + "\n").encode("latin1")
+    return NPY_MAGIC + len(header).to_bytes(2, "little") + header
+
+
+class EmbeddingMatrixCache:
+    """On-disk float32 matrix plus id index for one (embedding_type, doc_type) pair.
+
+    Rows are only ever appended. Each appended segment carries its own sha256 so
+    writes never need to re-read existing data, while `validate` checks them all.
+    """
+
+    def __init__(self, embedding_type: str, doc_type: str, dimension: int, cache_dir: str = CACHE_DIR):
+        self.embedding_type = embedding_type
+        self.doc_type = doc_type
+        self.dimension = dimension
+        os.makedirs(cache_dir, exist_ok=True)
+        base = os.path.join(cache_dir, f"{embedding_type}_{doc_type}")
+        self.matrix_path = base + ".npy"
+        self.index_path = base + "_index.json"
+        self.index = self._read_index()
+
+    def _read_index(self) -> dict:
+        if not (os.path.exists(self.index_path) and os.path.exists(self.matrix_path)):
+            return self._empty_index()
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Unreadable embedding cache index {self.index_path}: {str(e)}")
+            return self._empty_index()
+        if index.get("dimension") != self.dimension:
+            return self._empty_index()
+        return index
+
+    def _empty_index(self) -> dict:
+        return {"dimension": self.dimension, "ids": [], "max_tstp": None, "segments": []}
+
+    def _write_index(self) -> None:
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self.index_path)
+
+    @property
+    def ids(self) -> List[str]:
+        return self.index["ids"]
+
+    @property
+    def max_tstp(self) -> Optional[datetime]:
+        tstp = self.index["max_tstp"]
+        return datetime.fromisoformat(tstp) if tstp else None
+
+    def __len__(self) -> int:
+        return len(self.index["ids"])
+
+    def reset(self, matrix: np.ndarray, ids: List[str], max_tstp: Optional[datetime]) -> None:
+        """Replace the cache contents (cold start / rebuild)."""
+        self.index = self._empty_index()
+        with open(self.matrix_path, "wb") as f:
+            f.write(_npy_header(0, self.dimension))
+        self.append(matrix, ids, max_tstp)
+
+    def append(self, matrix: np.ndarray, ids: List[str], max_tstp: Optional[datetime]) -> None:
+        """Append rows to the matrix file and record the new segment."""
+        matrix = np.ascontiguousarray(matrix, dtype="<f4")
+        if len(matrix):
+            start = len(self)
+            with open(self.matrix_path, "r+b") as f:
+                f.seek(NPY_HEADER_SIZE + start * self.dimension * 4)
+                f.write(matrix.tobytes())
+                f.truncate()
+                f.seek(0)
+                f.write(_npy_header(start + len(matrix), self.dimension))
+            self.index["segments"].append(
+                {"start": start, "end": start + len(matrix), "sha256": hashlib.sha256(matrix).hexdigest()}
+            )
+            self.index["ids"].extend(ids)
+        if max_tstp is not None:
+            self.index["max_tstp"] = max_tstp.isoformat()
+        self._write_index()
+
+    def view(self) -> np.ndarray:
+        """Read-only, zero-copy memory-mapped view of the matrix."""
+        if len(self) == 0:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.load(self.matrix_path, mmap_mode="r")
+
+    def validate(self) -> bool:
+        """Check the file shape and every segment checksum against the index."""
+        try:
+            matrix = self.view()
+        except (OSError, ValueError):
+            return False
+        if matrix.shape != (len(self), self.dimension):
+            return False
+        covered = 0
+        for segment in self.index["segments"]:
+            if segment["start"] != covered:
+                return False
+            block = np.ascontiguousarray(matrix[segment["start"]:segment["end"]])
+            if hashlib.sha256(block).hexdigest() != segment["sha256"]:
+                return False
+            covered = segment["end"]
+        return covered == len(self)
@@ -1,11 +1,20 @@
 """Database operations for embedding-related functionality."""
 
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple, Union
 import logging
+import io
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-from .db_utils import execute_read_query, execute_write_query
-from utils.embeddings import convert_query_to_vector
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from .db_utils import execute_read_query, execute_write_query, get_engine
+from .embedding_cache import EmbeddingMatrixCache
+from utils.embeddings import convert_queries_to_vectors
 
 
 ## Constants for embedding dimensions
@@ -15,70 +24,205 @@ EMBEDDING_DIMENSIONS = {
     "voyage": 1024
 }
 
+## Binary COPY framing (see PostgreSQL docs, "COPY ... FORMAT binary").
+PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+PGCOPY_TRAILER = struct.pack("!h", -1)
+PG_EPOCH = datetime(2000, 1, 1)
+
+
+def _encode_text_field(value: str) -> bytes:
+    """Encode a text/varchar field for binary COPY."""
+    data = value.encode("utf-8")
+    return struct.pack("!i", len(data)) + data
+
+
+def _encode_vector_field(vector: np.ndarray) -> bytes:
+    """Encode a float32 vector in pgvector's binary (vector_recv) format."""
+    data = struct.pack("!hh", len(vector), 0) + vector.astype(">f4", copy=False).tobytes()
+    return struct.pack("!i", len(data)) + data
+
+
+def _encode_timestamp_field(value: datetime) -> bytes:
+    """Encode a timestamp without time zone for binary COPY."""
+    delta = value - PG_EPOCH
+    micros = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+    return struct.pack("!iq", 8, micros)
+
+
+def encode_embeddings_copy(
+    arxiv_codes: List[str],
+    doc_type: str,
+    embedding_type: str,
+    embeddings: np.ndarray,
+    tstp: datetime,
+) -> io.BytesIO:
+    """Build a binary COPY payload of (arxiv_code, doc_type, embedding_type, embedding, tstp) rows."""
+    buffer = io.BytesIO()
+    buffer.write(PGCOPY_HEADER)
+    doc_type_field = _encode_text_field(doc_type)
+    embedding_type_field = _encode_text_field(embedding_type)
+    tstp_field = _encode_timestamp_field(tstp)
+    for code, emb in zip(arxiv_codes, embeddings):
+        buffer.write(struct.pack("!h", 5))
+        buffer.write(_encode_text_field(code))
+        buffer.write(doc_type_field)
+        buffer.write(embedding_type_field)
+        buffer.write(_encode_vector_field(emb))
+        buffer.write(tstp_field)
+    buffer.write(PGCOPY_TRAILER)
+    buffer.seek(0)
+    return buffer
+
+
 def store_embeddings_batch(
     arxiv_codes: List[str],
     doc_type: str,
     embedding_type: str,
-    embeddings: List[List[float]],
+    embeddings: Union[List[List[float]], np.ndarray],
 ) -> bool:
     """Store multiple document embeddings in the appropriate arxiv_embeddings table based on dimension."""
     try:
         dimension = EMBEDDING_DIMENSIONS[embedding_type]
-        query = f"""
-            INSERT INTO arxiv_embeddings_{dimension} (arxiv_code, doc_type, embedding_type, embedding, tstp)
-            VALUES (:arxiv_code, :doc_type, :embedding_type, :embedding, :tstp)
-            ON CONFLICT (arxiv_code, doc_type, embedding_type) 
-            DO UPDATE SET embedding = EXCLUDED.embedding, tstp = EXCLUDED.tstp
-        """
+        table = f"arxiv_embeddings_{dimension}"
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim != 2 or embeddings.shape[1] != dimension:
+            raise ValueError(f"Expected embeddings of shape (n, {dimension}), got {embeddings.shape}")
 
-        now = datetime.now()
-        params = [
-            {
-                "arxiv_code": code,
-                "doc_type": doc_type,
-                "embedding_type": embedding_type,
-                "embedding": str(emb),  # Convert embedding list to string
-                "tstp": now,
-            }
-            for code, emb in zip(arxiv_codes, embeddings)
-        ]
-        
-        return execute_write_query(query, params)
+        payload = encode_embeddings_copy(arxiv_codes, doc_type, embedding_type, embeddings, datetime.now())
+
+        ## Stream vectors in binary into a staging table, then upsert.
+        with get_engine().begin() as conn:
+            conn.execute(text(f"""
+                CREATE TEMP TABLE {table}_staging
+                (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP
+            """))
+            with conn.connection.cursor() as cur:
+                cur.copy_expert(
+                    f"""COPY {table}_staging (arxiv_code, doc_type, embedding_type, embedding, tstp)
+                        FROM STDIN WITH (FORMAT binary)""",
+                    payload,
+                )
+            conn.execute(text(f"""
+                INSERT INTO {table} (arxiv_code, doc_type, embedding_type, embedding, tstp)
+                SELECT arxiv_code, doc_type, embedding_type, embedding, tstp FROM {table}_staging
+                ON CONFLICT (arxiv_code, doc_type, embedding_type) 
+                DO UPDATE SET embedding = EXCLUDED.embedding, tstp = EXCLUDED.tstp
+            """))
+        return True
     except Exception as e:
         logging.error(f"Error storing embeddings batch: {str(e)}")
         return False
 
+def _read_embedding_rows(
+    arxiv_codes: Optional[List[str]],
+    doc_type: str,
+    embedding_type: str,
+    since: Optional[datetime] = None,
+    fetch_size: int = 1000,
+) -> Tuple[np.ndarray, List[str], Optional[datetime]]:
+    """Read embeddings in binary into a float32 matrix; also returns the max tstp seen."""
+    dimension = EMBEDDING_DIMENSIONS[embedding_type]
+    table = f"arxiv_embeddings_{dimension}"
+    filters = "WHERE doc_type = %(doc_type)s AND embedding_type = %(embedding_type)s"
+    if arxiv_codes is not None:
+        filters += " AND arxiv_code = ANY(%(arxiv_codes)s)"
+    if since is not None:
+        filters += " AND tstp > %(since)s"
+    params = {
+        "arxiv_codes": list(arxiv_codes) if arxiv_codes is not None else None,
+        "doc_type": doc_type,
+        "embedding_type": embedding_type,
+        "since": since,
+    }
+
+    with get_engine().connect() as conn:
+        raw_conn = conn.connection
+        with raw_conn.cursor() as cur:
+            ## Count and fetch must see the same snapshot.
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            cur.execute(f"SELECT COUNT(*), MAX(tstp) FROM {table} {filters}", params)
+            n_rows, max_tstp = cur.fetchone()
+
+        matrix = np.empty((n_rows, dimension), dtype=np.float32)
+        ids: List[str] = []
+        ## Named (server-side) cursor: rows stream in `fetch_size` chunks instead of
+        ## being buffered client-side in full before the first one is read.
+        ## vector_send() yields int16 dim, int16 unused, then big-endian float32 values.
+        with raw_conn.cursor(name="embedding_rows", withhold=False) as cur:
+            cur.itersize = fetch_size
+            cur.execute(
+                f"SELECT arxiv_code, vector_send(embedding) FROM {table} {filters} ORDER BY arxiv_code",
+                params,
+            )
+            for code, payload in cur:
+                if len(ids) == n_rows:
+                    break
+                matrix[len(ids)] = np.frombuffer(payload, dtype=">f4", offset=4)
+                ids.append(code)
+
+    return matrix[: len(ids)], ids, max_tstp
+
+def load_embedding_matrix(
+    arxiv_codes: Optional[List[str]],
+    doc_type: str,
+    embedding_type: str,
+) -> Tuple[np.ndarray, List[str]]:
+    """Load embeddings as a contiguous float32 matrix plus the row-aligned arxiv codes (all codes if None)."""
+    matrix, ids, _ = _read_embedding_rows(arxiv_codes, doc_type, embedding_type)
+    return matrix, ids
+
+def count_embeddings(doc_type: str, embedding_type: str) -> int:
+    """Count stored embeddings for a (doc_type, embedding_type) pair."""
+    dimension = EMBEDDING_DIMENSIONS[embedding_type]
+    results = execute_read_query(
+        f"""SELECT COUNT(*) FROM arxiv_embeddings_{dimension}
+            WHERE doc_type = :doc_type AND embedding_type = :embedding_type""",
+        {"doc_type": doc_type, "embedding_type": embedding_type},
+        as_dataframe=False,
+    )
+    return results[0][0]
+
+def load_cached_embedding_matrix(
+    doc_type: str,
+    embedding_type: str,
+    sync: bool = True,
+) -> Tuple[np.ndarray, List[str]]:
+    """Get a zero-copy memory-mapped view of all embeddings, syncing the local cache incrementally on `tstp`."""
+    cache = EmbeddingMatrixCache(embedding_type, doc_type, EMBEDDING_DIMENSIONS[embedding_type])
+
+    if len(cache) > 0 and not cache.validate():
+        logging.warning(f"Embedding cache for {embedding_type}/{doc_type} failed validation; rebuilding.")
+        cache.reset(np.empty((0, cache.dimension), dtype=np.float32), [], None)
+
+    if sync:
+        if len(cache) == 0:
+            ## Cold start: full bulk download.
+            matrix, ids, max_tstp = _read_embedding_rows(None, doc_type, embedding_type)
+            cache.reset(matrix, ids, max_tstp)
+        else:
+            matrix, ids, max_tstp = _read_embedding_rows(None, doc_type, embedding_type, since=cache.max_tstp)
+            known_ids = set(cache.ids)
+            rebuild = any(code in known_ids for code in ids)
+            if not rebuild:
+                cache.append(matrix, ids, max_tstp)
+                ## Catch deletions or rows committed with an older tstp.
+                rebuild = len(cache) != count_embeddings(doc_type, embedding_type)
+            if rebuild:
+                logging.info(f"Embedding cache for {embedding_type}/{doc_type} out of sync; rebuilding.")
+                matrix, ids, max_tstp = _read_embedding_rows(None, doc_type, embedding_type)
+                cache.reset(matrix, ids, max_tstp)
+
+    return cache.view(), list(cache.ids)
+
 def load_embeddings(
     arxiv_codes: List[str],
     doc_type: str,
     embedding_type: str,
-) -> Dict[str, List[float]]:
+) -> Dict[str, np.ndarray]:
     """Load embeddings for specified documents from the database."""
     try:
-        dimension = EMBEDDING_DIMENSIONS[embedding_type]
-        query = f"""
-            SELECT arxiv_code, embedding
-            FROM arxiv_embeddings_{dimension}
-            WHERE arxiv_code = ANY(:arxiv_codes)
-            AND doc_type = :doc_type
-            AND embedding_type = :embedding_type
-            ORDER BY arxiv_code
-        """
-        
-        params = {
-            "arxiv_codes": arxiv_codes,
-            "doc_type": doc_type,
-            "embedding_type": embedding_type,
-        }
-        
-        results = execute_read_query(query, params, as_dataframe=False)
-        
-        # Convert string embeddings back to float lists
-        embeddings_dict = {}
-        for code, emb_str in results:
-            embeddings_dict[code] = [float(x) for x in emb_str.strip('[]').split(',')]
-                
-        return embeddings_dict
+        matrix, ids = load_embedding_matrix(arxiv_codes, doc_type, embedding_type)
+        return {code: matrix[i] for i, code in enumerate(ids)}
     except Exception as e:
         logging.error(f"Error loading embeddings: {str(e)}")
         return {}
@@ -130,78 +274,341 @@ def get_topic_embedding_dist() -> Dict[str, Dict[str, float]]:
         return {} 
     
 
-def format_query_condition(field_name: str, template: str, value: str, embedding_model: str):
-    """Format query conditions for semantic search, handling both vector and regular conditions."""
-    if isinstance(value, list) and "semantic_search_queries" in field_name:
-        distance_scores = []
-        for query in value:
-            vector = convert_query_to_vector(query, embedding_model)
-            vector_str = ", ".join(map(str, vector))
-            ## Using pgvector's cosine similarity operator <=> and converting to similarity score.
-            condition = f"1 - (e.embedding <=> ARRAY[{vector_str}]::vector) "
-            distance_scores.append(condition)
-        if distance_scores:
-            max_similarity = f"GREATEST({', '.join(distance_scores)})"
-            return (
-                f"({' OR '.join([c + ' > 0.6' for c in distance_scores])})",  # Threshold of 0.6 for similarity
-                max_similarity,
-            )
+## pgvector HNSW limits: 2000 dims for vector, 4000 for halfvec.
+HNSW_MAX_VECTOR_DIM = 2000
+HNSW_MAX_HALFVEC_DIM = 4000
+
+
+def ann_index_expression(dimension: int) -> Tuple[str, str, str]:
+    """Get (indexed expression, operator class, distance operator) for an HNSW index on a table."""
+    if dimension <= HNSW_MAX_VECTOR_DIM:
+        return "embedding", "vector_cosine_ops", "<=>"
+    elif dimension <= HNSW_MAX_HALFVEC_DIM:
+        return f"(embedding::halfvec({dimension}))", "halfvec_cosine_ops", "<=>"
+    ## Too wide even for halfvec: index the binary quantisation and rerank exactly.
+    return f"(binary_quantize(embedding)::bit({dimension}))", "bit_hamming_ops", "<~>"
+
+
+def ann_index_name(dimension: int, embedding_type: str, doc_type: str) -> str:
+    """Name of the partial HNSW index for an (embedding_type, doc_type) pair."""
+    return f"arxiv_embeddings_{dimension}_{embedding_type}_{doc_type}_hnsw"
+
+
+def list_embedding_pairs() -> List[Tuple[str, str, int]]:
+    """Get the distinct (embedding_type, doc_type, dimension) combinations stored in the embeddings tables."""
+    pairs = []
+    for dimension in sorted(set(EMBEDDING_DIMENSIONS.values())):
+        rows = execute_read_query(
+            f"SELECT DISTINCT embedding_type, doc_type FROM arxiv_embeddings_{dimension}",
+            as_dataframe=False,
+        )
+        pairs.extend((embedding_type, doc_type, dimension) for embedding_type, doc_type in rows)
+    return pairs
+
+
+## Candidates fetched per semantic query before filters are applied.
+SEMANTIC_CANDIDATES_PER_QUERY = 200
+SEMANTIC_MIN_SIMILARITY = 0.6
+
+
+## Hybrid search: lexical candidates per question and reciprocal rank fusion constant.
+LEXICAL_CANDIDATES = 200
+RRF_K = 60
+
+## Must match the expressions indexed in sql/create_search_indexes.sql.
+DETAILS_TSVECTOR = "to_tsvector('english', COALESCE(a.title, '') || ' ' || COALESCE(a.summary, ''))"
+NOTES_TSVECTOR = "to_tsvector('english', sn.summary)"
+
+NON_FILTER_FIELDS = ["response_length", "limit", "semantic_search_queries"]
+
+
+def _filter_conditions(criteria: dict, config: dict, params: dict) -> List[str]:
+    """Render non-semantic criteria from `config` templates, binding their values into `params`."""
+    conditions = []
+    for field, value in criteria.items():
+        if value is None or field not in config or field in NON_FILTER_FIELDS:
+            continue
+        conditions.append(config[field])
+        if isinstance(value, (list, tuple)):
+            params[field] = [getattr(v, "value", v) for v in value]
         else:
-            return "AND TRUE", "0 as max_similarity"
-    elif isinstance(value, list):
-        value_str = "', '".join(value)
-        return template % value_str, "0 as max_similarity"
+            params[field] = value
+    return conditions
+
+
+def vector_literal(vector) -> str:
+    """Format a vector as a pgvector text literal (sent as a bound parameter)."""
+    return "[" + ",".join(repr(float(x)) for x in vector) + "]"
+
+
+def generate_semantic_search_query(
+    criteria: dict,
+    config: dict,
+    embedding_model: str = "embed-english-v3.0",
+    query_vectors: Optional[List[List[float]]] = None,
+    include_notes: bool = True,
+) -> Tuple[str, dict]:
+    """Generate a parameterised SQL query (and its params) for semantic search using pgvector.
+
+    Each semantic query gets its own `ORDER BY embedding <=> :q LIMIT k` CTE so an
+    HNSW/IVFFlat index can serve it; the distance is computed once there and the
+    per-query candidates are merged with MAX(similarity) before joining metadata.
+    Other criteria are rendered from `config` templates that reference `:field`.
+    With `include_notes=False` the notes column is NULL (see `load_search_notes`).
+    """
+    dimension = EMBEDDING_DIMENSIONS.get(embedding_model, 1024)
+    limit = criteria.get("limit")
+    params = {
+        "embedding_type": embedding_model,
+        "expected_tokens": criteria.get("response_length", 1000) * 3,
+        "min_similarity": SEMANTIC_MIN_SIMILARITY,
+        ## hnsw.ef_search accepts at most 1000.
+        "candidate_k": min(1000, max(SEMANTIC_CANDIDATES_PER_QUERY, (limit or 0) * 4)),
+    }
+
+    semantic_queries = criteria.get("semantic_search_queries") or []
+    if semantic_queries and query_vectors is None:
+        query_vectors = convert_queries_to_vectors(semantic_queries, embedding_model)
+
+    ctes = []
+    if include_notes:
+        ctes.append("""notes AS (
+            SELECT DISTINCT ON (arxiv_code) arxiv_code, summary AS notes, tokens
+            FROM summary_notes
+            ORDER BY arxiv_code, ABS(tokens - :expected_tokens) ASC
+        )""")
+    for i, vector in enumerate(query_vectors or []):
+        params[f"q{i}"] = vector_literal(vector)
+        ctes.append(f"""q{i} AS (
+            SELECT e.arxiv_code, e.embedding <=> CAST(:q{i} AS vector({dimension})) AS distance
+            FROM arxiv_embeddings_{dimension} e
+            WHERE e.doc_type = 'abstract'
+            AND e.embedding_type = :embedding_type
+            ORDER BY distance
+            LIMIT :candidate_k
+        )""")
+
+    if query_vectors:
+        union = " UNION ALL ".join(f"SELECT arxiv_code, distance FROM q{i}" for i in range(len(query_vectors)))
+        ctes.append(f"""candidates AS (
+            SELECT arxiv_code, MAX(1 - distance) AS similarity_score
+            FROM ({union}) c
+            GROUP BY arxiv_code
+            HAVING MAX(1 - distance) > :min_similarity
+        )""")
+        source = "candidates c JOIN arxiv_details a ON a.arxiv_code = c.arxiv_code"
+        similarity_select = "c.similarity_score"
     else:
-        return template % value, "0 as max_similarity"
+        source = "arxiv_details a"
+        similarity_select = "0 AS similarity_score"
 
+    ## Non-semantic filters, all bound as parameters.
+    conditions = _filter_conditions(criteria, config, params)
+    if include_notes:
+        notes_select, notes_join = "n.notes", "\n        JOIN notes n ON a.arxiv_code = n.arxiv_code"
+    else:
+        notes_select, notes_join = "NULL AS notes", ""
+        conditions.append("EXISTS (SELECT 1 FROM summary_notes sn WHERE sn.arxiv_code = a.arxiv_code)")
 
-def generate_semantic_search_query(criteria: dict, config: dict, embedding_model: str = "embed-english-v3.0") -> str:
-    """Generate SQL query for semantic search using pgvector."""
-    query_parts = [
-        ## Select basic paper info and notes.
-        """SELECT 
+    query = f"""{"WITH " + ", ".join(ctes) if ctes else ""}
+        SELECT 
             a.arxiv_code, 
             a.title, 
-            a.published as published_date, 
-            s.citation_count as citations, 
+            a.published AS published_date, 
+            s.citation_count AS citations, 
             a.summary AS abstract,
-            n.notes""",
-        ## From tables.
-        """FROM arxiv_details a, 
-             semantic_details s, 
-             topics t, 
-             arxiv_embeddings_1024 e,
-             (SELECT DISTINCT ON (arxiv_code) arxiv_code, summary as notes, tokens 
-              FROM summary_notes 
-              ORDER BY arxiv_code, ABS(tokens - %d) ASC) n""" % (criteria.get('response_length', 1000) * 3),
-        ## Join conditions.
-        """WHERE a.arxiv_code = s.arxiv_code
-        AND a.arxiv_code = t.arxiv_code 
-        AND a.arxiv_code = n.arxiv_code 
-        AND a.arxiv_code = e.arxiv_code 
-        AND e.doc_type = 'abstract'
-        AND e.embedding_type = '%s'""" % embedding_model,
-    ]
-
-    ## Add similarity conditions if present.
-    similarity_scores = []
-    for field, value in criteria.items():
-        if value is not None and field in config and field not in ["response_length", "limit"]:
-            condition_str, similarity_expr = format_query_condition(
-                field, config[field], value, embedding_model
-            )
-            query_parts.append(f"AND {condition_str}")
-            if similarity_expr != "0 as max_similarity":
-                similarity_scores.append(similarity_expr)
-
-    # Add similarity score to SELECT if we have any
-    if similarity_scores:
-        similarity_select = f"GREATEST({', '.join(similarity_scores)}) as similarity_score"
-        query_parts[0] = query_parts[0].rstrip(",") + f", {similarity_select}"
-        query_parts.append("ORDER BY similarity_score DESC")
-    
-    # Add LIMIT if specified in criteria
-    if 'limit' in criteria and criteria['limit'] is not None:
-        query_parts.append(f"LIMIT {criteria['limit']}")
-    
-    return "\n".join(query_parts)
\ No newline at end of file
+            {notes_select},
+            {similarity_select}
+        FROM {source}
+        JOIN semantic_details s ON a.arxiv_code = s.arxiv_code
+        JOIN topics t ON a.arxiv_code = t.arxiv_code{notes_join}"""
+    if conditions:
+        query += "\n        WHERE " + "\n        AND ".join(conditions)
+    if query_vectors:
+        query += "\n        ORDER BY similarity_score DESC"
+    if limit is not None:
+        query += "\n        LIMIT :limit"
+        params["limit"] = int(limit)
+
+    return query, params
+
+
+def semantic_search(
+    criteria: dict,
+    config: dict,
+    embedding_model: str = "embed-english-v3.0",
+    query_vectors: Optional[List[List[float]]] = None,
+    include_notes: bool = True,
+) -> pd.DataFrame:
+    """Run the semantic search query, widening the HNSW candidate list to match the per-query limit."""
+    query, params = generate_semantic_search_query(
+        criteria, config, embedding_model, query_vectors, include_notes
+    )
+    with get_engine().begin() as conn:
+        conn.execute(text("SELECT set_config('hnsw.ef_search', :ef, true)"), {"ef": str(params["candidate_k"])})
+        return pd.read_sql(text(query), conn, params=params)
+
+
+def generate_lexical_search_query(criteria: dict, config: dict) -> Tuple[str, dict]:
+    """Generate a full-text search query over title, abstract and summary notes.
+
+    The semantic queries are OR-ed into a single tsquery so long, abstract-like
+    phrasing still matches; both legs are served by GIN expression indexes and
+    ranked with `ts_rank_cd`, keeping the best score per paper.
+    """
+    params = {
+        "lexical_query": " ".join(criteria.get("semantic_search_queries") or []),
+        "lexical_k": LEXICAL_CANDIDATES,
+    }
+    conditions = _filter_conditions(criteria, config, params)
+    conditions.append("EXISTS (SELECT 1 FROM summary_notes sn WHERE sn.arxiv_code = a.arxiv_code)")
+    tsquery = "replace(plainto_tsquery('english', :lexical_query)::text, '&', '|')::tsquery"
+    query = f"""WITH q AS (SELECT {tsquery} AS query),
+        matches AS (
+            SELECT a.arxiv_code, ts_rank_cd({DETAILS_TSVECTOR}, q.query) AS rank
+            FROM arxiv_details a, q
+            WHERE {DETAILS_TSVECTOR} @@ q.query
+            UNION ALL
+            SELECT sn.arxiv_code, ts_rank_cd({NOTES_TSVECTOR}, q.query) AS rank
+            FROM summary_notes sn, q
+            WHERE {NOTES_TSVECTOR} @@ q.query
+        ),
+        candidates AS (
+            SELECT arxiv_code, MAX(rank) AS lexical_score
+            FROM matches
+            GROUP BY arxiv_code
+        )
+        SELECT c.arxiv_code, c.lexical_score
+        FROM candidates c
+        JOIN arxiv_details a ON a.arxiv_code = c.arxiv_code
+        JOIN semantic_details s ON a.arxiv_code = s.arxiv_code
+        JOIN topics t ON a.arxiv_code = t.arxiv_code"""
+    query += "\n        WHERE " + "\n        AND ".join(conditions)
+    query += "\n        ORDER BY c.lexical_score DESC\n        LIMIT :lexical_k"
+    return query, params
+
+
+def lexical_search(criteria: dict, config: dict) -> pd.DataFrame:
+    """Run the full-text search leg, returning ranked (arxiv_code, lexical_score)."""
+    query, params = generate_lexical_search_query(criteria, config)
+    with get_engine().connect() as conn:
+        return pd.read_sql(text(query), conn, params=params)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists with RRF: score(d) = sum over lists of 1 / (k + rank)."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
+
+def load_search_documents(
+    arxiv_codes: List[str], expected_tokens: int, include_notes: bool = True
+) -> pd.DataFrame:
+    """Fetch the metadata columns returned by semantic_search for a list of codes."""
+    query = f"""
+        SELECT DISTINCT ON (a.arxiv_code)
+            a.arxiv_code,
+            a.title,
+            a.published AS published_date,
+            s.citation_count AS citations,
+            a.summary AS abstract,
+            {"sn.summary" if include_notes else "NULL"} AS notes
+        FROM arxiv_details a
+        JOIN semantic_details s ON a.arxiv_code = s.arxiv_code
+        JOIN summary_notes sn ON a.arxiv_code = sn.arxiv_code
+        WHERE a.arxiv_code = ANY(:arxiv_codes)
+        ORDER BY a.arxiv_code, ABS(sn.tokens - :expected_tokens) ASC
+    """
+    with get_engine().connect() as conn:
+        return pd.read_sql(
+            text(query), conn, params={"arxiv_codes": list(arxiv_codes), "expected_tokens": expected_tokens}
+        )
+
+
+def load_search_notes(arxiv_codes: List[str], expected_tokens: int) -> Dict[str, str]:
+    """Get the summary note closest to `expected_tokens` for each code."""
+    query = """
+        SELECT DISTINCT ON (arxiv_code) arxiv_code, summary
+        FROM summary_notes
+        WHERE arxiv_code = ANY(:arxiv_codes)
+        ORDER BY arxiv_code, ABS(tokens - :expected_tokens) ASC
+    """
+    rows = execute_read_query(
+        query, {"arxiv_codes": list(arxiv_codes), "expected_tokens": expected_tokens}, as_dataframe=False
+    )
+    return {arxiv_code: summary for arxiv_code, summary in rows}
+
+
+def _timed(fn, *args, **kwargs) -> Tuple[pd.DataFrame, float]:
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def hybrid_search(
+    criteria: dict,
+    config: dict,
+    embedding_model: str = "embed-english-v3.0",
+    query_vectors: Optional[List[List[float]]] = None,
+    include_notes: bool = True,
+) -> pd.DataFrame:
+    """Run vector and full-text search concurrently and fuse them with reciprocal rank fusion.
+
+    Returns the semantic_search columns plus `lexical_score` and `rrf_score`,
+    ordered by fused score and cut to `criteria["limit"]`. Per-leg latencies
+    (seconds) are stored in `df.attrs["timings"]`; the vector leg includes
+    embedding the queries, which overlaps with the lexical leg.
+    """
+    limit = criteria.get("limit")
+    expected_tokens = criteria.get("response_length", 1000) * 3
+    semantic_queries = criteria.get("semantic_search_queries") or []
+
+    ## Legs get wider pools than the final limit so fusion has material to work with.
+    leg_criteria = {**criteria, "limit": max(LEXICAL_CANDIDATES, (limit or 0) * 2)}
+
+    def vector_leg() -> pd.DataFrame:
+        vectors = query_vectors
+        if semantic_queries and vectors is None:
+            vectors = convert_queries_to_vectors(semantic_queries, embedding_model)
+        return semantic_search(leg_criteria, config, embedding_model, vectors, include_notes)
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        lexical_future = (
+            pool.submit(_timed, lexical_search, leg_criteria, config) if semantic_queries else None
+        )
+        vector_future = pool.submit(_timed, vector_leg)
+        vector_df, vector_time = vector_future.result()
+        if lexical_future is not None:
+            lexical_df, lexical_time = lexical_future.result()
+        else:
+            lexical_df, lexical_time = pd.DataFrame(columns=["arxiv_code", "lexical_score"]), 0.0
+
+    start = time.perf_counter()
+    fused = reciprocal_rank_fusion([vector_df["arxiv_code"].tolist(), lexical_df["arxiv_code"].tolist()])
+    if limit is not None:
+        fused = fused[: int(limit)]
+    fused_codes = [code for code, _ in fused]
+
+    documents = vector_df.set_index("arxiv_code")
+    missing = [code for code in fused_codes if code not in documents.index]
+    if missing:
+        extra = load_search_documents(missing, expected_tokens, include_notes).set_index("arxiv_code")
+        extra["similarity_score"] = 0.0
+        documents = pd.concat([documents, extra])
+    fused = [(code, score) for code, score in fused if code in documents.index]
+    documents = documents.loc[[code for code, _ in fused]].reset_index()
+    documents["lexical_score"] = (
+        documents["arxiv_code"].map(lexical_df.set_index("arxiv_code")["lexical_score"]).fillna(0.0)
+    )
+    documents["rrf_score"] = [score for _, score in fused]
+    fusion_time = time.perf_counter() - start
+
+    documents.attrs["timings"] = {"vector": vector_time, "lexical": lexical_time, "fusion": fusion_time}
+    logging.info(
+        f"Hybrid search: vector {len(vector_df)} in {vector_time * 1000:.0f}ms, "
+        f"lexical {len(lexical_df)} in {lexical_time * 1000:.0f}ms, fused {len(documents)}"
+    )
+    return documents
@@ -1,10 +1,62 @@
 """Database operations for logging-related functionality."""
 
+import os
 import uuid
+import threading
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+
+from sqlalchemy import column, table
+from sqlalchemy.dialects.postgresql import insert
+
+from .db_utils import execute_write_query, get_engine
+from .usage_writer import UsageLogWriter
+
+TOKEN_USAGE_INSERT = """
+    INSERT INTO token_usage_logs (
+        id, tstp, model_name, process_id, prompt_tokens, completion_tokens, 
+        prompt_cost, completion_cost, cache_creation_input_tokens, 
+        cache_read_input_tokens, cache_creation_cost, cache_read_cost
+    )
+    VALUES (
+        :id, :tstp, :model_name, :process_id, :prompt_tokens, :completion_tokens, 
+        :prompt_cost, :completion_cost, :cache_creation_input_tokens, 
+        :cache_read_input_tokens, :cache_creation_cost, :cache_read_cost
+    )
+"""
+
+## Set USAGE_LOG_ASYNC=0 to write each usage row synchronously.
+USAGE_LOG_ASYNC = os.getenv("USAGE_LOG_ASYNC", "1").lower() in ("1", "true", "yes")
+
+
+def token_usage_record(
+    model_name: str,
+    process_id: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    prompt_cost: float,
+    completion_cost: float,
+    cache_creation_input_tokens: int = 0,
+    cache_read_input_tokens: int = 0,
+    cache_creation_cost: Optional[float] = None,
+    cache_read_cost: Optional[float] = None,
+) -> dict:
+    """Row for token_usage_logs, timestamped now."""
+    return {
+        "id": str(uuid.uuid4()),
+        "tstp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "model_name": model_name,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "process_id": process_id,
+        "prompt_cost": prompt_cost,
+        "completion_cost": completion_cost,
+        "cache_creation_input_tokens": cache_creation_input_tokens,
+        "cache_read_input_tokens": cache_read_input_tokens,
+        "cache_creation_cost": cache_creation_cost,
+        "cache_read_cost": cache_read_cost,
+    }
 
-from .db_utils import execute_write_query
 
 def log_instructor_query(
     model_name: str,
@@ -20,38 +72,73 @@ def log_instructor_query(
 ) -> bool:
     """Log token usage in DB."""
     try:
-        query = """
-            INSERT INTO token_usage_logs (
-                id, tstp, model_name, process_id, prompt_tokens, completion_tokens, 
-                prompt_cost, completion_cost, cache_creation_input_tokens, 
-                cache_read_input_tokens, cache_creation_cost, cache_read_cost
-            )
-            VALUES (
-                :id, :tstp, :model_name, :process_id, :prompt_tokens, :completion_tokens, 
-                :prompt_cost, :completion_cost, :cache_creation_input_tokens, 
-                :cache_read_input_tokens, :cache_creation_cost, :cache_read_cost
-            )
-        """
-        
-        params = {
-            "id": str(uuid.uuid4()),
-            "tstp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "model_name": model_name,
-            "prompt_tokens": prompt_tokens,
-            "completion_tokens": completion_tokens,
-            "process_id": process_id,
-            "prompt_cost": prompt_cost,
-            "completion_cost": completion_cost,
-            "cache_creation_input_tokens": cache_creation_input_tokens,
-            "cache_read_input_tokens": cache_read_input_tokens,
-            "cache_creation_cost": cache_creation_cost,
-            "cache_read_cost": cache_read_cost,
-        }
-        
-        return execute_write_query(query, params)
+        params = token_usage_record(
+            model_name,
+            process_id,
+            prompt_tokens,
+            completion_tokens,
+            prompt_cost,
+            completion_cost,
+            cache_creation_input_tokens,
+            cache_read_input_tokens,
+            cache_creation_cost,
+            cache_read_cost,
+        )
+        return execute_write_query(TOKEN_USAGE_INSERT, params)
     except Exception as e:
         raise e
 
+
+TOKEN_USAGE_TABLE = table(
+    "token_usage_logs",
+    *(
+        column(name)
+        for name in (
+            "id", "tstp", "model_name", "process_id", "prompt_tokens", "completion_tokens",
+            "prompt_cost", "completion_cost", "cache_creation_input_tokens",
+            "cache_read_input_tokens", "cache_creation_cost", "cache_read_cost",
+        )
+    ),
+)
+
+
+def insert_token_usage_rows(rows: List[dict], chunk_size: int = 1000) -> None:
+    """Insert token usage rows as multi-row INSERTs in a single transaction.
+
+    Rows whose id is already stored are skipped, so replaying a spool that was
+    partly written (or claimed twice) never fails the whole batch.
+    """
+    with get_engine().begin() as conn:
+        for i in range(0, len(rows), chunk_size):
+            conn.execute(
+                insert(TOKEN_USAGE_TABLE)
+                .values(rows[i : i + chunk_size])
+                .on_conflict_do_nothing()
+            )
+
+
+_usage_writer: Optional[UsageLogWriter] = None
+_usage_writer_pid: Optional[int] = None
+_usage_writer_lock = threading.Lock()
+
+
+def get_usage_writer() -> UsageLogWriter:
+    """Process-wide background writer (threads don't survive a fork, so one per pid)."""
+    global _usage_writer, _usage_writer_pid
+    with _usage_writer_lock:
+        if _usage_writer is None or _usage_writer_pid != os.getpid():
+            _usage_writer = UsageLogWriter(insert_token_usage_rows)
+            _usage_writer_pid = os.getpid()
+        return _usage_writer
+
+
+def log_instructor_query_buffered(**kwargs) -> None:
+    """Queue a token usage row for the background writer; same arguments as `log_instructor_query`."""
+    if not USAGE_LOG_ASYNC:
+        log_instructor_query(**kwargs)
+        return
+    get_usage_writer().submit(token_usage_record(**kwargs))
+
 def log_error_db(error: str) -> bool:
     """Log error in DB along with streamlit app state."""
     try:
@@ -4,12 +4,15 @@ from typing import Optional, Union, Dict, List, Tuple
 from datetime import datetime
 import pandas as pd
 import re
+from sqlalchemy import text
 
 from .db_utils import (
     execute_read_query,
     execute_write_query,
     simple_select_query,
     list_to_pg_array,
+    copy_dataframe,
+    get_engine,
 )
 
 def load_arxiv(arxiv_code: Optional[str] = None, **kwargs) -> pd.DataFrame:
@@ -64,11 +67,23 @@ def load_topics() -> pd.DataFrame:
         table="topics"
     )
 
+def parse_scores(value) -> List[float]:
+    """Scores from a real[] value (a list) or its '{...}' text form; NULL gives []."""
+    if isinstance(value, str):
+        return [float(s) for s in value.strip("{}").split(",") if s]
+    if isinstance(value, (list, tuple)):
+        return [float(s) for s in value]
+    return []
+
 def load_similar_documents() -> pd.DataFrame:
     """Load similar documents from similar_documents table."""
     df = simple_select_query(table="similar_documents")
     if not df.empty:
         df["similar_docs"] = df["similar_docs"].apply(lambda x: x.strip("{}").split(","))
+        ## Without sql/add_similar_scores.sql applied the column is missing; expose empty scores.
+        if "similar_scores" not in df.columns:
+            df["similar_scores"] = [[] for _ in range(len(df))]
+        df["similar_scores"] = df["similar_scores"].apply(parse_scores)
     return df
 
 def load_citations(arxiv_code: Optional[str] = None) -> pd.DataFrame:
@@ -96,8 +111,17 @@ def load_interesting_facts(arxiv_code: Optional[str] = None) -> pd.DataFrame:
     )
     return df
 
-def load_repositories(arxiv_code: Optional[str] = None) -> pd.DataFrame:
-    """Load repository information from arxiv_repos table."""
+def load_repositories(
+    arxiv_code: Optional[Union[str, List[str]]] = None
+) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+    """Load repository information from arxiv_repos table.
+
+    Given a list of codes, returns {arxiv_code: repos DataFrame} from one query;
+    codes without repos map to an empty DataFrame.
+    """
+    codes = list(arxiv_code) if isinstance(arxiv_code, (list, tuple)) else None
+    if codes == []:
+        return {}
     df = simple_select_query(
         table="arxiv_repos",
         conditions={"arxiv_code": arxiv_code} if arxiv_code else None,
@@ -108,7 +132,10 @@ def load_repositories(arxiv_code: Optional[str] = None) -> pd.DataFrame:
             "url": "repo_url",
         }
     )
-    return df if not df.empty and "repo_url" in df.columns else pd.DataFrame()
+    df = df if not df.empty and "repo_url" in df.columns else pd.DataFrame()
+    if codes is None:
+        return df
+    return {code: df.loc[[code]] if code in df.index else pd.DataFrame() for code in codes}
 
 
 def get_arxiv_dashboard_script(arxiv_code: str, sel_col: str = "script_content") -> str:
@@ -121,12 +148,20 @@ def get_arxiv_dashboard_script(arxiv_code: str, sel_col: str = "script_content")
     return df[sel_col].iloc[0] if not df.empty else None
 
 
-def get_extended_content(arxiv_code: str) -> pd.DataFrame:
-    """Get extended content for a given arxiv code."""
+def get_extended_content(
+    arxiv_code: Union[str, List[str]]
+) -> Union[pd.DataFrame, Dict[str, pd.DataFrame]]:
+    """Get extended content for a given arxiv code.
+
+    Given a list of codes, returns {arxiv_code: content DataFrame} from one
+    query, with only the codes that have content.
+    """
+    codes = [arxiv_code] if isinstance(arxiv_code, str) else list(arxiv_code)
     query = """
         WITH max_level_notes AS (
             SELECT arxiv_code, MAX(level) as max_level
             FROM summary_notes
+            WHERE arxiv_code = ANY(:arxiv_codes)
             GROUP BY arxiv_code
         )
         SELECT d.published, d.arxiv_code, d.title, d.authors, sd.citation_count, d.arxiv_comment,
@@ -138,9 +173,15 @@ def get_extended_content(arxiv_code: str) -> pd.DataFrame:
         JOIN summary_notes sn ON s.arxiv_code = sn.arxiv_code
         JOIN topics t ON s.arxiv_code = t.arxiv_code
         JOIN max_level_notes mln ON sn.arxiv_code = mln.arxiv_code AND sn.level = mln.max_level
-        WHERE d.arxiv_code = :arxiv_code
+        WHERE d.arxiv_code = ANY(:arxiv_codes)
     """
-    return execute_read_query(query, {"arxiv_code": arxiv_code})
+    df = execute_read_query(query, {"arxiv_codes": codes})
+    if isinstance(arxiv_code, str):
+        return df
+    return {
+        code: group.reset_index(drop=True)
+        for code, group in df.groupby("arxiv_code", sort=False)
+    }
 
 def get_weekly_summary_inputs(date: str) -> pd.DataFrame:
     """Get weekly summaries for a given date (from last monday to next sunday)."""
@@ -234,12 +275,21 @@ def check_weekly_summary_exists(date_str: str) -> bool:
     return df["count"].iloc[0] > 0 if not df.empty else False
 
 def get_extended_notes(
-    arxiv_code: str, 
+    arxiv_code: Union[str, List[str]], 
     level: Optional[int] = None, 
     expected_tokens: Optional[int] = None,
     clean_summary: bool = True
-) -> Optional[str]:
-    """Get extended summary for a given arxiv code."""
+) -> Union[Optional[str], Dict[str, str]]:
+    """Get extended summary for a given arxiv code.
+
+    Given a list of codes, returns {arxiv_code: summary} from one query, with
+    only the codes that have notes.
+    """
+    if not isinstance(arxiv_code, str):
+        return get_extended_notes_bulk(
+            list(arxiv_code), level, expected_tokens, clean_summary
+        )
+
     if level is not None:
         df = simple_select_query(
             table="summary_notes",
@@ -251,7 +301,7 @@ def get_extended_notes(
             SELECT DISTINCT ON (arxiv_code) summary
             FROM summary_notes
             WHERE arxiv_code = :arxiv_code
-            ORDER BY arxiv_code, ABS(tokens - :expected_tokens) ASC
+            ORDER BY arxiv_code, ABS(tokens - :expected_tokens) ASC, level ASC
         """
         df = execute_read_query(query, {
             "arxiv_code": arxiv_code,
@@ -260,18 +310,53 @@ def get_extended_notes(
     else:
         df = simple_select_query(
             table="summary_notes",
-            conditions={"arxiv_code": arxiv_code},
+            conditions={"arxiv_code": arxiv_code, "LIMIT": 1},
             order_by="level DESC",
-            select_cols=["summary"],
-            limit=1
+            select_cols=["summary"]
         )
 
     summary = df["summary"].iloc[0] if not df.empty else None
     if summary is not None and clean_summary:
-        summary = re.sub(r'<new>|</new>|<original>|</original>', '', summary)
+        summary = clean_notes(summary)
     
     return summary
 
+def get_extended_notes_bulk(
+    arxiv_codes: List[str],
+    level: Optional[int] = None,
+    expected_tokens: Optional[int] = None,
+    clean_summary: bool = True
+) -> Dict[str, str]:
+    """Same selection as `get_extended_notes` for many papers in one query."""
+    if not arxiv_codes:
+        return {}
+    params = {"arxiv_codes": arxiv_codes}
+    level_filter = ""
+    if level is not None:
+        level_filter = "AND level = :level"
+        params["level"] = level
+        order = "level DESC"
+    elif expected_tokens is not None:
+        order = "ABS(tokens - :expected_tokens) ASC, level ASC"
+        params["expected_tokens"] = expected_tokens
+    else:
+        order = "level DESC"
+    query = f"""
+        SELECT DISTINCT ON (arxiv_code) arxiv_code, summary
+        FROM summary_notes
+        WHERE arxiv_code = ANY(:arxiv_codes) {level_filter}
+        ORDER BY arxiv_code, {order}
+    """
+    rows = execute_read_query(query, params, as_dataframe=False)
+    return {
+        code: clean_notes(summary) if clean_summary else summary
+        for code, summary in rows
+    }
+
+def clean_notes(summary: str) -> str:
+    """Strip the <new>/<original> markers left in summary notes."""
+    return re.sub(r'<new>|</new>|<original>|</original>', '', summary)
+
 def get_arxiv_parent_chunk_ids(chunk_ids: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
     """Get parent chunk IDs for a list of (arxiv_code, child_id) tuples."""
     conditions = " OR ".join(
@@ -368,4 +453,88 @@ def insert_bullet_list_summary(arxiv_code: str, summary: str) -> bool:
             "summary": summary,
             "tstp": datetime.now()
         }
-    )
\ No newline at end of file
+    )
+
+def full_text_notes_exist(arxiv_code: str) -> bool:
+    """Check whether full-text summary notes are already stored for a paper."""
+    return bool(
+        execute_read_query(
+            "SELECT 1 FROM summary_notes WHERE arxiv_code = :arxiv_code AND method = 'full_text' LIMIT 1",
+            {"arxiv_code": arxiv_code},
+            as_dataframe=False,
+        )
+    )
+
+INTERESTING_FACTS_INSERT = """
+    INSERT INTO summary_interesting_facts (arxiv_code, fact_id, fact, tstp)
+    VALUES (:arxiv_code, :fact_id, :fact, :tstp)
+    ON CONFLICT (arxiv_code, fact_id) DO NOTHING
+"""
+
+def store_full_text_notes(
+    arxiv_code: str, summary_notes: List[Dict], interesting_facts: Optional[List[Dict]] = None
+) -> bool:
+    """Store a paper's summary notes and interesting facts in one transaction.
+
+    A per-paper advisory lock serializes concurrent writers, and notes are only
+    inserted if none exist for the paper yet, so overlapping runs never
+    duplicate them. Returns False if another run stored the notes first.
+    """
+    with get_engine().begin() as conn:
+        conn.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext('summary_notes:' || :arxiv_code))"),
+            {"arxiv_code": arxiv_code},
+        )
+        exists = conn.execute(
+            text("SELECT 1 FROM summary_notes WHERE arxiv_code = :arxiv_code AND method = 'full_text' LIMIT 1"),
+            {"arxiv_code": arxiv_code},
+        ).first()
+        if exists:
+            return False
+        copy_dataframe(conn, pd.DataFrame(summary_notes), "summary_notes")
+        if interesting_facts:
+            conn.execute(text(INTERESTING_FACTS_INSERT), interesting_facts)
+    return True
+
+def store_interesting_facts(interesting_facts: List[Dict]) -> bool:
+    """Store facts for a paper whose notes are already stored (facts already present are kept)."""
+    if not interesting_facts:
+        return False
+    with get_engine().begin() as conn:
+        conn.execute(text(INTERESTING_FACTS_INSERT), interesting_facts)
+    return True
+
+def insert_narrated_outputs(
+    arxiv_code: str,
+    recursive_summary: Optional[str] = None,
+    bullet_list: Optional[str] = None,
+    punchline: Optional[str] = None,
+) -> List[str]:
+    """Insert whichever of a paper's narrated outputs are given in one transaction.
+
+    Tables that already hold a row for the paper are left untouched. Returns
+    the tables written to.
+    """
+    rows = [
+        ("recursive_summaries", "summary", recursive_summary),
+        ("bullet_list_summaries", "summary", bullet_list),
+        ("summary_punchlines", "punchline", punchline),
+    ]
+    written = []
+    with get_engine().begin() as conn:
+        for table, column, value in rows:
+            if value is None:
+                continue
+            result = conn.execute(
+                text(
+                    f"""
+                    INSERT INTO {table} (arxiv_code, {column}, tstp)
+                    SELECT :arxiv_code, :value, :tstp
+                    WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE arxiv_code = :arxiv_code)
+                    """
+                ),
+                {"arxiv_code": arxiv_code, "value": value, "tstp": datetime.now()},
+            )
+            if result.rowcount:
+                written.append(table)
+    return written
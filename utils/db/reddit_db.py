@@ -10,14 +10,14 @@ import json
 from .db_utils import (
     execute_read_query,
     execute_write_query,
-    get_db_engine,
+    get_engine,
 )
 
 
 def store_reddit_posts(posts: List[Dict], logger: logging.Logger, engine: Optional[Engine] = None) -> bool:
     """Store Reddit posts in the database."""
     if engine is None:
-        engine = get_db_engine()
+        engine = get_engine()
     
     for post in posts:
         ## Add collection timestamp
@@ -71,7 +71,7 @@ def store_reddit_posts(posts: List[Dict], logger: logging.Logger, engine: Option
 def store_reddit_comments(comments: List[Dict], logger: logging.Logger, engine: Optional[Engine] = None) -> bool:
     """Store Reddit comments in the database."""
     if engine is None:
-        engine = get_db_engine()
+        engine = get_engine()
         
     for comment in comments:
         ## Add collection timestamp
@@ -13,7 +13,7 @@ from utils.tweet import TweetThread
 from .db_utils import (
     execute_read_query,
     execute_write_query,
-    get_db_engine,
+    get_engine,
     simple_select_query,
 )
 
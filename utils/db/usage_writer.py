@@ -0,0 +1,225 @@
+"""Background, batched writer for token usage records.
+
+Callers enqueue a record and return immediately. A daemon thread flushes
+batches when `flush_size` records are waiting, every `flush_interval` seconds,
+and at process exit. If the insert fails (e.g. the DB is unreachable) the batch
+is appended to a local JSONL spool, which is replayed before the next
+successful flush. Spooled and new records go in one `insert_rows` call. If that
+call fails, the new records are retried alone: when they succeed the database is
+reachable, so the spooled records are the ones it rejects and they move to a
+`.rejected` file instead of blocking every later flush (as do unparseable lines).
+
+Appends and claims take an exclusive `fcntl` lock on `<spool>.lock`, since several
+processes share the spool. A claimed file is only deleted once its records are
+stored, rejected or spooled again; claims left by a dead process are taken over.
+"""
+
+import os
+import glob
+import json
+import time
+import uuid
+import fcntl
+import queue
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+PROJECT_PATH = os.getenv("PROJECT_PATH", "/app")
+USAGE_LOG_FLUSH_SIZE = int(os.getenv("USAGE_LOG_FLUSH_SIZE", 100))
+USAGE_LOG_FLUSH_SECONDS = float(os.getenv("USAGE_LOG_FLUSH_SECONDS", 5))
+USAGE_LOG_SPOOL_PATH = os.getenv(
+    "USAGE_LOG_SPOOL_PATH", os.path.join(PROJECT_PATH, "data", "token_usage_spool.jsonl")
+)
+
+
+class UsageLogWriter:
+    """Queue records in memory and write them with `insert_rows(rows)` from a background thread."""
+
+    def __init__(
+        self,
+        insert_rows: Callable[[List[Dict]], None],
+        flush_size: int = USAGE_LOG_FLUSH_SIZE,
+        flush_interval: float = USAGE_LOG_FLUSH_SECONDS,
+        spool_path: str = USAGE_LOG_SPOOL_PATH,
+    ):
+        self.insert_rows = insert_rows
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self.rejected_path = f"{spool_path}.rejected"
+        self.stats = {
+            "submitted": 0, "written": 0, "spooled": 0, "replayed": 0, "rejected": 0, "flushes": 0,
+        }
+        self._queue: "queue.Queue[Optional[Dict]]" = queue.Queue()
+        self._flush_requested = threading.Event()
+        self._flushed = threading.Condition()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="usage_log_writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, record: Dict) -> None:
+        """Enqueue one record; never blocks on the database."""
+        self.stats["submitted"] += 1
+        self._queue.put_nowait(record)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Ask the writer to flush now and wait until everything queued so far is handled."""
+        if not self._thread.is_alive():
+            return False
+        with self._flushed:
+            self._flush_requested.set()
+            self._queue.put_nowait(None)
+            return self._flushed.wait(timeout)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush what is queued and stop the thread (registered with atexit)."""
+        if self._thread.is_alive():
+            self._stopping = True
+            self.flush(timeout)
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        batch: List[Dict] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                record = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                if record is not None:
+                    batch.append(record)
+            except queue.Empty:
+                pass
+            requested = self._flush_requested.is_set()
+            if len(batch) >= self.flush_size or requested or time.monotonic() >= deadline:
+                ## Drain what else is already queued so a requested flush covers it.
+                while requested:
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is not None:
+                        batch.append(record)
+                ## The thread must survive anything, or records queue up unwritten forever.
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    logging.warning(f"Token usage flush of {len(batch)} records failed: {e}")
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+                if requested:
+                    with self._flushed:
+                        self._flush_requested.clear()
+                        self._flushed.notify_all()
+                    if self._stopping:
+                        return
+
+    def _write(self, batch: List[Dict]) -> None:
+        spooled, claims = self._claim_spool()
+        if spooled or batch:
+            self._store(spooled, batch)
+        ## The claimed records are now stored, rejected or back in the spool.
+        for path in claims:
+            os.remove(path)
+
+    def _store(self, spooled: List[Dict], batch: List[Dict]) -> None:
+        rows = spooled + batch
+        try:
+            self.insert_rows(rows)
+        except Exception as e:
+            ## Without fresh records there is nothing to tell a bad spool from an outage.
+            if not spooled or not batch or not self._insert_alone(batch):
+                logging.warning(f"Token usage flush failed, spooling {len(rows)} records: {e}")
+                self._spool(spooled, count=False)
+                self._spool(batch)
+                return
+            ## The fresh batch went in on its own, so the spooled records are the bad ones.
+            logging.warning(
+                f"Token usage replay rejected, moving {len(spooled)} spooled records "
+                f"to {self.rejected_path}: {e}"
+            )
+            self._append(self.rejected_path, spooled)
+            self.stats["rejected"] += len(spooled)
+            return
+        self.stats["written"] += len(batch)
+        self.stats["replayed"] += len(spooled)
+        self.stats["flushes"] += 1
+        if spooled:
+            logging.info(f"Replayed {len(spooled)} spooled token usage records")
+
+    def _insert_alone(self, batch: List[Dict]) -> bool:
+        """Write the fresh records without the spool; True if they are stored."""
+        try:
+            self.insert_rows(batch)
+        except Exception:
+            return False
+        self.stats["written"] += len(batch)
+        self.stats["flushes"] += 1
+        return True
+
+    @contextmanager
+    def _spool_lock(self) -> Iterator[None]:
+        """Exclusive lock shared by every process appending to or claiming the spool."""
+        os.makedirs(os.path.dirname(self.spool_path) or ".", exist_ok=True)
+        with open(f"{self.spool_path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _claim_spool(self) -> Tuple[List[Dict], List[str]]:
+        """Take over the spool (and claims of dead processes); returns (records, claimed paths)."""
+        with self._spool_lock():
+            claims = [path for path in glob.glob(f"{glob.escape(self.spool_path)}.claim.*") if _orphaned(path)]
+            if os.path.exists(self.spool_path):
+                claimed = f"{self.spool_path}.claim.{os.getpid()}.{uuid.uuid4().hex[:8]}"
+                os.replace(self.spool_path, claimed)
+                claims.append(claimed)
+        records, bad_lines = [], []
+        for path in claims:
+            with open(path) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    ## A process killed mid-append leaves a partial line behind.
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        bad_lines.append(line if line.endswith("\n") else line + "\n")
+        if bad_lines:
+            logging.warning(f"Moving {len(bad_lines)} unreadable spool lines to {self.rejected_path}")
+            self._append_lines(self.rejected_path, bad_lines)
+            self.stats["rejected"] += len(bad_lines)
+        return records, claims
+
+    def _spool(self, records: List[Dict], count: bool = True) -> None:
+        self._append(self.spool_path, records)
+        if count:
+            self.stats["spooled"] += len(records)
+
+    def _append(self, path: str, records: List[Dict]) -> None:
+        self._append_lines(path, [json.dumps(record, default=str) + "\n" for record in records])
+
+    def _append_lines(self, path: str, lines: List[str]) -> None:
+        if not lines:
+            return
+        with self._spool_lock():
+            with open(path, "a") as f:
+                f.writelines(lines)
+
+
+def _orphaned(claim_path: str) -> bool:
+    """Whether a '<spool>.claim.<pid>.<id>' file belongs to a process that no longer runs."""
+    try:
+        pid = int(claim_path.rsplit(".", 2)[-2])
+    except ValueError:
+        return False
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
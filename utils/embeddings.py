@@ -1,34 +1,129 @@
 """Functions for handling embeddings and vector operations."""
 import os
-from typing import List
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
 from langchain_cohere import CohereEmbeddings
 from langchain_community.embeddings.huggingface import HuggingFaceEmbeddings
 import voyageai
 from sentence_transformers import SentenceTransformer
 
+from utils.query_embedding_cache import QueryEmbeddingCache
 
-def convert_query_to_vector(query: str, model_name: str) -> List[float]:
-    """Convert a text query into a vector using the specified embedding model."""
+NV_QUERY_PREFIX = "Instruct: Identify the topic or theme of the following AI & Large Language Model document\nQuery: "
+
+## Seconds a loaded model may sit unused before it is released.
+EMBEDDING_MODEL_IDLE_TIMEOUT = int(os.getenv("EMBEDDING_MODEL_IDLE_TIMEOUT", 1800))
+
+
+def _load_nv_model(model_name: str) -> SentenceTransformer:
+    model = SentenceTransformer(model_name, trust_remote_code=True)
+    model.max_seq_length = 32768
+    model.tokenizer.padding_side = "right"
+    return model
+
+
+def _load_model(model_name: str) -> Any:
+    """Instantiate the client or local model backing an embedding model name."""
     if "embed-english" in model_name:
-        embeddings = CohereEmbeddings(
-            cohere_api_key=os.getenv("COHERE_API_KEY"), model=model_name
-        )
+        return CohereEmbeddings(cohere_api_key=os.getenv("COHERE_API_KEY"), model=model_name)
     elif model_name == "voyage":
-        client = voyageai.Client()
-        return client.embed(
-            [query], model="voyage-3-large", input_type="document"
-        ).embeddings[0]
+        return voyageai.Client()
+    elif model_name == "nvidia/NV-Embed-v2":
+        return _load_nv_model(model_name)
+    else:
+        return HuggingFaceEmbeddings(model_name=model_name)
+
+
+def _embed_batch(model: Any, queries: List[str], model_name: str) -> List[List[float]]:
+    """Embed a batch of queries with an already-loaded model."""
+    if "embed-english" in model_name:
+        return model.embed(queries, input_type="search_query")
+    elif model_name == "voyage":
+        return model.embed(queries, model="voyage-3-large", input_type="document").embeddings
     elif model_name == "nvidia/NV-Embed-v2":
-        model = SentenceTransformer(model_name, trust_remote_code=True)
-        model.max_seq_length = 32768
-        model.tokenizer.padding_side = "right"
-        query_prefix = "Instruct: Identify the topic or theme of the following AI & Large Language Model document\nQuery: "
         return model.encode(
-            query + model.tokenizer.eos_token,
-            prompt=query_prefix,
+            [query + model.tokenizer.eos_token for query in queries],
+            prompt=NV_QUERY_PREFIX,
             normalize_embeddings=True,
         ).tolist()
     else:
-        embeddings = HuggingFaceEmbeddings(model_name=model_name)
+        return model.embed_documents(queries)
+
 
-    return embeddings.embed_query(query) 
\ No newline at end of file
+class EmbeddingModelRegistry:
+    """Keeps embedding models warm per process, loading lazily and evicting idle ones."""
+
+    def __init__(
+        self,
+        idle_timeout: int = EMBEDDING_MODEL_IDLE_TIMEOUT,
+        loader: Callable[[str], Any] = _load_model,
+    ):
+        self.idle_timeout = idle_timeout
+        self.loader = loader
+        self._models: Dict[str, Any] = {}
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def get(self, model_name: str) -> Any:
+        """Get a loaded model, loading it on first use."""
+        self.evict_idle(exclude=model_name)
+        with self._lock:
+            load_lock = self._load_locks.setdefault(model_name, threading.Lock())
+        ## Per-model lock so concurrent callers don't load the same model twice.
+        with load_lock:
+            if model_name not in self._models:
+                logging.info(f"Loading embedding model {model_name}")
+                self._models[model_name] = self.loader(model_name)
+            self._last_used[model_name] = time.monotonic()
+            return self._models[model_name]
+
+    def evict_idle(self, exclude: Optional[str] = None) -> List[str]:
+        """Release models unused for longer than the idle timeout."""
+        now = time.monotonic()
+        with self._lock:
+            idle = [
+                name for name, last in self._last_used.items()
+                if name != exclude and now - last > self.idle_timeout
+            ]
+            for name in idle:
+                logging.info(f"Evicting idle embedding model {name}")
+                self._models.pop(name, None)
+                self._last_used.pop(name, None)
+        return idle
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+            self._last_used.clear()
+
+    def loaded_models(self) -> List[str]:
+        return list(self._models)
+
+
+model_registry = EmbeddingModelRegistry()
+query_cache = QueryEmbeddingCache()
+
+
+def convert_queries_to_vectors(
+    queries: List[str], model_name: str, use_cache: bool = True
+) -> List[List[float]]:
+    """Convert several text queries into vectors, embedding only cache misses in a single model call."""
+    if not queries:
+        return []
+    cached = query_cache.get_many(queries, model_name) if use_cache else {}
+    misses = list(dict.fromkeys(q for q in queries if q not in cached))
+    if misses:
+        model = model_registry.get(model_name)
+        vectors = [list(vector) for vector in _embed_batch(model, misses, model_name)]
+        if use_cache:
+            query_cache.put_many(misses, vectors, model_name)
+        cached.update(zip(misses, vectors))
+    return [cached[query] for query in queries]
+
+
+def convert_query_to_vector(query: str, model_name: str) -> List[float]:
+    """Convert a text query into a vector using the specified embedding model."""
+    return convert_queries_to_vectors([query], model_name)[0]
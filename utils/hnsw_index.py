@@ -0,0 +1,213 @@
+"""Incremental HNSW approximate nearest-neighbour index (pure NumPy, cosine distance)."""
+
+import heapq
+import pickle
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+
+class HNSWIndex:
+    """Hierarchical navigable small world graph supporting incremental inserts.
+
+    Vectors are L2-normalised on insert, so distance is `1 - cosine similarity`.
+    Follows Malkov & Yashunin (2016) with the neighbour-selection heuristic.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        M: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+        seed: int = 42,
+    ):
+        self.dimension = dimension
+        self.M = M
+        self.M0 = 2 * M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.level_mult = 1 / np.log(M)
+        self.rng = np.random.default_rng(seed)
+
+        self._vectors = np.empty((1024, dimension), dtype=np.float32)
+        self.ids: List[str] = []
+        self.id_to_node = {}
+        self.links: List[List[List[int]]] = []
+        self.entry_point: Optional[int] = None
+        self.max_level = -1
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self.id_to_node
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[: len(self.ids)]
+
+    def vector(self, item_id: str) -> np.ndarray:
+        """Get the stored (normalised) vector for an id."""
+        return self._vectors[self.id_to_node[item_id]]
+
+    def _distances(self, query: np.ndarray, nodes: List[int]) -> np.ndarray:
+        return 1.0 - self._vectors[nodes] @ query
+
+    def _search_layer(
+        self, query: np.ndarray, entry_points: List[int], ef: int, level: int
+    ) -> List[Tuple[float, int]]:
+        """Greedy best-first search on one layer; returns (distance, node) sorted ascending."""
+        visited = set(entry_points)
+        dists = self._distances(query, entry_points)
+        candidates = [(float(d), n) for d, n in zip(dists, entry_points)]
+        results = [(-d, n) for d, n in candidates]
+        heapq.heapify(candidates)
+        heapq.heapify(results)
+
+        while candidates:
+            dist, node = heapq.heappop(candidates)
+            if dist > -results[0][0]:
+                break
+            neighbors = [n for n in self.links[node][level] if n not in visited]
+            if not neighbors:
+                continue
+            visited.update(neighbors)
+            for n_dist, n in zip(self._distances(query, neighbors), neighbors):
+                n_dist = float(n_dist)
+                if len(results) < ef or n_dist < -results[0][0]:
+                    heapq.heappush(candidates, (n_dist, n))
+                    heapq.heappush(results, (-n_dist, n))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+
+        return sorted((-d, n) for d, n in results)
+
+    def _select_neighbors(self, candidates: List[Tuple[float, int]], m: int) -> List[int]:
+        """Heuristic selection: prefer candidates closer to the base than to already-selected ones."""
+        nodes = [node for _, node in candidates]
+        similarity = self._vectors[nodes] @ self._vectors[nodes].T
+        selected: List[int] = []
+        pruned: List[int] = []
+        for i, (dist, node) in enumerate(candidates):
+            if len(selected) >= m:
+                break
+            if selected and (1.0 - similarity[i, selected]).min() < dist:
+                pruned.append(i)
+            else:
+                selected.append(i)
+        ## Keep pruned connections to fill up to m.
+        selected.extend(pruned[: m - len(selected)])
+        return [nodes[i] for i in selected]
+
+    def add(self, vector: np.ndarray, item_id: str) -> None:
+        """Insert a vector; re-adding an existing id is a no-op."""
+        if item_id in self.id_to_node:
+            return
+        vector = np.asarray(vector, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+
+        node = len(self.ids)
+        if node >= len(self._vectors):
+            grown = np.empty((2 * len(self._vectors), self.dimension), dtype=np.float32)
+            grown[:node] = self._vectors[:node]
+            self._vectors = grown
+        self._vectors[node] = vector
+        self.ids.append(item_id)
+        self.id_to_node[item_id] = node
+
+        level = int(-np.log(1.0 - self.rng.random()) * self.level_mult)
+        self.links.append([[] for _ in range(level + 1)])
+        if self.entry_point is None:
+            self.entry_point = node
+            self.max_level = level
+            return
+
+        entry_points = [self.entry_point]
+        for lc in range(self.max_level, level, -1):
+            entry_points = [self._search_layer(vector, entry_points, 1, lc)[0][1]]
+
+        for lc in range(min(level, self.max_level), -1, -1):
+            candidates = self._search_layer(vector, entry_points, self.ef_construction, lc)
+            self._connect(node, candidates, lc)
+            entry_points = [n for _, n in candidates]
+
+        if level > self.max_level:
+            self.entry_point = node
+            self.max_level = level
+
+    def _connect(self, node: int, candidates: List[Tuple[float, int]], level: int) -> None:
+        """Link a node to its selected neighbours on one layer, pruning their back-links."""
+        m_max = self.M0 if level == 0 else self.M
+        neighbors = self._select_neighbors(candidates, self.M)
+        self.links[node][level] = neighbors
+        for n in neighbors:
+            n_links = self.links[n][level]
+            if node in n_links:
+                continue
+            n_links.append(node)
+            if len(n_links) > m_max:
+                n_dists = self._distances(self._vectors[n], n_links)
+                self.links[n][level] = self._select_neighbors(
+                    sorted(zip(n_dists.tolist(), n_links)), m_max
+                )
+
+    def update(self, vector: np.ndarray, item_id: str) -> None:
+        """Replace the vector of an id and reconnect it on each of its layers (adds unknown ids).
+
+        Links other nodes already hold to it are kept; they stay valid graph
+        edges and are pruned as usual when those nodes gain closer neighbours.
+        """
+        if item_id not in self.id_to_node:
+            self.add(vector, item_id)
+            return
+        vector = np.asarray(vector, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        node = self.id_to_node[item_id]
+        self._vectors[node] = vector
+        if len(self.ids) == 1:
+            return
+
+        level = len(self.links[node]) - 1
+        entry_points = [self.entry_point]
+        for lc in range(self.max_level, level, -1):
+            entry_points = [self._search_layer(vector, entry_points, 1, lc)[0][1]]
+        for lc in range(level, -1, -1):
+            found = self._search_layer(vector, entry_points, self.ef_construction + 1, lc)
+            candidates = [(d, n) for d, n in found if n != node]
+            if candidates:
+                self._connect(node, candidates, lc)
+            entry_points = [n for _, n in found]
+
+    def add_batch(self, vectors: np.ndarray, item_ids: List[str]) -> None:
+        """Insert several vectors in order."""
+        for vector, item_id in zip(vectors, item_ids):
+            self.add(vector, item_id)
+
+    def search(
+        self, query: np.ndarray, k: int, ef: Optional[int] = None
+    ) -> Tuple[List[str], np.ndarray]:
+        """Find the approximate k nearest ids and their cosine distances."""
+        if self.entry_point is None:
+            return [], np.empty(0, dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        ef = max(ef or self.ef_search, k)
+
+        entry_points = [self.entry_point]
+        for lc in range(self.max_level, 0, -1):
+            entry_points = [self._search_layer(query, entry_points, 1, lc)[0][1]]
+        results = self._search_layer(query, entry_points, ef, 0)[:k]
+        return (
+            [self.ids[n] for _, n in results],
+            np.array([d for d, _ in results], dtype=np.float32),
+        )
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str) -> "HNSWIndex":
+        with open(path, "rb") as f:
+            return pickle.load(f)
@@ -1,17 +1,25 @@
 from tokencost import calculate_cost_by_tokens
-from typing import Type, Optional, List, Dict, Union
+from typing import Any, Callable, Type, Optional, List, Dict, Union, Iterator
 from pydantic import BaseModel
 import warnings
 
 # Filter out specific Pydantic warning about config keys
 warnings.filterwarnings("ignore", message="Valid config keys have changed in V2:*")
 
-from litellm import completion, InternalServerError, APIConnectionError
+from litellm import completion, acompletion, InternalServerError, APIConnectionError
+from litellm import stream_chunk_builder, token_counter, Usage
 import instructor
+import logging
 import time
-import traceback
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
 
 import utils.db.logging_db as logging_db
+import utils.llm_cache as llm_cache
+import utils.llm_batch as llm_batch
+from utils.llm_scheduler import LLMScheduler, get_retrier, get_scheduler, provider_for
+import asyncio
 
 
 def format_vision_messages(
@@ -59,10 +67,54 @@ def format_vision_messages(
     return messages
 
 
+@lru_cache(maxsize=None)
+def get_instructor_client(mode: instructor.Mode, use_async: bool = False):
+    """Instructor client over LiteLLM, built once per mode (and sync/async)."""
+    return instructor.from_litellm(acompletion if use_async else completion, mode=mode)
+
+
+## Prompt-cache token totals per process_id, for hit ratios (see `prompt_cache_report`).
+prompt_cache_stats: Dict[str, Dict[str, int]] = {}
+_prompt_cache_lock = threading.Lock()
+
+
+def record_prompt_cache_usage(usage, process_id: Optional[str]) -> None:
+    with _prompt_cache_lock:
+        stats = prompt_cache_stats.setdefault(
+            process_id or "unknown",
+            {"calls": 0, "prompt_tokens": 0, "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0},
+        )
+        stats["calls"] += 1
+        stats["prompt_tokens"] += usage.prompt_tokens or 0
+        stats["cache_read_input_tokens"] += getattr(usage, "cache_read_input_tokens", 0) or 0
+        stats["cache_creation_input_tokens"] += getattr(usage, "cache_creation_input_tokens", 0) or 0
+
+
+def prompt_cache_report(process_ids: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """Per-step prompt-cache totals with `hit_ratio`: cache reads over all input tokens.
+
+    LiteLLM's prompt_tokens include cache reads but not cache writes.
+    """
+    with _prompt_cache_lock:
+        report = {
+            process_id: dict(stats)
+            for process_id, stats in prompt_cache_stats.items()
+            if process_ids is None or process_id in process_ids
+        }
+    for stats in report.values():
+        total_input = stats["prompt_tokens"] + stats["cache_creation_input_tokens"]
+        stats["hit_ratio"] = stats["cache_read_input_tokens"] / total_input if total_input else 0.0
+    return report
+
+
 def log_llm_usage(
-    usage, llm_model: str, process_id: str = None, verbose: bool = False
+    usage,
+    llm_model: str,
+    process_id: str = None,
+    verbose: bool = False,
+    cost_factor: float = 1.0,
 ) -> None:
-    """Log LLM usage statistics and costs."""
+    """Log LLM usage statistics and costs (scaled by `cost_factor`, e.g. for batch discounts)."""
     prompt_cost = calculate_cost_by_tokens(usage.prompt_tokens, llm_model, "input")
     completion_cost = calculate_cost_by_tokens(
         usage.completion_tokens, llm_model, "output"
@@ -86,6 +138,12 @@ def log_llm_usage(
             usage.cache_read_input_tokens, llm_model, "cached"
         )
 
+    if cost_factor != 1.0:
+        prompt_cost, completion_cost, cache_creation_cost, cache_read_cost = (
+            cost * cost_factor if cost is not None else None
+            for cost in (prompt_cost, completion_cost, cache_creation_cost, cache_read_cost)
+        )
+
     if verbose:
         total_tokens = usage.prompt_tokens + usage.completion_tokens
         total_cost = (
@@ -134,11 +192,13 @@ def log_llm_usage(
         )
         print("========================\n")
 
+    record_prompt_cache_usage(usage, process_id)
+
     # Get cache token values, defaulting to 0 if not present
     cache_creation_tokens = getattr(usage, "cache_creation_input_tokens", 0) or 0
     cache_read_tokens = getattr(usage, "cache_read_input_tokens", 0) or 0
 
-    logging_db.log_instructor_query(
+    logging_db.log_instructor_query_buffered(
         model_name=llm_model,
         process_id=process_id,
         prompt_tokens=usage.prompt_tokens,
@@ -152,18 +212,28 @@ def log_llm_usage(
     )
 
 
-def run_instructor_query(
-    system_message: Optional[str] = None,
-    user_message: Optional[str] = None,
-    model: Optional[Type[BaseModel]] = None,
-    llm_model: str = "gpt-4",
-    temperature: float = 0.5,
-    process_id: str = None,
-    messages: Optional[List[Dict]] = None,
-    verbose: bool = False,
-    **kwargs,
-) -> Union[BaseModel, str]:
-    """Run a query with the instructor API and get a structured response using LiteLLM as unified interface."""
+def log_cached_llm_usage(
+    prompt_tokens: int, completion_tokens: int, llm_model: str, process_id: str = None
+) -> None:
+    """Log a response-cache hit: the tokens the original call used, at zero cost."""
+    logging_db.log_instructor_query_buffered(
+        model_name=f"cached/{llm_model}",
+        process_id=process_id,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        prompt_cost=0.0,
+        completion_cost=0.0,
+    )
+
+
+def prepare_messages(
+    system_message: Optional[str],
+    user_message: Optional[str],
+    messages: Optional[List[Dict]],
+    llm_model: str,
+    temperature: float,
+) -> tuple:
+    """Build the chat messages and the temperature accepted by the model."""
     # Validate that we have either messages or at least a user_message
     if messages is None and user_message is None:
         raise ValueError(
@@ -179,54 +249,267 @@ def run_instructor_query(
         messages = [{"role": "user", "content": user_message}]
         if system_message is not None:
             messages.insert(0, {"role": "system", "content": system_message})
+    return messages, temperature
 
-    max_retries = 3
-    base_delay = 30  # base delay in seconds
 
-    for attempt in range(max_retries):
-        try:
-            if model is None:
-                response = completion(
-                    model=llm_model,
-                    temperature=temperature,
-                    messages=messages,
-                    **kwargs,
-                )
-                answer = response.choices[0].message.content.strip()
-                usage = response.usage
-            else:
-                client = instructor.from_litellm(
-                    completion, mode=instructor.Mode.TOOLS_STRICT
-                )
-                response, completion_obj = (
-                    client.chat.completions.create_with_completion(
-                        model=llm_model,
-                        temperature=temperature,
-                        messages=messages,
-                        response_model=model,
-                        **kwargs,
-                    )
-                )
-                answer = response
-                usage = completion_obj.usage
-            break
-        except Exception as e:
-            print(f"\nError on attempt {attempt + 1}/{max_retries}:")
-            print(f"Error type: {type(e).__name__}")
-            print(f"Error message: {str(e)}")
-
-            if attempt < max_retries - 1:
-                ## Exponential backoff           else:
-                print("\nAll retry attempts failed. Full traceback:")
-                print(traceback.format_exc())
-                raise e
+def run_instructor_query(
+    system_message: Optional[str] = None,
+    user_message: Optional[str] = None,
+    model: Optional[Type[BaseModel]] = None,
+    llm_model: str = "gpt-4",
+    temperature: float = 0.5,
+    process_id: str = None,
+    messages: Optional[List[Dict]] = None,
+    verbose: bool = False,
+    cache: Optional[bool] = None,
+    **kwargs,
+) -> Union[BaseModel, str]:
+    """Run a query with the instructor API and get a structured response using LiteLLM as unified interface.
+
+    With `cache` (default: the LLM_CACHE env flag) identical requests are served
+    from the response cache in utils.llm_cache and logged with zero cost.
+    Rate limits and server errors are retried as configured in
+    config/llm_limits.yaml (see utils.llm_retry).
+    """
+    messages, temperature = prepare_messages(
+        system_message, user_message, messages, llm_model, temperature
+    )
+
+    use_cache = llm_cache.LLM_CACHE_ENABLED if cache is None else cache
+    if use_cache:
+        key = llm_cache.cache_key(llm_model, messages, model, temperature, kwargs)
+        hit = llm_cache.get_backend().get(key, process_id)
+        if hit is not None:
+            response, prompt_tokens, completion_tokens = hit
+            log_cached_llm_usage(prompt_tokens, completion_tokens, llm_model, process_id)
+            return llm_cache.deserialize_response(response, model)
+
+    def call():
+        if model is None:
+            response = completion(
+                model=llm_model,
+                temperature=temperature,
+                messages=messages,
+                **kwargs,
+            )
+            return response.choices[0].message.content.strip(), response.usage
+        client = get_instructor_client(instructor.Mode.TOOLS_STRICT)
+        response, completion_obj = client.chat.completions.create_with_completion(
+            model=llm_model,
+            temperature=temperature,
+            messages=messages,
+            response_model=model,
+            **kwargs,
+        )
+        return response, completion_obj.usage
+
+    ## Transient errors back off with jitter; a provider that keeps failing trips its breaker.
+    try:
+        answer, usage = get_retrier().call(call, provider_for(llm_model))
+    except Exception as e:
+        logging.error(f"{process_id or llm_model} failed: {type(e).__name__}: {e}")
+        raise
 
     # Log usage statistics and costs
     log_llm_usage(usage, llm_model, process_id, verbose)
 
+    if use_cache:
+        llm_cache.get_backend().set(
+            key,
+            process_id,
+            llm_model,
+            llm_cache.serialize_response(answer),
+            usage.prompt_tokens,
+            usage.completion_tokens,
+        )
+
+    return answer
+
+
+async def arun_instructor_query(
+    system_message: Optional[str] = None,
+    user_message: Optional[str] = None,
+    model: Optional[Type[BaseModel]] = None,
+    llm_model: str = "gpt-4",
+    temperature: float = 0.5,
+    process_id: str = None,
+    messages: Optional[List[Dict]] = None,
+    verbose: bool = False,
+    cache: Optional[bool] = None,
+    scheduler: Optional[LLMScheduler] = None,
+    **kwargs,
+) -> Union[BaseModel, str]:
+    """Async counterpart of `run_instructor_query`.
+
+    The call runs through the event loop's LLMScheduler, which applies the
+    provider's concurrency cap and RPM/TPM buckets (config/llm_limits.yaml) and
+    retries 429s after their retry-after. Gather many of these to keep a
+    provider busy up to its limits.
+    """
+    messages, temperature = prepare_messages(
+        system_message, user_message, messages, llm_model, temperature
+    )
+
+    use_cache = llm_cache.LLM_CACHE_ENABLED if cache is None else cache
+    if use_cache:
+        key = llm_cache.cache_key(llm_model, messages, model, temperature, kwargs)
+        hit = await asyncio.to_thread(llm_cache.get_backend().get, key, process_id)
+        if hit is not None:
+            response, prompt_tokens, completion_tokens = hit
+            await asyncio.to_thread(
+                log_cached_llm_usage, prompt_tokens, completion_tokens, llm_model, process_id
+            )
+            return llm_cache.deserialize_response(response, model)
+
+    async def call():
+        if model is None:
+            response = await acompletion(
+                model=llm_model,
+                temperature=temperature,
+                messages=messages,
+                **kwargs,
+            )
+            return response.choices[0].message.content.strip(), response.usage
+        client = get_instructor_client(instructor.Mode.TOOLS_STRICT, use_async=True)
+        response, completion_obj = await client.chat.completions.create_with_completion(
+            model=llm_model,
+            temperature=temperature,
+            messages=messages,
+            response_model=model,
+            **kwargs,
+        )
+        return response, completion_obj.usage
+
+    estimated_tokens = token_counter(model=llm_model, messages=messages) + kwargs.get(
+        "max_tokens", 1000
+    )
+    answer, usage = await (scheduler or get_scheduler()).run(
+        call,
+        llm_model,
+        estimated_tokens,
+        usage_tokens=lambda result: result[1].prompt_tokens + result[1].completion_tokens,
+    )
+
+    ## DB writes stay off the event loop.
+    await asyncio.to_thread(log_llm_usage, usage, llm_model, process_id, verbose)
+    if use_cache:
+        await asyncio.to_thread(
+            llm_cache.get_backend().set,
+            key,
+            process_id,
+            llm_model,
+            llm_cache.serialize_response(answer),
+            usage.prompt_tokens,
+            usage.completion_tokens,
+        )
     return answer
 
 
+def run_instructor_batch(
+    stage: str,
+    requests: List[llm_batch.BatchRequest],
+    wait: bool = True,
+    provider: Optional[llm_batch.BatchProvider] = None,
+    verbose: bool = False,
+) -> Dict[str, llm_batch.BatchResult]:
+    """Batch counterpart of `run_instructor_query` for large backfills.
+
+    Requests are submitted to the provider's batch API (see utils.llm_batch) and
+    the finished results are returned by request key, with usage logged at the
+    batch discount. Failed requests come back with `error` set and no response.
+    """
+    results = llm_batch.run_batch(stage, requests, provider=provider, wait=wait)
+    for result in results.values():
+        if result.usage is not None:
+            log_llm_usage(
+                result.usage,
+                result.request.llm_model,
+                result.request.process_id,
+                verbose,
+                cost_factor=llm_batch.BATCH_COST_FACTOR,
+            )
+        if result.error is not None:
+            logging.warning(f"Batch request {result.key} failed: {result.error}")
+    return results
+
+
+def stream_instructor_query(
+    system_message: Optional[str] = None,
+    user_message: Optional[str] = None,
+    model: Optional[Type[BaseModel]] = None,
+    llm_model: str = "gpt-4",
+    temperature: float = 0.5,
+    process_id: str = None,
+    messages: Optional[List[Dict]] = None,
+    stream_field: str = "response",
+    verbose: bool = False,
+    **kwargs,
+) -> Iterator[str]:
+    """Stream a query's text increments as they are generated.
+
+    Without a response model the raw completion is streamed. With one, instructor
+    partials are parsed and only the growth of `stream_field` is yielded (earlier
+    fields are generated but not emitted). No retries: yielded text can't be recalled.
+    """
+    messages, temperature = prepare_messages(
+        system_message, user_message, messages, llm_model, temperature
+    )
+    start = time.perf_counter()
+    first_token_time = None
+
+    if model is None:
+        chunks = []
+        for chunk in completion(
+            model=llm_model,
+            temperature=temperature,
+            messages=messages,
+            stream=True,
+            **kwargs,
+        ):
+            chunks.append(chunk)
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                if first_token_time is None:
+                    first_token_time = time.perf_counter() - start
+                yield delta
+        usage = stream_chunk_builder(chunks, messages=messages).usage
+    else:
+        client = get_instructor_client(instructor.Mode.TOOLS)
+        emitted = ""
+        partial = None
+        for partial in client.chat.completions.create_partial(
+            model=llm_model,
+            temperature=temperature,
+            messages=messages,
+            response_model=model,
+            **kwargs,
+        ):
+            value = getattr(partial, stream_field, None) or ""
+            if len(value) > len(emitted) and value.startswith(emitted):
+                if first_token_time is None:
+                    first_token_time = time.perf_counter() - start
+                yield value[len(emitted):]
+                emitted = value
+        ## Partial streams don't carry provider usage; count tokens locally.
+        prompt_tokens = token_counter(model=llm_model, messages=messages)
+        completion_tokens = token_counter(
+            model=llm_model, text=partial.model_dump_json() if partial else ""
+        )
+        usage = Usage(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        )
+
+    total_time = time.perf_counter() - start
+    logging.info(
+        f"{process_id or llm_model}: time to first token "
+        f"{first_token_time if first_token_time is not None else float('nan'):.2f}s, "
+        f"total {total_time:.2f}s"
+    )
+    log_llm_usage(usage, llm_model, process_id, verbose)
+
+
 def add_cache_control(
     messages: List[Dict], cache_message_index: int = 0, llm_model: str = "gpt-4"
 ) -> List[Dict]:
@@ -246,3 +529,64 @@ def add_cache_control(
     cached_messages[cache_message_index]["cache_control"] = {"type": "ephemeral"}
 
     return cached_messages
+
+
+def cached_prefix(messages: List[Dict]) -> List[Dict]:
+    """Messages up to and including the last one marked with cache_control."""
+    marked = [i for i, message in enumerate(messages) if message.get("cache_control")]
+    return messages[: marked[-1] + 1] if marked else []
+
+
+class DocumentSession:
+    """Group the calls made over one document so they share its prompt-cache entry.
+
+    Every query must start with the same cached prefix (system prompt plus the
+    document marked with cache_control, e.g. from
+    `format_paper_summary_and_facts_messages`). The first query writes the
+    cache; calls passed to `submit` wait until it has finished and then run
+    concurrently with whatever comes next, all reading the warm cache. The
+    cache lives for a few minutes after its last use, so dependent calls
+    should go through `query` back to back.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self.prefix: Optional[List[Dict]] = None
+        self._warm = threading.Event()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="document_session"
+        )
+
+    def query(self, **query) -> Union[BaseModel, str]:
+        """`run_instructor_query(**query)`, checking it reuses the session's cached prefix."""
+        prefix = cached_prefix(query.get("messages") or [])
+        if self.prefix is None:
+            self.prefix = prefix
+        elif prefix != self.prefix:
+            logging.warning(
+                f"{query.get('process_id')}: messages don't share the session's cached prefix"
+            )
+        try:
+            return run_instructor_query(**query)
+        finally:
+            ## Even a failed first call must not leave submitted calls waiting.
+            self._warm.set()
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Run `fn(*args, **kwargs)` in the background once the cache has been written."""
+
+        def after_warmup():
+            self._warm.wait()
+            return fn(*args, **kwargs)
+
+        return self._executor.submit(after_warmup)
+
+    def close(self) -> None:
+        ## Unblock anything still waiting if no query was ever made.
+        self._warm.set()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "DocumentSession":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,536 @@
+"""Provider batch APIs (Anthropic Message Batches, OpenAI Batch) for large backfills.
+
+Batch jobs trade latency (up to 24h) for half-price tokens. Requests are keyed
+by the caller (usually an arxiv_code). Submitted jobs are persisted per stage
+under LLM_BATCH_DIR, so an interrupted step collects them on its next run
+instead of paying for them twice.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+from utils.llm_scheduler import provider_for
+
+PROJECT_PATH = os.getenv("PROJECT_PATH", "/app")
+LLM_BATCH_DIR = os.getenv(
+    "LLM_BATCH_DIR", os.path.join(PROJECT_PATH, "data", "llm_batches")
+)
+LLM_BATCH_POLL_SECONDS = int(os.getenv("LLM_BATCH_POLL_SECONDS", 60))
+## Force a provider for every stage, e.g. 'local' for dry runs.
+LLM_BATCH_PROVIDER = os.getenv("LLM_BATCH_PROVIDER")
+## Both providers bill batch tokens at half the synchronous price.
+BATCH_COST_FACTOR = 0.5
+
+
+@dataclass
+class BatchRequest:
+    """One deferred `run_instructor_query` call; `model` is the optional response model."""
+
+    key: str
+    messages: List[Dict]
+    llm_model: str
+    temperature: Optional[float] = None
+    process_id: Optional[str] = None
+    model: Optional[Type[BaseModel]] = None
+    max_tokens: int = 4096
+
+
+@dataclass
+class BatchOutput:
+    """Raw provider output for one request: text, tool/JSON arguments or an error."""
+
+    output: Any = None
+    usage: Any = None
+    error: Optional[str] = None
+
+
+@dataclass
+class BatchResult:
+    key: str
+    response: Any = None
+    usage: Any = None
+    error: Optional[str] = None
+    request: Optional[BatchRequest] = field(default=None, repr=False)
+
+
+def make_usage(
+    prompt_tokens: int,
+    completion_tokens: int,
+    cache_creation_input_tokens: int = 0,
+    cache_read_input_tokens: int = 0,
+) -> SimpleNamespace:
+    """Usage object with the attributes `log_llm_usage` reads."""
+    return SimpleNamespace(
+        prompt_tokens=prompt_tokens or 0,
+        completion_tokens=completion_tokens or 0,
+        cache_creation_input_tokens=cache_creation_input_tokens or 0,
+        cache_read_input_tokens=cache_read_input_tokens or 0,
+    )
+
+
+def strip_provider_prefix(llm_model: str) -> str:
+    return llm_model.split("/", 1)[1] if "/" in llm_model else llm_model
+
+
+def to_anthropic_messages(messages: List[Dict]) -> tuple:
+    """Split LiteLLM-style messages into Anthropic (system blocks, messages).
+
+    Message-level `cache_control` moves onto the text block and consecutive
+    same-role messages are merged, as LiteLLM does for synchronous calls.
+    """
+    system, converted = [], []
+    for message in messages:
+        content = message["content"]
+        blocks = (
+            [dict(block) for block in content]
+            if isinstance(content, list)
+            else [{"type": "text", "text": content}]
+        )
+        if message.get("cache_control"):
+            blocks[-1]["cache_control"] = message["cache_control"]
+        if message["role"] == "system":
+            system.extend(blocks)
+        elif converted and converted[-1]["role"] == message["role"]:
+            converted[-1]["content"].extend(blocks)
+        else:
+            converted.append({"role": message["role"], "content": blocks})
+    return system, converted
+
+
+def to_openai_messages(messages: List[Dict]) -> List[Dict]:
+    """Drop Anthropic-only keys (prompt caching is automatic on OpenAI)."""
+    return [{k: v for k, v in m.items() if k != "cache_control"} for m in messages]
+
+
+class BatchProvider(ABC):
+    """Submit a job of {custom_id: request}, poll it and fetch {custom_id: BatchOutput}."""
+
+    name = "base"
+
+    @abstractmethod
+    def submit(self, requests: Dict[str, BatchRequest]) -> str:
+        """Submit the job and return its provider id."""
+
+    @abstractmethod
+    def is_done(self, job_id: str) -> bool:
+        """Whether the job has finished (successfully or not)."""
+
+    @abstractmethod
+    def results(self, job_id: str) -> Dict[str, BatchOutput]:
+        """Outputs of a finished job by custom_id."""
+
+
+class AnthropicBatchProvider(BatchProvider):
+    """Message Batches API; response models are forced as a single tool call."""
+
+    name = "anthropic"
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def batches(self):
+        if self._client is None:
+            import anthropic
+
+            self._client = anthropic.Anthropic()
+        messages = self._client.messages
+        return getattr(messages, "batches", None) or self._client.beta.messages.batches
+
+    @staticmethod
+    def params(request: BatchRequest) -> dict:
+        system, messages = to_anthropic_messages(request.messages)
+        params = {
+            "model": strip_provider_prefix(request.llm_model),
+            "max_tokens": request.max_tokens,
+            "messages": messages,
+        }
+        if system:
+            params["system"] = system
+        if request.temperature is not None:
+            params["temperature"] = request.temperature
+        if request.model is not None:
+            tool_name = request.model.__name__
+            params["tools"] = [
+                {
+                    "name": tool_name,
+                    "description": (request.model.__doc__ or tool_name).strip(),
+                    "input_schema": request.model.model_json_schema(),
+                }
+            ]
+            params["tool_choice"] = {"type": "tool", "name": tool_name}
+        return params
+
+    def submit(self, requests):
+        batch = self.batches.create(
+            requests=[
+                {"custom_id": custom_id, "params": self.params(request)}
+                for custom_id, request in requests.items()
+            ]
+        )
+        return batch.id
+
+    def is_done(self, job_id):
+        return self.batches.retrieve(job_id).processing_status == "ended"
+
+    def results(self, job_id):
+        outputs = {}
+        for entry in self.batches.results(job_id):
+            if entry.result.type != "succeeded":
+                outputs[entry.custom_id] = BatchOutput(error=entry.result.type)
+                continue
+            message = entry.result.message
+            tool_inputs = [b.input for b in message.content if b.type == "tool_use"]
+            text = "".join(b.text for b in message.content if b.type == "text")
+            usage = message.usage
+            outputs[entry.custom_id] = BatchOutput(
+                output=tool_inputs[0] if tool_inputs else text.strip(),
+                usage=make_usage(
+                    usage.input_tokens,
+                    usage.output_tokens,
+                    getattr(usage, "cache_creation_input_tokens", 0),
+                    getattr(usage, "cache_read_input_tokens", 0),
+                ),
+            )
+        return outputs
+
+
+class OpenAIBatchProvider(BatchProvider):
+    """Batch API over an uploaded JSONL of chat completions; response models use a JSON schema."""
+
+    name = "openai"
+    endpoint = "/v1/chat/completions"
+
+    def __init__(self, client=None):
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import openai
+
+            self._client = openai.OpenAI()
+        return self._client
+
+    def body(self, request: BatchRequest) -> dict:
+        body = {
+            "model": strip_provider_prefix(request.llm_model),
+            "messages": to_openai_messages(request.messages),
+            "max_completion_tokens": request.max_tokens,
+        }
+        if request.temperature is not None:
+            body["temperature"] = request.temperature
+        if request.model is not None:
+            body["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": request.model.__name__,
+                    "schema": request.model.model_json_schema(),
+                },
+            }
+        return body
+
+    def submit(self, requests):
+        lines = [
+            json.dumps(
+                {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": self.endpoint,
+                    "body": self.body(request),
+                }
+            )
+            for custom_id, request in requests.items()
+        ]
+        upload = self.client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode()), purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=upload.id, endpoint=self.endpoint, completion_window="24h"
+        )
+        return batch.id
+
+    def is_done(self, job_id):
+        status = self.client.batches.retrieve(job_id).status
+        return status in ("completed", "failed", "expired", "cancelled")
+
+    def results(self, job_id):
+        batch = self.client.batches.retrieve(job_id)
+        outputs = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                response = entry.get("response") or {}
+                if response.get("status_code") != 200:
+                    error = entry.get("error") or response.get("body", {}).get("error")
+                    outputs[entry["custom_id"]] = BatchOutput(error=str(error))
+                    continue
+                body = response["body"]
+                usage = body.get("usage", {})
+                outputs[entry["custom_id"]] = BatchOutput(
+                    output=body["choices"][0]["message"]["content"].strip(),
+                    usage=make_usage(
+                        usage.get("prompt_tokens"), usage.get("completion_tokens")
+                    ),
+                )
+        return outputs
+
+
+def echo_responder(request: dict) -> str:
+    """Default local response: the last user message."""
+    content = request["messages"][-1]["content"]
+    return content if isinstance(content, str) else json.dumps(content)
+
+
+class LocalBatchProvider(BatchProvider):
+    """File-based stand-in for tests and dry runs, no network involved.
+
+    A job is a directory holding requests.jsonl. After `ready_after` polls the
+    `responder` is applied to every request (a str, a dict for response models,
+    or an Exception to simulate a failed request) and results.jsonl is written.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        responder: Callable[[dict], Any] = echo_responder,
+        ready_after: int = 0,
+    ):
+        self.directory = directory or os.path.join(LLM_BATCH_DIR, "local")
+        self.responder = responder
+        self.ready_after = ready_after
+        self.submitted: List[str] = []
+
+    def _path(self, job_id: str, name: str) -> str:
+        return os.path.join(self.directory, job_id, name)
+
+    def submit(self, requests):
+        job_id = f"local_{uuid.uuid4().hex[:12]}"
+        os.makedirs(os.path.join(self.directory, job_id))
+        with open(self._path(job_id, "requests.jsonl"), "w") as f:
+            for custom_id, request in requests.items():
+                params = {
+                    "model": request.llm_model,
+                    "messages": request.messages,
+                    "temperature": request.temperature,
+                    "response_model": request.model.__name__ if request.model else None,
+                }
+                f.write(json.dumps({"custom_id": custom_id, "params": params}) + "\n")
+        with open(self._path(job_id, "state.json"), "w") as f:
+            json.dump({"polls": 0}, f)
+        self.submitted.append(job_id)
+        return job_id
+
+    def is_done(self, job_id):
+        if os.path.exists(self._path(job_id, "results.jsonl")):
+            return True
+        with open(self._path(job_id, "state.json")) as f:
+            state = json.load(f)
+        state["polls"] += 1
+        with open(self._path(job_id, "state.json"), "w") as f:
+            json.dump(state, f)
+        if state["polls"] <= self.ready_after:
+            return False
+
+        with open(self._path(job_id, "requests.jsonl")) as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        with open(self._path(job_id, "results.jsonl"), "w") as f:
+            for entry in entries:
+                try:
+                    result = {"output": self.responder(entry["params"])}
+                except Exception as e:
+                    result = {"error": f"{type(e).__name__}: {e}"}
+                f.write(json.dumps({"custom_id": entry["custom_id"], **result}) + "\n")
+        return True
+
+    def results(self, job_id):
+        outputs = {}
+        with open(self._path(job_id, "results.jsonl")) as f:
+            for line in f:
+                entry = json.loads(line)
+                if "error" in entry:
+                    outputs[entry["custom_id"]] = BatchOutput(error=entry["error"])
+                    continue
+                output = entry["output"]
+                outputs[entry["custom_id"]] = BatchOutput(
+                    output=output,
+                    usage=make_usage(len(json.dumps(output)) // 4, 0),
+                )
+        return outputs
+
+
+PROVIDERS: Dict[str, Type[BatchProvider]] = {
+    AnthropicBatchProvider.name: AnthropicBatchProvider,
+    OpenAIBatchProvider.name: OpenAIBatchProvider,
+    LocalBatchProvider.name: LocalBatchProvider,
+}
+_providers: Dict[str, BatchProvider] = {}
+
+
+def get_provider(name: str) -> BatchProvider:
+    if name not in PROVIDERS:
+        raise ValueError(f"No batch API for provider '{name}'. Choose from {list(PROVIDERS)}")
+    if name not in _providers:
+        _providers[name] = PROVIDERS[name]()
+    return _providers[name]
+
+
+def provider_name_for(llm_model: str) -> str:
+    return LLM_BATCH_PROVIDER or provider_for(llm_model)
+
+
+class BatchJobStore:
+    """JSON file of the jobs submitted for one stage, with their custom_id -> key maps."""
+
+    def __init__(self, stage: str, directory: str = LLM_BATCH_DIR):
+        safe_stage = re.sub(r"[^A-Za-z0-9_.-]", "_", stage)
+        self.path = os.path.join(directory, f"{safe_stage}.json")
+
+    def load(self) -> List[dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def save(self, jobs: List[dict]) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(jobs, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def add(self, job: dict) -> None:
+        self.save(self.load() + [job])
+
+    def open_jobs(self) -> List[dict]:
+        return [job for job in self.load() if job["status"] == "submitted"]
+
+    def in_flight_keys(self) -> set:
+        return {key for job in self.open_jobs() for key in job["ids"].values()}
+
+    def close(self, job_id: str) -> None:
+        jobs = self.load()
+        for job in jobs:
+            if job["job_id"] == job_id:
+                job["status"] = "collected"
+                job["collected_at"] = time.time()
+        self.save(jobs)
+
+
+def parse_output(output: Any, request: BatchRequest) -> Any:
+    if request.model is None:
+        return output if isinstance(output, str) else json.dumps(output)
+    if isinstance(output, str):
+        return request.model.model_validate_json(output)
+    return request.model.model_validate(output)
+
+
+def submit_requests(
+    store: BatchJobStore,
+    requests: List[BatchRequest],
+    provider: Optional[BatchProvider] = None,
+) -> List[str]:
+    """Submit one job per provider for the requests whose key is not already in flight."""
+    in_flight = store.in_flight_keys()
+    pending: Dict[str, BatchRequest] = {}
+    for request in requests:
+        if request.key not in in_flight:
+            pending.setdefault(request.key, request)
+
+    by_provider: Dict[str, List[BatchRequest]] = {}
+    for request in pending.values():
+        name = provider.name if provider else provider_name_for(request.llm_model)
+        by_provider.setdefault(name, []).append(request)
+
+    job_ids = []
+    for name, group in by_provider.items():
+        ## Provider custom_ids are restricted (no dots), so keys are mapped to positions.
+        custom_ids = {f"r{i}": request for i, request in enumerate(group)}
+        job_id = (provider or get_provider(name)).submit(custom_ids)
+        store.add(
+            {
+                "job_id": job_id,
+                "provider": name,
+                "status": "submitted",
+                "submitted_at": time.time(),
+                "ids": {cid: request.key for cid, request in custom_ids.items()},
+            }
+        )
+        logging.info(f"Submitted {name} batch {job_id} with {len(group)} requests")
+        job_ids.append(job_id)
+    return job_ids
+
+
+def collect_results(
+    store: BatchJobStore,
+    requests: List[BatchRequest],
+    provider: Optional[BatchProvider] = None,
+) -> Dict[str, BatchResult]:
+    """Fetch every finished job of the stage, mapped back to the caller's keys.
+
+    Results for keys the caller no longer asks for (e.g. rows stored by an
+    earlier run) are dropped.
+    """
+    by_key = {request.key: request for request in requests}
+    results = {}
+    for job in store.open_jobs():
+        job_provider = provider or get_provider(job["provider"])
+        if not job_provider.is_done(job["job_id"]):
+            continue
+        outputs = job_provider.results(job["job_id"])
+        for custom_id, key in job["ids"].items():
+            request = by_key.get(key)
+            if request is None:
+                continue
+            raw = outputs.get(custom_id, BatchOutput(error="missing from batch output"))
+            result = BatchResult(key=key, usage=raw.usage, error=raw.error, request=request)
+            if raw.error is None:
+                try:
+                    result.response = parse_output(raw.output, request)
+                except (ValidationError, ValueError) as e:
+                    result.error = f"Invalid response: {e}"
+            results[key] = result
+        store.close(job["job_id"])
+        logging.info(f"Collected {job['provider']} batch {job['job_id']}")
+    return results
+
+
+def run_batch(
+    stage: str,
+    requests: List[BatchRequest],
+    provider: Optional[BatchProvider] = None,
+    wait: bool = True,
+    poll_seconds: float = LLM_BATCH_POLL_SECONDS,
+    store: Optional[BatchJobStore] = None,
+) -> Dict[str, BatchResult]:
+    """Submit `requests` as batch jobs and return the finished results by key.
+
+    Jobs left open by an earlier run are collected first and their keys are not
+    resubmitted. With `wait=False` only already-finished jobs are returned; the
+    rest are picked up by the next call for the same stage.
+    """
+    store = store or BatchJobStore(stage)
+    results = collect_results(store, requests, provider)
+    submit_requests(store, [r for r in requests if r.key not in results], provider)
+    while True:
+        results.update(collect_results(store, requests, provider))
+        if not wait or not store.open_jobs():
+            return results
+        time.sleep(poll_seconds)
@@ -0,0 +1,199 @@
+"""Content-addressed cache for LLM responses (opt-in, see `run_instructor_query`)."""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+from sqlalchemy import text
+
+from utils.db.db_utils import execute_write_query, get_engine
+
+PROJECT_PATH = os.getenv("PROJECT_PATH", "/app")
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "0").lower() in ("1", "true", "yes")
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "sqlite")
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH", os.path.join(PROJECT_PATH, "data", "llm_cache.sqlite")
+)
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 50_000))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+## Per process_id TTL overrides in seconds, e.g. '{"resolve_query": 3600}'.
+LLM_CACHE_TTLS: Dict[str, int] = json.loads(os.getenv("LLM_CACHE_TTLS", "{}"))
+
+
+def cache_key(
+    llm_model: str,
+    messages: List[Dict],
+    response_model: Optional[Type[BaseModel]],
+    temperature: Optional[float],
+    kwargs: dict,
+) -> str:
+    """Hash of everything that determines the response."""
+    payload = {
+        "llm_model": llm_model,
+        "messages": messages,
+        "schema": response_model.model_json_schema() if response_model else None,
+        "temperature": temperature,
+        "kwargs": kwargs,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def serialize_response(response) -> str:
+    if isinstance(response, BaseModel):
+        return response.model_dump_json()
+    return json.dumps(response)
+
+
+def deserialize_response(value: str, response_model: Optional[Type[BaseModel]]):
+    if response_model is not None:
+        return response_model.model_validate_json(value)
+    return json.loads(value)
+
+
+def ttl_for(process_id: Optional[str]) -> int:
+    return LLM_CACHE_TTLS.get(process_id or "", LLM_CACHE_TTL)
+
+
+class LLMCacheBackend(ABC):
+    """Storage interface: entries are (response, prompt_tokens, completion_tokens) by key."""
+
+    @abstractmethod
+    def get(self, key: str, process_id: Optional[str]) -> Optional[Tuple[str, int, int]]:
+        """Entry for `key` if present and within the process' TTL."""
+
+    @abstractmethod
+    def set(
+        self,
+        key: str,
+        process_id: Optional[str],
+        llm_model: str,
+        response: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+    ) -> None:
+        """Store (or overwrite) the entry for `key`."""
+
+
+class SQLiteLLMCache(LLMCacheBackend):
+    """Local SQLite file, bounded to `max_entries` by least recent access."""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS llm_response_cache (
+                    key TEXT PRIMARY KEY,
+                    process_id TEXT,
+                    llm_model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    prompt_tokens INTEGER NOT NULL,
+                    completion_tokens INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS llm_response_cache_last_access ON llm_response_cache (last_access)"
+            )
+        return self._conn
+
+    def get(self, key, process_id):
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute(
+                "SELECT response, prompt_tokens, completion_tokens FROM llm_response_cache WHERE key = ? AND created > ?",
+                (key, now - ttl_for(process_id)),
+            ).fetchone()
+            if row is not None:
+                db.execute("UPDATE llm_response_cache SET last_access = ? WHERE key = ?", (now, key))
+        return row
+
+    def set(self, key, process_id, llm_model, response, prompt_tokens, completion_tokens):
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO llm_response_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, process_id, llm_model, response, prompt_tokens, completion_tokens, now, now),
+            )
+            db.execute(
+                """DELETE FROM llm_response_cache WHERE rowid IN (
+                    SELECT rowid FROM llm_response_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+
+
+class PostgresLLMCache(LLMCacheBackend):
+    """Shared `llm_response_cache` table (sql/create_llm_response_cache.sql)."""
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+
+    def get(self, key, process_id):
+        query = """
+            UPDATE llm_response_cache SET last_access = NOW()
+            WHERE key = :key AND tstp > NOW() - make_interval(secs => :ttl)
+            RETURNING response, prompt_tokens, completion_tokens
+        """
+        with get_engine().begin() as conn:
+            row = conn.execute(text(query), {"key": key, "ttl": ttl_for(process_id)}).fetchone()
+        return tuple(row) if row is not None else None
+
+    def set(self, key, process_id, llm_model, response, prompt_tokens, completion_tokens):
+        execute_write_query(
+            """
+            INSERT INTO llm_response_cache (key, process_id, llm_model, response, prompt_tokens, completion_tokens)
+            VALUES (:key, :process_id, :llm_model, :response, :prompt_tokens, :completion_tokens)
+            ON CONFLICT (key) DO UPDATE SET
+                response = EXCLUDED.response, tstp = NOW(), last_access = NOW()
+            """,
+            {
+                "key": key,
+                "process_id": process_id,
+                "llm_model": llm_model,
+                "response": response,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+            },
+        )
+        execute_write_query(
+            """
+            DELETE FROM llm_response_cache WHERE key IN (
+                SELECT key FROM llm_response_cache ORDER BY last_access DESC OFFSET :max_entries
+            )
+            """,
+            {"max_entries": self.max_entries},
+        )
+
+
+_backend: Optional[LLMCacheBackend] = None
+
+
+def get_backend() -> LLMCacheBackend:
+    """Process-wide backend chosen by LLM_CACHE_BACKEND ('sqlite' or 'postgres')."""
+    global _backend
+    if _backend is None:
+        _backend = PostgresLLMCache() if LLM_CACHE_BACKEND == "postgres" else SQLiteLLMCache()
+    return _backend
+
+
+def set_backend(backend: Optional[LLMCacheBackend]) -> None:
+    global _backend
+    _backend = backend
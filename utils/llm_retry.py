@@ -0,0 +1,278 @@
+"""Retry policy, retry-after parsing and per-provider circuit breakers for LLM calls.
+
+Shared by the synchronous `run_instructor_query` and the async LLMScheduler so
+both back off the same way and see the same breaker state for a provider.
+"""
+
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Optional
+
+TRANSIENT_ERROR_NAMES = {
+    "InternalServerError",
+    "ServiceUnavailableError",
+    "APIConnectionError",
+    "APITimeoutError",
+    "Timeout",
+}
+
+
+def status_code(error: Exception) -> Optional[int]:
+    return getattr(error, "status_code", None) or getattr(
+        getattr(error, "response", None), "status_code", None
+    )
+
+
+def is_rate_limit(error: Exception) -> bool:
+    return status_code(error) == 429 or type(error).__name__ == "RateLimitError"
+
+
+def is_server_error(error: Exception) -> bool:
+    """5xx, timeouts and connection failures: the provider (or the path to it) is unwell."""
+    status = status_code(error)
+    if isinstance(status, int) and status >= 500:
+        return True
+    return type(error).__name__ in TRANSIENT_ERROR_NAMES or isinstance(
+        error, (ConnectionError, TimeoutError)
+    )
+
+
+def is_retryable(error: Exception) -> bool:
+    return is_rate_limit(error) or is_server_error(error)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Seconds to wait according to the error's Retry-After (delta or HTTP date), if present."""
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        headers = getattr(error, "headers", None) or getattr(
+            getattr(error, "response", None), "headers", None
+        )
+        if headers:
+            value = headers.get("retry-after") or headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """Exponential backoff with jitter, deferring to the provider's retry-after when given."""
+
+    def __init__(
+        self,
+        max_retries: int = 5,
+        base_delay: float = 2.0,
+        max_delay: float = 60.0,
+        default_retry_after: float = 20.0,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.default_retry_after = default_retry_after
+
+    def backoff(self, attempt: int) -> float:
+        """Half the capped exponential delay plus up to the same again at random."""
+        delay = min(self.max_delay, self.base_delay * 2**attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def delay(self, attempt: int, error: Exception) -> float:
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            return retry_after
+        if is_rate_limit(error):
+            return self.default_retry_after * (1 + random.random())
+        return self.backoff(attempt)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open."""
+
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(f"Circuit open for {provider}, retry in {retry_in:.0f}s")
+        self.provider = provider
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive server errors.
+
+    While open every call fails fast. After `reset_timeout` seconds a single
+    probe call goes through (half-open): success closes the breaker, another
+    server error re-opens it, and a probe that ends without an outcome
+    (cancelled, interrupted) is released so the next call probes instead.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.opened_at is None:
+                return
+            retry_in = self.reset_timeout - (self.clock() - self.opened_at)
+            if retry_in > 0 or self.probing:
+                raise CircuitOpenError(self.provider, max(retry_in, 0.0))
+            self.probing = True
+
+    def release_probe(self) -> None:
+        """Let another call probe; the breaker stays half-open."""
+        with self._lock:
+            self.probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self) -> bool:
+        """Count a server error; returns True if this trips the breaker."""
+        with self._lock:
+            self.failures += 1
+            if self.probing or (
+                self.opened_at is None and self.failures >= self.failure_threshold
+            ):
+                self.opened_at = self.clock()
+                self.probing = False
+                return True
+            return False
+
+
+class Retrier:
+    """Retry policy, per-provider breakers and metrics built from config/llm_limits.yaml.
+
+    `metrics[provider]` counts calls, attempts, retries, wait_seconds,
+    failures, breaker_trips and breaker_rejections.
+    """
+
+    METRIC_KEYS = (
+        "calls",
+        "attempts",
+        "retries",
+        "wait_seconds",
+        "failures",
+        "breaker_trips",
+        "breaker_rejections",
+    )
+
+    def __init__(
+        self,
+        limits: dict,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        retry = limits.get("retry", {})
+        breaker = limits.get("circuit_breaker", {})
+        self.policy = RetryPolicy(
+            max_retries=limits.get("max_retries", 5),
+            base_delay=retry.get("base_delay", 2.0),
+            max_delay=retry.get("max_delay", 60.0),
+            default_retry_after=limits.get("default_retry_after", 20.0),
+        )
+        self.failure_threshold = breaker.get("failure_threshold", 5)
+        self.reset_timeout = breaker.get("reset_timeout", 60.0)
+        self.sleep = sleep
+        self.clock = clock
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.metrics: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        with self._lock:
+            if provider not in self._breakers:
+                self._breakers[provider] = CircuitBreaker(
+                    provider, self.failure_threshold, self.reset_timeout, self.clock
+                )
+            return self._breakers[provider]
+
+    def count(self, provider: str, key: str, amount: float = 1) -> None:
+        with self._lock:
+            stats = self.metrics.setdefault(provider, dict.fromkeys(self.METRIC_KEYS, 0))
+            stats[key] += amount
+
+    def before_attempt(self, provider: str) -> None:
+        """Fail fast if the provider's breaker is open; otherwise count the attempt."""
+        try:
+            self.breaker(provider).before_call()
+        except CircuitOpenError:
+            self.count(provider, "breaker_rejections")
+            raise
+        self.count(provider, "attempts")
+
+    def record_success(self, provider: str) -> None:
+        self.breaker(provider).record_success()
+
+    def abandon_attempt(self, provider: str) -> None:
+        """An attempt ended without an outcome (cancellation, KeyboardInterrupt)."""
+        self.breaker(provider).release_probe()
+
+    def record_error(self, provider: str, error: Exception) -> None:
+        if is_server_error(error):
+            self.count(provider, "failures")
+            if self.breaker(provider).record_failure():
+                self.count(provider, "breaker_trips")
+                logging.error(f"Circuit breaker opened for {provider} after: {error}")
+        else:
+            ## Rate limits and client errors still prove the provider is up.
+            self.record_success(provider)
+
+    def retry_delay(self, provider: str, attempt: int, error: Exception) -> float:
+        delay = self.policy.delay(attempt, error)
+        self.count(provider, "retries")
+        self.count(provider, "wait_seconds", delay)
+        return delay
+
+    def call(self, fn: Callable[[], Any], provider: str) -> Any:
+        """Run `fn`, retrying transient errors with backoff until max_retries."""
+        self.count(provider, "calls")
+        for attempt in range(self.policy.max_retries + 1):
+            self.before_attempt(provider)
+            try:
+                result = fn()
+            except Exception as e:
+                self.record_error(provider, e)
+                if not is_retryable(e) or attempt == self.policy.max_retries:
+                    raise
+                delay = self.retry_delay(provider, attempt, e)
+                logging.warning(
+                    f"{provider} call failed ({type(e).__name__}), "
+                    f"retry {attempt + 1}/{self.policy.max_retries} in {delay:.1f}s"
+                )
+                self.sleep(delay)
+                continue
+            except BaseException:
+                self.abandon_attempt(provider)
+                raise
+            self.record_success(provider)
+            return result
@@ -0,0 +1,215 @@
+"""Async scheduler enforcing per-provider LLM concurrency and rate limits."""
+
+import os
+import time
+import asyncio
+import logging
+import weakref
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import yaml
+
+from utils.llm_retry import Retrier, is_rate_limit, is_retryable, retry_after_seconds
+
+PROJECT_PATH = os.getenv("PROJECT_PATH", "/app")
+LLM_LIMITS_PATH = os.getenv(
+    "LLM_LIMITS_PATH", os.path.join(PROJECT_PATH, "config", "llm_limits.yaml")
+)
+
+DEFAULT_LIMITS = {
+    "providers": {"default": {"max_concurrency": 4, "rpm": 60, "tpm": 200_000}},
+    "max_retries": 5,
+    "default_retry_after": 20,
+    "retry": {"base_delay": 2, "max_delay": 60},
+    "circuit_breaker": {"failure_threshold": 5, "reset_timeout": 60},
+}
+
+
+def load_limits(path: str = LLM_LIMITS_PATH) -> dict:
+    """Read provider limits from YAML, falling back to conservative defaults."""
+    try:
+        with open(path) as f:
+            return {**DEFAULT_LIMITS, **(yaml.safe_load(f) or {})}
+    except FileNotFoundError:
+        logging.warning(f"LLM limits config not found at {path}, using defaults")
+        return DEFAULT_LIMITS
+
+
+def provider_for(llm_model: str) -> str:
+    """Map a LiteLLM model name to the provider whose limits apply."""
+    name = llm_model.lower()
+    if "claude" in name or name.startswith("anthropic/"):
+        return "anthropic"
+    if "gemini" in name:
+        return "gemini"
+    if name.startswith(("gpt", "o1", "o3", "o4", "openai/")):
+        return "openai"
+    return "default"
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute up to one minute's worth."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """Wait until `amount` units are available and take them; returns seconds waited."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                delay = (amount - self.tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+    def adjust(self, amount: float) -> None:
+        """Charge (positive) or refund (negative) units without waiting, e.g. after actual usage is known."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class ProviderLimiter:
+    """Concurrency cap, RPM/TPM buckets and shared 429 cool-down for one provider."""
+
+    def __init__(self, max_concurrency: int, rpm: float, tpm: float):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.cooldown_until = 0.0
+
+    async def wait_cooldown(self) -> None:
+        delay = self.cooldown_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+_retrier: Optional[Retrier] = None
+_retrier_lock = threading.Lock()
+
+
+def get_retrier() -> Retrier:
+    """Process-wide retrier, so sync and async calls share each provider's breaker."""
+    global _retrier
+    with _retrier_lock:
+        if _retrier is None:
+            _retrier = Retrier(load_limits())
+        return _retrier
+
+
+class LLMScheduler:
+    """Run many async LLM calls while keeping each provider under its configured limits.
+
+    Calls are zero-argument coroutine factories (so they can be retried), tagged
+    with the model name and an estimate of the tokens they will consume.
+    Schedulers built from explicit limits get their own Retrier; the default one
+    shares the process-wide breakers.
+    """
+
+    def __init__(self, limits: Optional[dict] = None, retrier: Optional[Retrier] = None):
+        self.limits = limits or load_limits()
+        self.retrier = retrier or (Retrier(self.limits) if limits else get_retrier())
+        self._limiters: Dict[str, ProviderLimiter] = {}
+        self.stats = {"calls": 0, "rate_limited": 0, "wait_seconds": 0.0}
+
+    def limiter(self, provider: str) -> ProviderLimiter:
+        if provider not in self._limiters:
+            providers = self.limits["providers"]
+            config = providers.get(provider) or providers.get("default") or DEFAULT_LIMITS["providers"]["default"]
+            self._limiters[provider] = ProviderLimiter(
+                config["max_concurrency"], config["rpm"], config["tpm"]
+            )
+        return self._limiters[provider]
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[Any]],
+        llm_model: str,
+        estimated_tokens: int = 1000,
+        usage_tokens: Optional[Callable[[Any], int]] = None,
+    ) -> Any:
+        """Run one call under its provider's limits.
+
+        429s pause the whole provider for their retry-after; server errors back
+        off (outside the concurrency slot) and count towards the circuit breaker.
+        """
+        provider = provider_for(llm_model)
+        limiter = self.limiter(provider)
+        self.retrier.count(provider, "calls")
+        for attempt in range(self.limits["max_retries"] + 1):
+            backoff = None
+            async with limiter.semaphore:
+                await limiter.wait_cooldown()
+                waited = await limiter.requests.acquire(1)
+                waited += await limiter.tokens.acquire(estimated_tokens)
+                self.stats["wait_seconds"] += waited
+                self.stats["calls"] += 1
+                self.retrier.before_attempt(provider)
+                try:
+                    result = await call()
+                except Exception as e:
+                    self.retrier.record_error(provider, e)
+                    if not is_retryable(e) or attempt == self.limits["max_retries"]:
+                        raise
+                    delay = self.retrier.retry_delay(provider, attempt, e)
+                    if not is_rate_limit(e):
+                        backoff = delay
+                    else:
+                        self.stats["rate_limited"] += 1
+                        ## Every task for this provider pauses, not just the one that was throttled.
+                        limiter.cooldown_until = max(limiter.cooldown_until, time.monotonic() + delay)
+                        logging.warning(f"{llm_model} rate limited, retrying in {delay:.1f}s")
+                        continue
+                except BaseException:
+                    ## Cancelled (e.g. by wait_for): a half-open probe must not stay in flight.
+                    self.retrier.abandon_attempt(provider)
+                    raise
+            if backoff is not None:
+                logging.warning(f"{llm_model} call failed, retrying in {backoff:.1f}s")
+                await asyncio.sleep(backoff)
+                continue
+            self.retrier.record_success(provider)
+            if usage_tokens is not None:
+                limiter.tokens.adjust(usage_tokens(result) - estimated_tokens)
+            return result
+
+    async def map(self, calls: List[dict], return_exceptions: bool = True) -> List[Any]:
+        """Run `run(**call)` for every call concurrently, preserving order."""
+        return await asyncio.gather(
+            *(self.run(**call) for call in calls), return_exceptions=return_exceptions
+        )
+
+
+## asyncio primitives are bound to a loop, so schedulers are kept per event loop.
+_schedulers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, LLMScheduler]" = weakref.WeakKeyDictionary()
+
+
+def get_scheduler() -> LLMScheduler:
+    """Scheduler shared by every call in the running event loop."""
+    loop = asyncio.get_running_loop()
+    if loop not in _schedulers:
+        _schedulers[loop] = LLMScheduler()
+    return _schedulers[loop]
+
+
+def run_all(coros: List[Awaitable[Any]], return_exceptions: bool = True) -> List[Any]:
+    """Run coroutines (e.g. `arun_instructor_query` calls) to completion from sync code."""
+
+    async def _gather():
+        return await asyncio.gather(*coros, return_exceptions=return_exceptions)
+
+    return asyncio.run(_gather())
@@ -9,13 +9,14 @@ import pandas as pd
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity, euclidean_distances
-from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Tuple
 import dotenv
 import ast
 
 from langchain_community.document_loaders import ArxivLoader
 
+import utils.token_budget as token_budget
+
 dotenv.load_dotenv()
 
 PROJECT_PATH = os.environ.get("PROJECT_PATH")
@@ -67,13 +68,11 @@ def tfidf_similarity(title1, title2, fitted=False):
 
 
 def compute_optimized_similarity(data_title, titles):
-    """Multithreading TF-IDF similarity computation."""
-    with ThreadPoolExecutor() as executor:
-        futures = [
-            executor.submit(tfidf_similarity, data_title, title, True)
-            for title in titles
-        ]
-    return [future.result() for future in futures]
+    """Vectorized TF-IDF similarity of one title against many (single sparse product)."""
+    if len(titles) == 0:
+        return []
+    vectors = vectorizer.transform([preprocess(data_title)] + [preprocess(t) for t in titles])
+    return cosine_similarity(vectors[0:1], vectors[1:])[0].tolist()
 
 
 def dict_similarity_matrix(doc_dict, ignore_columns=["Published"]):
@@ -506,10 +505,12 @@ def preprocess_arxiv_doc(
             doc_content = doc_content.split("References")[0]
 
     if token_encoder:
-        ntokens_doc = len(token_encoder.encode(doc_content))
+        ntokens_doc = token_budget.count_tokens(doc_content, encoding=token_encoder)
         print(f"Number of tokens: {ntokens_doc}")
         if ntokens_doc > max_tokens:
-            doc_content = doc_content[: int(max_tokens * 3)] + "... [truncated]"
+            doc_content = token_budget.fit_to_budget(
+                doc_content, max_tokens, encoding=token_encoder
+            )
 
     return doc_content
 
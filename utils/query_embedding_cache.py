@@ -0,0 +1,142 @@
+"""Two-level (in-process LRU + SQLite) cache for query embeddings."""
+
+import os
+import re
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+PROJECT_PATH = os.getenv("PROJECT_PATH", "/app")
+CACHE_PATH = os.getenv(
+    "QUERY_EMBEDDING_CACHE_PATH",
+    os.path.join(PROJECT_PATH, "data", "query_embedding_cache.sqlite"),
+)
+MEMORY_ENTRIES = int(os.getenv("QUERY_EMBEDDING_CACHE_MEMORY_ENTRIES", 2048))
+DISK_ENTRIES = int(os.getenv("QUERY_EMBEDDING_CACHE_DISK_ENTRIES", 100_000))
+TTL_SECONDS = int(os.getenv("QUERY_EMBEDDING_CACHE_TTL", 30 * 24 * 3600))
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a query for cache keys (case and whitespace insensitive)."""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class QueryEmbeddingCache:
+    """LRU in memory backed by a size- and TTL-bounded SQLite table, keyed on (model_name, query)."""
+
+    def __init__(
+        self,
+        path: Optional[str] = CACHE_PATH,
+        memory_entries: int = MEMORY_ENTRIES,
+        disk_entries: int = DISK_ENTRIES,
+        ttl_seconds: int = TTL_SECONDS,
+    ):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl_seconds = ttl_seconds
+        ## key -> (vector, created); the TTL applies to both levels.
+        self._memory: "OrderedDict[Tuple[str, str], Tuple[List[float], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        if self.path is None:
+            return None
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS query_embeddings (
+                    model_name TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    embedding BLOB NOT NULL,
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (model_name, query)
+                )"""
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS query_embeddings_last_access ON query_embeddings (last_access)"
+            )
+        return self._conn
+
+    def _remember(self, key: Tuple[str, str], vector: List[float], created: float) -> None:
+        self._memory[key] = (vector, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, queries: List[str], model_name: str) -> Dict[str, List[float]]:
+        """Look up queries, returning {query: vector} for hits only."""
+        found = {}
+        now = time.time()
+        with self._lock:
+            for query in queries:
+                key = (model_name, normalize_query(query))
+                if key in self._memory:
+                    vector, created = self._memory[key]
+                    if created > now - self.ttl_seconds:
+                        self._memory.move_to_end(key)
+                        found[query] = vector
+                        self.stats["memory_hits"] += 1
+                        continue
+                    del self._memory[key]
+                db = self._db()
+                row = None
+                if db is not None:
+                    row = db.execute(
+                        "SELECT embedding, created FROM query_embeddings WHERE model_name = ? AND query = ? AND created > ?",
+                        (key[0], key[1], now - self.ttl_seconds),
+                    ).fetchone()
+                if row is None:
+                    self.stats["misses"] += 1
+                    continue
+                db.execute(
+                    "UPDATE query_embeddings SET last_access = ? WHERE model_name = ? AND query = ?",
+                    (now, key[0], key[1]),
+                )
+                vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+                self._remember(key, vector, row[1])
+                found[query] = vector
+                self.stats["disk_hits"] += 1
+        return found
+
+    def put_many(self, queries: List[str], vectors: List[List[float]], model_name: str) -> None:
+        """Store vectors in both levels and evict expired / least recently used disk rows."""
+        now = time.time()
+        with self._lock:
+            rows = []
+            for query, vector in zip(queries, vectors):
+                key = (model_name, normalize_query(query))
+                self._remember(key, list(vector), now)
+                rows.append((key[0], key[1], np.asarray(vector, dtype=np.float32).tobytes(), now, now))
+            db = self._db()
+            if db is None or not rows:
+                return
+            db.executemany("INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            db.execute("DELETE FROM query_embeddings WHERE created <= ?", (now - self.ttl_seconds,))
+            db.execute(
+                """DELETE FROM query_embeddings WHERE rowid IN (
+                    SELECT rowid FROM query_embeddings ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.disk_entries,),
+            )
+
+    def hit_rate(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            db = self._db()
+            if db is not None:
+                db.execute("DELETE FROM query_embeddings")
@@ -0,0 +1,150 @@
+"""Pluggable rerankers for Q&A candidate documents.
+
+Every reranker maps (question, documents) to `po.RerankedDocuments`, labelling
+each document 1.0 (essential), 0.5 (supporting) or 0.0 (irrelevant), so they
+are interchangeable in `query_llmpedia_new`.
+"""
+
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, Type
+
+import numpy as np
+
+import utils.pydantic_objects as po
+import utils.prompts as ps
+from utils.instruct import run_instructor_query
+from utils.db import embedding_db
+from utils.embeddings import convert_query_to_vector
+from utils.similarity import normalize_rows
+
+CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+## Default label cutoffs. They are hand-set starting points, not fitted values:
+## - embedding: Voyage question-to-abstract cosines for papers the LLM reranker
+##   keeps mostly fall between 0.55 and 0.8, while off-topic candidates from the
+##   same search stay below ~0.5;
+## - cross_encoder: on the sigmoid of the MS MARCO logits, 0.5 is the model's own
+##   relevant/irrelevant boundary and 0.1 keeps weaker but on-topic passages.
+## Recalibrate against the LLM labels with executors/xx_eval_rerankers.py
+## (precision / recall per reranker) before relying on them for a new model.
+EMBEDDING_THRESHOLDS = (0.7, 0.55)
+CROSS_ENCODER_THRESHOLDS = (0.5, 0.1)
+
+
+def label_scores(
+    scores: np.ndarray, high_threshold: float, medium_threshold: float, name: str
+) -> po.RerankedDocuments:
+    """Turn per-document scores into 1.0 / 0.5 / 0.0 relevance labels."""
+    documents = []
+    for i, score in enumerate(scores):
+        selected = 1.0 if score >= high_threshold else 0.5 if score >= medium_threshold else 0.0
+        documents.append(
+            po.DocumentAnalysis(
+                document_id=i, analysis=f"{name} score {score:.3f}", selected=selected
+            )
+        )
+    return po.RerankedDocuments(documents=documents)
+
+
+class Reranker(ABC):
+    """Base class: label candidate documents by relevance to a question."""
+
+    name = "base"
+
+    @abstractmethod
+    def rerank(self, user_question: str, documents: list) -> po.RerankedDocuments:
+        """Label each of `documents` (by position) for `user_question`."""
+
+
+class LLMReranker(Reranker):
+    """Ask an LLM to read every abstract and label it."""
+
+    name = "llm"
+
+    def __init__(self, llm_model: str = "gpt-4o", temperature: float = 0.2):
+        self.llm_model = llm_model
+        self.temperature = temperature
+
+    def rerank(self, user_question: str, documents: list) -> po.RerankedDocuments:
+        system_message = "You are an expert system that can identify and select relevant arxiv papers that can be used to answer a user query."
+        rerank_msg = ps.create_rerank_user_prompt(user_question, documents)
+        return run_instructor_query(
+            system_message,
+            rerank_msg,
+            po.RerankedDocuments,
+            llm_model=self.llm_model,
+            temperature=self.temperature,
+            process_id="rerank_documents",
+        )
+
+
+class EmbeddingReranker(Reranker):
+    """Cosine between the question embedding and the stored abstract embeddings."""
+
+    name = "embedding"
+
+    def __init__(
+        self,
+        embedding_type: str = "voyage",
+        high_threshold: float = EMBEDDING_THRESHOLDS[0],
+        medium_threshold: float = EMBEDDING_THRESHOLDS[1],
+    ):
+        self.embedding_type = embedding_type
+        self.high_threshold = high_threshold
+        self.medium_threshold = medium_threshold
+
+    def rerank(self, user_question: str, documents: list) -> po.RerankedDocuments:
+        codes = [doc.arxiv_code for doc in documents]
+        matrix, ids = embedding_db.load_embedding_matrix(codes, "abstract", self.embedding_type)
+        query = normalize_rows([convert_query_to_vector(user_question, self.embedding_type)])[0]
+        similarities = normalize_rows(matrix) @ query if len(ids) else np.empty(0)
+
+        ## Documents without a stored vector are scored 0.
+        by_code = dict(zip(ids, similarities))
+        scores = np.array([by_code.get(code, 0.0) for code in codes], dtype=np.float32)
+        return label_scores(scores, self.high_threshold, self.medium_threshold, self.name)
+
+
+@lru_cache(maxsize=2)
+def _load_cross_encoder(model_name: str):
+    from sentence_transformers import CrossEncoder
+
+    return CrossEncoder(model_name, device="cpu")
+
+
+class CrossEncoderReranker(Reranker):
+    """CPU cross-encoder scoring (question, title + abstract) pairs in one batch."""
+
+    name = "cross_encoder"
+
+    def __init__(
+        self,
+        model_name: str = CROSS_ENCODER_MODEL,
+        high_threshold: float = CROSS_ENCODER_THRESHOLDS[0],
+        medium_threshold: float = CROSS_ENCODER_THRESHOLDS[1],
+    ):
+        self.model_name = model_name
+        self.high_threshold = high_threshold
+        self.medium_threshold = medium_threshold
+
+    def rerank(self, user_question: str, documents: list) -> po.RerankedDocuments:
+        model = _load_cross_encoder(self.model_name)
+        pairs = [(user_question, f"{doc.title}. {doc.abstract}") for doc in documents]
+        logits = np.asarray(model.predict(pairs, batch_size=max(len(pairs), 1)), dtype=np.float32)
+        scores = 1.0 / (1.0 + np.exp(-logits))
+        return label_scores(scores, self.high_threshold, self.medium_threshold, self.name)
+
+
+RERANKERS: Dict[str, Type[Reranker]] = {
+    LLMReranker.name: LLMReranker,
+    EmbeddingReranker.name: EmbeddingReranker,
+    CrossEncoderReranker.name: CrossEncoderReranker,
+}
+
+
+def get_reranker(name: str = "llm", **kwargs) -> Reranker:
+    """Instantiate a reranker by name ('llm', 'embedding' or 'cross_encoder')."""
+    if name not in RERANKERS:
+        raise ValueError(f"Unknown reranker: {name}. Choose from {list(RERANKERS)}")
+    return RERANKERS[name](**kwargs)
@@ -0,0 +1,93 @@
+"""Exact cosine similarity kernels over dense embedding matrices."""
+
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # pragma: no cover
+    threadpool_limits = None
+
+## Upper bound on the (block_rows x n_corpus) float32 score buffer.
+DEFAULT_MAX_BLOCK_BYTES = 256 * 1024 * 1024
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Return a float32 copy of the matrix with unit-norm rows."""
+    matrix = np.array(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def cosine_top_k(
+    queries: np.ndarray,
+    corpus: Optional[np.ndarray] = None,
+    k: int = 10,
+    exclude_self: bool = False,
+    max_block_bytes: int = DEFAULT_MAX_BLOCK_BYTES,
+    n_threads: Optional[int] = None,
+    normalized: bool = False,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact top-k cosine neighbours of each query row within the corpus.
+
+    Scores are computed in row blocks with float32 GEMM so memory stays below
+    `max_block_bytes`; `argpartition` selects candidates before a final sort.
+    If `corpus` is None the queries are searched against themselves and
+    `exclude_self` drops the diagonal. Returns (indices, scores), both (n_queries, k).
+    """
+    if corpus is None:
+        corpus = queries
+        if not normalized:
+            queries = corpus = normalize_rows(queries)
+    elif not normalized:
+        queries = normalize_rows(queries)
+        corpus = normalize_rows(corpus)
+
+    n_queries, n_corpus = len(queries), len(corpus)
+    k = min(k, n_corpus - (1 if exclude_self else 0))
+    indices = np.empty((n_queries, k), dtype=np.int64)
+    scores = np.empty((n_queries, k), dtype=np.float32)
+    if k <= 0 or n_queries == 0:
+        return indices, scores
+
+    block_rows = max(1, min(n_queries, max_block_bytes // (4 * n_corpus)))
+    corpus_t = np.ascontiguousarray(corpus.T)
+    limits = threadpool_limits(limits=n_threads, user_api="blas") if threadpool_limits and n_threads else nullcontext()
+
+    with limits:
+        for start in range(0, n_queries, block_rows):
+            end = min(start + block_rows, n_queries)
+            block = np.asarray(queries[start:end], dtype=np.float32) @ corpus_t
+            rows = np.arange(end - start)
+            if exclude_self:
+                block[rows, np.arange(start, end)] = -np.inf
+
+            ## Unordered top-k, then sort only those k columns.
+            if k < n_corpus:
+                top = np.argpartition(block, n_corpus - k, axis=1)[:, n_corpus - k:]
+            else:
+                top = np.broadcast_to(np.arange(n_corpus), (end - start, n_corpus))
+            top_scores = np.take_along_axis(block, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            indices[start:end] = np.take_along_axis(top, order, axis=1)
+            scores[start:end] = np.take_along_axis(top_scores, order, axis=1)
+
+    return indices, scores
+
+
+def top_k_neighbors(
+    matrix: np.ndarray,
+    ids: List[str],
+    k: int = 10,
+    **kwargs,
+) -> Dict[str, List[Tuple[str, float]]]:
+    """Map each id to its k most similar other ids with cosine scores."""
+    indices, scores = cosine_top_k(matrix, k=k, exclude_self=True, **kwargs)
+    return {
+        ids[i]: [(ids[j], float(s)) for j, s in zip(idx_row, score_row)]
+        for i, (idx_row, score_row) in enumerate(zip(indices, scores))
+    }
@@ -0,0 +1,115 @@
+"""Token budgets for paper content sent to LLMs.
+
+Documents are measured with a tiktoken encoding instead of character counts
+and trimmed on section and paragraph boundaries. References and appendices go
+first, then trailing paragraphs of the body.
+"""
+
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import tiktoken
+
+TRUNCATION_MARKER = "\n\n... [truncated]"
+HEADING_PATTERN = re.compile(r"^#{1,6}\s+(.*)$", re.MULTILINE)
+## Headings that start the back matter; every section after one is back matter too.
+BACK_MATTER_PATTERN = re.compile(
+    r"^\W*(?:[A-Z]|\d+)?\W*\s*(references|bibliography|appendix|appendices|"
+    r"supplementary|acknowledg(?:e)?ments?)\b",
+    re.IGNORECASE,
+)
+
+
+@lru_cache(maxsize=16)
+def encoding_for(llm_model: Optional[str] = None) -> tiktoken.Encoding:
+    """tiktoken encoding for a model; non-OpenAI models are approximated with cl100k_base."""
+    if llm_model:
+        try:
+            return tiktoken.encoding_for_model(llm_model.split("/")[-1])
+        except KeyError:
+            pass
+    return tiktoken.get_encoding("cl100k_base")
+
+
+TOKEN_COUNT_CACHE_SIZE = 8192
+## (sha1 of text, encoding name) -> count. Keyed on a digest so whole papers aren't kept alive.
+_token_counts: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+_token_counts_lock = threading.Lock()
+
+
+def count_tokens(text: str, llm_model: Optional[str] = None, encoding=None) -> int:
+    """Memoized token count, so re-budgeting the same paper doesn't re-encode it."""
+    encoding = encoding or encoding_for(llm_model)
+    key = (hashlib.sha1(text.encode("utf-8", "surrogatepass")).hexdigest(), encoding.name)
+    with _token_counts_lock:
+        if key in _token_counts:
+            _token_counts.move_to_end(key)
+            return _token_counts[key]
+    count = len(encoding.encode(text, disallowed_special=()))
+    with _token_counts_lock:
+        _token_counts[key] = count
+        while len(_token_counts) > TOKEN_COUNT_CACHE_SIZE:
+            _token_counts.popitem(last=False)
+    return count
+
+
+def split_sections(document: str) -> List[Tuple[str, bool]]:
+    """Split markdown into (section text, is_back_matter) at headings.
+
+    Text before the first heading is a section of its own. Plain text without
+    headings comes back as a single body section.
+    """
+    starts = [m.start() for m in HEADING_PATTERN.finditer(document)]
+    bounds = [0] + [s for s in starts if s > 0] + [len(document)]
+    sections, in_back_matter = [], False
+    for start, end in zip(bounds, bounds[1:]):
+        text = document[start:end]
+        heading = HEADING_PATTERN.match(text)
+        if heading and BACK_MATTER_PATTERN.match(heading.group(1)):
+            in_back_matter = True
+        sections.append((text, in_back_matter))
+    return sections
+
+
+def fit_to_budget(
+    document: str,
+    max_tokens: int,
+    llm_model: Optional[str] = None,
+    encoding=None,
+    marker: str = TRUNCATION_MARKER,
+) -> str:
+    """Trim a document to at most `max_tokens` tokens (marker included).
+
+    Back matter (references, appendices, acknowledgements) is dropped first,
+    last section first. If the body is still too long it is cut after the last
+    whole paragraph that fits, and only a single oversized paragraph is cut
+    mid-text.
+    """
+    encoding = encoding or encoding_for(llm_model)
+    if count_tokens(document, encoding=encoding) <= max_tokens:
+        return document
+
+    sections = split_sections(document)
+    while sections and sections[-1][1]:
+        sections.pop()
+        document = "".join(text for text, _ in sections)
+        if count_tokens(document, encoding=encoding) <= max_tokens:
+            return document
+
+    ## A budget smaller than the marker would turn the slice below into "all but the last N".
+    budget = max(max_tokens - count_tokens(marker, encoding=encoding), 0)
+    kept, used = [], 0
+    for paragraph in re.split(r"(?<=\n\n)", document):
+        tokens = count_tokens(paragraph, encoding=encoding)
+        if used + tokens > budget:
+            if not kept:
+                ## Nothing fits whole: cut the first paragraph at the token limit.
+                kept.append(encoding.decode(encoding.encode(paragraph, disallowed_special=())[:budget]))
+            break
+        kept.append(paragraph)
+        used += tokens
+    return "".join(kept).rstrip() + marker
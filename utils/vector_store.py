@@ -204,23 +204,47 @@ def convert_notes_to_narrative(
     return narrative
 
 
-def convert_notes_to_bullets(
+def chat_messages(system_message: str, user_message: str) -> List[Dict]:
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": user_message},
+    ]
+
+
+def convert_notes_to_bullets_query(
     paper_title: str, notes: str, model: str = "GPT-3.5-Turbo"
-) -> str:
-    """Convert notes to bullet point list."""
-    bullet_list = run_instructor_query(
-        ps.BULLET_LIST_SUMMARY_SYSTEM_PROMPT,
-        ps.BULLET_LIST_SUMMARY_USER_PROMPT.format(
-            paper_title=paper_title, previous_notes=notes
+) -> dict:
+    """Arguments of the bullet list call, for `run_instructor_query` or a `BatchRequest`."""
+    return {
+        "messages": chat_messages(
+            ps.BULLET_LIST_SUMMARY_SYSTEM_PROMPT,
+            ps.BULLET_LIST_SUMMARY_USER_PROMPT.format(
+                paper_title=paper_title, previous_notes=notes
+            ),
         ),
-        llm_model=model,
-        process_id="convert_notes_to_bullets",
-    ).strip()
+        "llm_model": model,
+        "temperature": 0.5,
+        "process_id": "convert_notes_to_bullets",
+    }
+
+
+def parse_bullet_list(response: str) -> str:
+    bullet_list = response.strip()
     if "<summary>" in bullet_list:
         bullet_list = bullet_list.split("<summary>")[1].split("</summary>")[0]
     return bullet_list
 
 
+def convert_notes_to_bullets(
+    paper_title: str, notes: str, model: str = "GPT-3.5-Turbo"
+) -> str:
+    """Convert notes to bullet point list."""
+    response = run_instructor_query(
+        **convert_notes_to_bullets_query(paper_title, notes, model)
+    )
+    return parse_bullet_list(response)
+
+
 def copywrite_summary(paper_title, previous_notes, narrative, model="GPT-3.5-Turbo"):
     """Copywrite a summary."""
     copywritten = run_instructor_query(
@@ -314,15 +338,24 @@ def generate_weekly_highlight(
     return weekly_highlight
 
 
+def extract_document_repo_query(paper_content: str, llm_model="gpt-4o") -> dict:
+    """Arguments of the repo extraction call, for `run_instructor_query` or a `BatchRequest`."""
+    return {
+        "messages": chat_messages(
+            ps.REPO_EXTRACTOR_SYSTEM_PROMPT,
+            ps.REPO_EXTRACTOR_USER_PROMPT.format(content=paper_content),
+        ),
+        "llm_model": llm_model,
+        "model": po.ExternalResources,
+        "temperature": 0.0,
+        "process_id": "extract_document_repo",
+    }
+
+
 def extract_document_repo(paper_content: str, llm_model="gpt-4o"):
     """Extract weekly repos."""
     weekly_repos = run_instructor_query(
-        ps.REPO_EXTRACTOR_SYSTEM_PROMPT,
-        ps.REPO_EXTRACTOR_USER_PROMPT.format(content=paper_content),
-        llm_model=llm_model,
-        model=po.ExternalResources,
-        temperature=0.0,
-        process_id="extract_document_repo",
+        **extract_document_repo_query(paper_content, llm_model)
     )
     return weekly_repos
 
@@ -810,6 +843,30 @@ def assess_llm_relevance(
     return relevance_info
 
 
+def generate_paper_punchline_query(
+    paper_title: str,
+    notes: str,
+    model: str = "claude-3-5-sonnet-20241022",
+) -> dict:
+    """Arguments of the punchline call, for `run_instructor_query` or a `BatchRequest`."""
+    return {
+        "messages": chat_messages(
+            ps.PUNCHLINE_SUMMARY_SYSTEM_PROMPT.format(paper_title=paper_title),
+            ps.PUNCHLINE_SUMMARY_USER_PROMPT.format(notes=notes),
+        ),
+        "llm_model": model,
+        "temperature": 1,
+        "process_id": "generate_paper_punchline",
+    }
+
+
+def parse_punchline(response: str) -> str:
+    punchline = response
+    if "<punchline>" in punchline:
+        punchline = punchline.split("<punchline>")[1].split("</punchline>")[0]
+    return punchline.strip()
+
+
 def generate_paper_punchline(
     paper_title: str,
     notes: str,
@@ -817,17 +874,9 @@ def generate_paper_punchline(
 ) -> str:
     """Generate a single-sentence punchline summary that captures the main finding or contribution of the paper."""
     punchline = run_instructor_query(
-        ps.PUNCHLINE_SUMMARY_SYSTEM_PROMPT.format(paper_title=paper_title),
-        ps.PUNCHLINE_SUMMARY_USER_PROMPT.format(notes=notes),
-        llm_model=model,
-        process_id="generate_paper_punchline",
-        temperature=1,
+        **generate_paper_punchline_query(paper_title, notes, model)
     )
-
-    if "<punchline>" in punchline:
-        punchline = punchline.split("<punchline>")[1].split("</punchline>")[0]
-
-    return punchline.strip()
+    return parse_punchline(punchline)
 
 
 def format_paper_summary_and_facts_messages(
@@ -854,12 +903,12 @@ def format_paper_summary_and_facts_messages(
     return cached_messages
 
 
-def generate_paper_interesting_facts(
+def generate_paper_interesting_facts_query(
     paper_title: str,
     paper_content: str,
     model: str = "claude-3-5-sonnet-20241022",
-) -> str:
-    """Extract up to 5 interesting, unusual, or counterintuitive facts from the paper."""
+) -> dict:
+    """Arguments of the interesting facts call, for `run_instructor_query` or a `BatchRequest`."""
 
     # Check if model supports caching (Claude models)
     if any(provider in model.lower() for provider in ["claude", "anthropic"]):
@@ -870,25 +919,31 @@ def generate_paper_interesting_facts(
             task_instruction=FACT_EXTRACTION_TASK_INSTRUCTION,
             llm_model=model,
         )
-
-        interesting_facts = run_instructor_query(
-            llm_model=model,
-            temperature=1,
-            process_id="generate_paper_interesting_facts",
-            messages=messages,
-            # thinking={"type": "enabled", "budget_tokens": 2048},
-        )
     else:
         # Fallback to original approach for non-Claude models
-        interesting_facts = run_instructor_query(
+        messages = chat_messages(
             ps.INTERESTING_FACTS_SYSTEM_PROMPT.format(paper_title=paper_title),
             ps.INTERESTING_FACTS_USER_PROMPT.format(paper_content=paper_content),
-            llm_model=model,
-            temperature=1,
-            process_id="generate_paper_interesting_facts",
-            # thinking={"type": "enabled", "budget_tokens": 2048},
         )
 
+    return {
+        "messages": messages,
+        "llm_model": model,
+        "temperature": 1,
+        "process_id": "generate_paper_interesting_facts",
+        # "thinking": {"type": "enabled", "budget_tokens": 2048},
+    }
+
+
+def generate_paper_interesting_facts(
+    paper_title: str,
+    paper_content: str,
+    model: str = "claude-3-5-sonnet-20241022",
+) -> str:
+    """Extract up to 5 interesting, unusual, or counterintuitive facts from the paper."""
+    interesting_facts = run_instructor_query(
+        **generate_paper_interesting_facts_query(paper_title, paper_content, model)
+    )
     return interesting_facts.strip()
 
 
@@ -1122,14 +1177,14 @@ def analyze_cross_subreddit_patterns(
     return response
 
 
-def summarize_full_document(
+def summarize_full_document_query(
     paper_title: str,
     document: str,
     paragraphs: int = 5,
     previous_notes: str = None,
     model: str = "gemini/gemini-2.5-pro",
-) -> str:
-    """Summarize a full paper markdown into a specified number of paragraphs."""
+) -> dict:
+    """Arguments of the full-document summary call, for `run_instructor_query` or a `BatchRequest`."""
 
     # Check if model supports caching (Claude models)
     if any(provider in model.lower() for provider in ["claude", "anthropic"]):
@@ -1168,13 +1223,6 @@ Provide your response inside the <summary> tags. Do not include any other text.
             task_instruction=task_instruction,
             llm_model=model,
         )
-
-        summary = run_instructor_query(
-            llm_model=model,
-            process_id="summarize_full_document",
-            temperature=0.3,
-            messages=messages,
-        )
     else:
         # Fallback to original approach for non-Claude models
         system_prompt = ps.FULL_DOCUMENT_SUMMARY_SYSTEM_PROMPT.format(
@@ -1186,16 +1234,32 @@ Provide your response inside the <summary> tags. Do not include any other text.
             previous_notes=previous_notes,
             tweet_base_style=ps.TWEET_BASE_STYLE,
         )
+        messages = chat_messages(system_prompt, user_prompt)
 
-        summary = run_instructor_query(
-            system_prompt,
-            user_prompt,
-            llm_model=model,
-            process_id="summarize_full_document",
-            temperature=0.3,
-        )
+    return {
+        "messages": messages,
+        "llm_model": model,
+        "temperature": 0.3,
+        "process_id": "summarize_full_document",
+    }
 
-    summary = summary.split("<summary>")[1].split("</summary>")[0]
-    summary = summary.strip()
 
-    return summary
+def parse_full_document_summary(response: str) -> str:
+    summary = response.split("<summary>")[1].split("</summary>")[0]
+    return summary.strip()
+
+
+def summarize_full_document(
+    paper_title: str,
+    document: str,
+    paragraphs: int = 5,
+    previous_notes: str = None,
+    model: str = "gemini/gemini-2.5-pro",
+) -> str:
+    """Summarize a full paper markdown into a specified number of paragraphs."""
+    summary = run_instructor_query(
+        **summarize_full_document_query(
+            paper_title, document, paragraphs, previous_notes, model
+        )
+    )
+    return parse_full_document_summary(summary)
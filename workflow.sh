@@ -78,9 +78,7 @@ while true; do
     run_step "2: Meta-Data Collect" "workflow/c0_fetch_meta.py"
     # run_step "3: Summarizer" "workflow/d0_summarize.py"
     run_step "3: Full Document Processor" "workflow/d2_summarize_full.py"
-    run_step "4: Narrator" "workflow/e0_narrate.py"
-    run_step "4.1: Bullet List" "workflow/e1_narrate_bullet.py"
-    run_step "4.2: Punchline" "workflow/e2_narrate_punchline.py"
+    run_step "4: Narrator (narrative, bullet list, punchline)" "workflow/e0_narrate_card.py"
     # run_step "4.3: Interesting Facts" "workflow/e3_extract_interesting_facts.py"
     # run_step "4.2: Data Card" "workflow/e2_data_card.py" # BY DEMAND
     run_step "5: Reviewer" "workflow/f0_review.py"
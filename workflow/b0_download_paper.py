@@ -13,10 +13,14 @@ import time
 import utils.paper_utils as pu
 import utils.vector_store as vs
 import utils.db.db_utils as db_utils
+from utils.token_budget import fit_to_budget
 from utils.logging_utils import setup_logger
 
 logger = setup_logger(__name__, "b0_download_paper.log")
 
+verification_model = "gemini/gemini-2.5-pro-preview-05-06"
+verification_budget = 1500  ## tokens of paper text shown to the LLM-paper check
+
 
 def update_gist(gist_id, gist_filename, paper_list, logger):
     """Update the gist with the current queue."""
@@ -103,8 +107,13 @@ def main():
 
         ## Verify it's an LLM paper.
         is_llm_paper = vs.verify_llm_paper(
-            new_content[:5000] + " ...[continued]...",
-            llm_model="gemini/gemini-2.5-pro-preview-05-06",
+            fit_to_budget(
+                new_content,
+                verification_budget,
+                llm_model=verification_model,
+                marker=" ...[continued]...",
+            ),
+            llm_model=verification_model,
         )
         if not is_llm_paper["is_related"]:
             logger.info(
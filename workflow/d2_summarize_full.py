@@ -1,5 +1,8 @@
 import sys, os
+import time
+import argparse
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
 # Project path setup
@@ -13,15 +16,18 @@ import utils.vector_store as vs
 import utils.paper_utils as pu
 import utils.app_utils as au
 import utils.db.db_utils as db_utils
-
-# import utils.db.paper_db as paper_db # Not directly used in the refined combined logic
+import utils.db.paper_db as paper_db
+from utils.instruct import DocumentSession, prompt_cache_report, run_instructor_batch
+from utils.llm_batch import BatchRequest
+from utils.token_budget import fit_to_budget
 from utils.logging_utils import setup_logger
 
 logger = setup_logger(__name__, "d2_summarize_full.log")
 
 summarization_model = "claude-3-7-sonnet-20250219"
 facts_model = "claude-3-7-sonnet-20250219"
-context_size = 5000
+context_budget = 5000  ## tokens of paper markdown sent with every summary / facts call
+paragraph_lengths = [1, 3, 5, 10]  # [2, 20] are not used anymore
 
 
 def parse_interesting_facts(xml_content):
@@ -40,90 +46,269 @@ def parse_interesting_facts(xml_content):
     return facts
 
 
-def summarize_paper(arxiv_code, paper_title, paper_content, model_name):
-    """Generates summaries for a paper at multiple paragraph lengths and uploads them."""
+def summarize_paper(arxiv_code, paper_title, paper_content, model_name, session):
+    """Generates summaries for a paper at multiple paragraph lengths.
+
+    Levels run back to back in the paper's document session, so each one reads
+    the prompt cache the previous call kept warm.
+    """
     logger.info(f"Starting summarization for {arxiv_code} - '{paper_title}'")
-    paragraph_lengths = [1, 3, 5, 10]  # [2, 20] are not used anymore
-    summary_notes_list = []
+    summaries = {}
     current_summary_text = "N/A"  ## Initial text for the first 'previous_notes'
 
     for paragraphs in paragraph_lengths:
         # logger.debug(f"  Generating {paragraphs}-paragraph summary for {arxiv_code}...")
         previous_notes_for_model = current_summary_text[:]
 
-        generated_summary_text = vs.summarize_full_document(
-            paper_title,
-            paper_content,
-            paragraphs=paragraphs,
-            previous_notes=previous_notes_for_model,
-            model=model_name,
+        generated_summary_text = vs.parse_full_document_summary(
+            session.query(
+                **vs.summarize_full_document_query(
+                    paper_title,
+                    paper_content,
+                    paragraphs=paragraphs,
+                    previous_notes=previous_notes_for_model,
+                    model=model_name,
+                )
+            )
         )
         current_summary_text = (
             generated_summary_text  ## Update for the next iteration's previous_notes
         )
-
-        tokens = len(
-            vs.token_encoder.encode(generated_summary_text)
-        )  # Assuming vs.token_encoder is available
-        summary_notes_list.append(
-            {
-                "level": paragraphs,
-                "summary": generated_summary_text,
-                "tokens": tokens,
-                "arxiv_code": arxiv_code,
-                "tstp": pd.Timestamp.now(),
-                "method": "full_text",
-            }
-        )
-        # logger.debug(f"  Completed {paragraphs}-paragraph summary for {arxiv_code} ({tokens} tokens).")
-
-    if summary_notes_list:
-        summary_notes_df = pd.DataFrame(summary_notes_list)
-        db_utils.upload_dataframe(summary_notes_df, "summary_notes", if_exists="append")
-        logger.info(f"Successfully stored summaries for {arxiv_code} - '{paper_title}'")
-        return True
-    else:
-        logger.warning(f"No summaries generated for {arxiv_code} - '{paper_title}'")
+        summaries[paragraphs] = generated_summary_text
+
+    return summaries
+
+
+def store_paper(arxiv_code, summaries, facts=None):
+    """Commit a paper's {level: summary} notes and its facts in one idempotent transaction.
+
+    Returns False if the paper already had notes (e.g. stored by an overlapping run).
+    """
+    summary_notes_list = [
+        {
+            "level": paragraphs,
+            "summary": summary_text,
+            "tokens": len(vs.token_encoder.encode(summary_text)),
+            "arxiv_code": arxiv_code,
+            "tstp": pd.Timestamp.now(),
+            "method": "full_text",
+        }
+        for paragraphs, summary_text in summaries.items()
+    ]
+    if not summary_notes_list:
         return False
+    return paper_db.store_full_text_notes(
+        arxiv_code, summary_notes_list, facts_records(arxiv_code, facts)
+    )
+
+
+def facts_records(arxiv_code, facts):
+    """Rows for summary_interesting_facts."""
+    return [
+        {
+            "arxiv_code": arxiv_code,
+            "fact_id": fact_id,
+            "fact": fact_text,
+            "tstp": pd.Timestamp.now(),
+        }
+        for fact_id, fact_text in enumerate(facts or [], 1)
+    ]
 
 
-def extract_facts_for_paper(arxiv_code, paper_title, paper_content, model_name):
-    """Extracts interesting facts for a paper and uploads them."""
+def extract_facts_for_paper(arxiv_code, paper_title, paper_content, model_name, session):
+    """Extracts interesting facts for a paper (stored by the caller once summaries succeed)."""
     logger.info(
         f"Starting interesting facts extraction for {arxiv_code} - '{paper_title}'"
     )
 
-    interesting_facts_xml = vs.generate_paper_interesting_facts(
-        paper_title, paper_content, model=model_name
-    )
+    interesting_facts_xml = session.query(
+        **vs.generate_paper_interesting_facts_query(
+            paper_title, paper_content, model=model_name
+        )
+    ).strip()
     facts = parse_interesting_facts(interesting_facts_xml)
 
     if not facts:
         raise ValueError(
             f"No valid facts found for {arxiv_code} - '{paper_title}'. Expected at least 1 fact."
         )
+    return facts
+
+
+def run_batch(papers, facts_papers, fact_extracted_codes_db):
+    """Summarize and extract facts for {arxiv_code: (title, content)} through the batch API.
+
+    Each summary level expands the previous one, so levels run as successive
+    batch rounds over all papers. Fact extraction is independent and is
+    submitted up front, overlapping the summary rounds; it also covers
+    `facts_papers`, whose notes were stored without facts by an earlier run.
+    Unlike the other batch steps this always waits, since later rounds need
+    earlier results.
+    """
+    fact_papers = {
+        arxiv_code: paper
+        for arxiv_code, paper in papers.items()
+        if arxiv_code not in fact_extracted_codes_db
+    }
+    fact_papers.update(facts_papers)
+    fact_requests = [
+        BatchRequest(
+            key=arxiv_code,
+            **vs.generate_paper_interesting_facts_query(title, content, model=facts_model),
+        )
+        for arxiv_code, (title, content) in fact_papers.items()
+    ]
+    ## Jobs left finished by an earlier run are collected (and closed) here, so keep them.
+    fact_results = run_instructor_batch("d2_summarize_full_facts", fact_requests, wait=False)
 
-    data = []
-    for fact_id, fact_text in enumerate(facts, 1):
-        data.append(
-            {
-                "arxiv_code": arxiv_code,
-                "fact_id": fact_id,
-                "fact": fact_text,
-                "tstp": pd.Timestamp.now(),
-            }
+    summaries = {arxiv_code: {} for arxiv_code in papers}
+    previous_notes = {arxiv_code: "N/A" for arxiv_code in papers}
+    for paragraphs in paragraph_lengths:
+        ## Papers that failed an earlier level drop out and are retried next run.
+        requests = [
+            BatchRequest(
+                key=arxiv_code,
+                **vs.summarize_full_document_query(
+                    title,
+                    content,
+                    paragraphs=paragraphs,
+                    previous_notes=previous_notes[arxiv_code],
+                    model=summarization_model,
+                ),
+            )
+            for arxiv_code, (title, content) in papers.items()
+            if arxiv_code in previous_notes
+        ]
+        results = run_instructor_batch(f"d2_summarize_full_level_{paragraphs}", requests)
+        previous_notes = {}
+        for arxiv_code, result in results.items():
+            if result.error is not None:
+                continue
+            try:
+                summary = vs.parse_full_document_summary(result.response)
+            except IndexError:
+                logger.warning(f"{arxiv_code}: no <summary> in level {paragraphs} response")
+                continue
+            summaries[arxiv_code][paragraphs] = summary
+            previous_notes[arxiv_code] = summary
+        logger.info(f"Batch level {paragraphs}: {len(previous_notes)}/{len(requests)} summaries")
+
+    fact_results.update(
+        run_instructor_batch(
+            "d2_summarize_full_facts",
+            [r for r in fact_requests if r.key not in fact_results],
         )
-    if data:
-        facts_df = pd.DataFrame(data)
-        db_utils.upload_dataframe(facts_df, "summary_interesting_facts")
-        logger.info(
-            f"Successfully stored interesting facts for {arxiv_code} - '{paper_title}'"
+    )
+    facts = {}
+    for arxiv_code, result in fact_results.items():
+        if result.error is None:
+            facts[arxiv_code] = parse_interesting_facts(result.response)
+
+    summaries_added, facts_added = 0, 0
+    for arxiv_code in previous_notes:
+        if store_paper(arxiv_code, summaries[arxiv_code], facts.get(arxiv_code)):
+            summaries_added += 1
+            facts_added += bool(facts.get(arxiv_code))
+    for arxiv_code in facts_papers:
+        facts_added += paper_db.store_interesting_facts(
+            facts_records(arxiv_code, facts.get(arxiv_code))
+        )
+
+    logger.info(f"Total summaries generated in this run: {summaries_added}.")
+    logger.info(f"Total sets of interesting facts generated in this run: {facts_added}.")
+    ## Papers stored without facts are picked up by the facts-only pass of a later run.
+    logger.info(
+        f"Papers left without interesting facts in this run: {len(fact_papers) - facts_added}."
+    )
+
+
+def process_paper(arxiv_code, paper_title, extract_facts):
+    """Summarize one paper (and extract its facts) and commit both together.
+
+    Returns (status, facts_stored) with status one of "summarized", "skipped" or "failed".
+    Safe to run for several papers at once; the summary levels within the paper stay sequential.
+    """
+    if not paper_title:
+        logger.warning(f"{arxiv_code}: Could not find title in meta-database. Skipping.")
+        return "skipped", False
+    ## Another run may have picked the paper up since the backlog was listed.
+    if paper_db.full_text_notes_exist(arxiv_code):
+        logger.info(f"{arxiv_code}: Summary notes already stored. Skipping.")
+        return "skipped", False
+
+    paper_content, success = au.get_paper_markdown(arxiv_code)
+    if not success:
+        logger.warning(
+            f"{arxiv_code}: Could not retrieve markdown for '{paper_title}'. Skipping."
+        )
+        return "skipped", False
+    paper_content = fit_to_budget(
+        paper_content, context_budget, llm_model=summarization_model
+    )  # Limit content size, trimming back matter first
+
+    ## Both tasks share the paper's prompt cache: the first summary level writes
+    ## it, then fact extraction runs alongside the remaining levels.
+    with DocumentSession() as session:
+        facts_future = None
+        if extract_facts:
+            facts_future = session.submit(
+                extract_facts_for_paper,
+                arxiv_code,
+                paper_title,
+                paper_content,
+                facts_model,
+                session,
+            )
+        summaries = summarize_paper(
+            arxiv_code, paper_title, paper_content, summarization_model, session
         )
-        return True
-    return False
+        facts = None
+        if facts_future is not None:
+            try:
+                facts = facts_future.result()
+            except Exception as e:
+                ## Don't lose the summaries over the facts: the next run's facts-only pass retries them.
+                logger.warning(f"{arxiv_code}: Interesting facts extraction failed: {e}")
+
+    if not summaries:
+        logger.warning(f"{arxiv_code}: Summarization failed for '{paper_title}'.")
+        return "failed", False
+    if not store_paper(arxiv_code, summaries, facts):
+        logger.info(f"{arxiv_code}: Summary notes were stored by another run. Discarding.")
+        return "skipped", False
+    logger.info(f"{arxiv_code}: Stored summaries{' and facts' if facts else ''} for '{paper_title}'.")
+    return "summarized", bool(facts)
+
+
+def process_facts(arxiv_code, paper_title):
+    """Extract and store facts for a paper whose notes were stored without them.
+
+    Returns (status, facts_stored) like `process_paper`, with status "facts_only".
+    """
+    if not paper_title:
+        logger.warning(f"{arxiv_code}: Could not find title in meta-database. Skipping.")
+        return "skipped", False
+    paper_content, success = au.get_paper_markdown(arxiv_code)
+    if not success:
+        logger.warning(
+            f"{arxiv_code}: Could not retrieve markdown for '{paper_title}'. Skipping."
+        )
+        return "skipped", False
+    paper_content = fit_to_budget(paper_content, context_budget, llm_model=facts_model)
+    try:
+        with DocumentSession() as session:
+            facts = extract_facts_for_paper(
+                arxiv_code, paper_title, paper_content, facts_model, session
+            )
+    except Exception as e:
+        logger.warning(f"{arxiv_code}: Interesting facts extraction failed: {e}")
+        return "facts_only", False
+    paper_db.store_interesting_facts(facts_records(arxiv_code, facts))
+    logger.info(f"{arxiv_code}: Stored facts for '{paper_title}'.")
+    return "facts_only", True
 
 
-def main():
+def main(batch: bool = False, workers: int = 1):
     logger.info(
         "Starting combined paper processing: Summarization and Interesting Facts Extraction."
     )
@@ -148,75 +333,105 @@ def main():
     papers_needing_summarization = sorted(
         list(all_md_papers - summarized_codes_db), reverse=True
     )
+    ## Papers whose notes were stored while their fact extraction failed.
+    papers_needing_facts = sorted(
+        list((all_md_papers & summarized_codes_db) - fact_extracted_codes_db), reverse=True
+    )
 
-    total_papers_to_process = len(papers_needing_summarization)
+    total_papers_to_process = len(papers_needing_summarization) + len(papers_needing_facts)
     if total_papers_to_process == 0:
-        logger.info("No new papers found requiring summarization. Exiting.")
+        logger.info("No new papers found requiring summarization or facts. Exiting.")
         return
 
-    logger.info(f"Found {total_papers_to_process} papers requiring summarization.")
-
-    summaries_added_count = 0
-    facts_added_count = 0
-
-    for idx, arxiv_code in enumerate(papers_needing_summarization, 1):
-        log_prefix = f"[{idx}/{total_papers_to_process}] {arxiv_code}:"
-        logger.info(f"{log_prefix} Starting processing for summarization.")
+    logger.info(
+        f"Found {len(papers_needing_summarization)} papers requiring summarization "
+        f"and {len(papers_needing_facts)} requiring interesting facts only."
+    )
 
-        paper_title = title_map.get(arxiv_code)
-        if not paper_title:
-            logger.warning(
-                f"{log_prefix} Could not find title in meta-database. Skipping."
-            )
-            continue
+    if batch:
+        def load_papers(arxiv_codes):
+            papers = {}
+            for arxiv_code in arxiv_codes:
+                paper_title = title_map.get(arxiv_code)
+                paper_content, success = au.get_paper_markdown(arxiv_code)
+                if paper_title and success:
+                    papers[arxiv_code] = (
+                        paper_title,
+                        fit_to_budget(paper_content, context_budget, llm_model=summarization_model),
+                    )
+            return papers
+
+        run_batch(
+            load_papers(papers_needing_summarization),
+            load_papers(papers_needing_facts),
+            fact_extracted_codes_db,
+        )
+        logger.info(f"Combined paper processing completed.")
+        return
 
-        paper_content, success = au.get_paper_markdown(arxiv_code)
-        if not success:
-            logger.warning(
-                f"{log_prefix} Could not retrieve markdown for '{paper_title}'. Skipping."
-            )
-            continue
-        paper_content = paper_content[: context_size * 4]  # Limit content size
-
-        ## Task 1: Summarization (for papers in papers_needing_summarization)
-        summary_succeeded_this_run = False
-        if summarize_paper(arxiv_code, paper_title, paper_content, summarization_model):
-            summaries_added_count += 1
-            summary_succeeded_this_run = True
-            # No need to add to summarized_codes_db here as we are iterating based on its absence
-        else:
-            logger.warning(f"{log_prefix} Summarization failed for '{paper_title}'.")
-            # Continue to the next paper, as fact extraction depends on successful summarization
-            continue
-
-        ## Task 2: Interesting Facts Extraction (only if summarization succeeded in this run)
-        if summary_succeeded_this_run and arxiv_code not in fact_extracted_codes_db:
-            logger.info(
-                f"{log_prefix} Attempting interesting facts extraction for '{paper_title}' (post-summarization)."
-            )
-            if extract_facts_for_paper(
-                arxiv_code, paper_title, paper_content, facts_model
-            ):
-                facts_added_count += 1
-                # fact_extracted_codes_db.add(arxiv_code) # Optionally update local set if needed for other logic (not strictly needed here)
-            else:
-                logger.warning(
-                    f"{log_prefix} Interesting facts extraction failed for '{paper_title}'."
-                )
-        elif arxiv_code in fact_extracted_codes_db:
+    counts = {"summarized": 0, "facts_only": 0, "facts": 0, "facts_failed": 0, "skipped": 0, "failed": 0}
+    start_time = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="d2_paper") as executor:
+        futures = {
+            executor.submit(
+                process_paper,
+                arxiv_code,
+                title_map.get(arxiv_code),
+                arxiv_code not in fact_extracted_codes_db,
+            ): arxiv_code
+            for arxiv_code in papers_needing_summarization
+        }
+        futures.update({
+            executor.submit(process_facts, arxiv_code, title_map.get(arxiv_code)): arxiv_code
+            for arxiv_code in papers_needing_facts
+        })
+        for done, future in enumerate(as_completed(futures), 1):
+            arxiv_code = futures[future]
+            try:
+                status, facts_stored = future.result()
+            except Exception as e:
+                logger.error(f"{arxiv_code}: processing failed: {e}")
+                status, facts_stored = "failed", False
+            counts[status] += 1
+            counts["facts"] += facts_stored
+            ## Summarized papers stored without facts are retried by the next run's facts-only pass.
+            wants_facts = arxiv_code not in fact_extracted_codes_db
+            if wants_facts and status in ("summarized", "facts_only") and not facts_stored:
+                counts["facts_failed"] += 1
+            elapsed = time.monotonic() - start_time
+            eta = elapsed / done * (total_papers_to_process - done)
             logger.info(
-                f"{log_prefix} Facts already exist for '{paper_title}'. Skipping fact extraction."
+                f"[{done}/{total_papers_to_process}] {arxiv_code}: {status}. "
+                f"Elapsed {elapsed / 60:.1f} min, ETA {eta / 60:.1f} min."
             )
-        # No explicit 'else' for failed summary here, as we 'continue' in that case above.
-
-        logger.info(f"{log_prefix} Finished processing '{paper_title}'.")
 
     logger.info(f"Combined paper processing completed.")
-    logger.info(f"Total summaries generated in this run: {summaries_added_count}.")
+    logger.info(f"Total summaries generated in this run: {counts['summarized']}.")
     logger.info(
-        f"Total sets of interesting facts generated in this run: {facts_added_count}."
+        f"Total sets of interesting facts generated in this run: {counts['facts']} "
+        f"({counts['facts_only']} papers in the facts-only pass, {counts['facts_failed']} failed)."
     )
+    logger.info(
+        f"Skipped {counts['skipped']} papers (missing inputs or already stored), "
+        f"{counts['failed']} failed."
+    )
+    for process_id, stats in prompt_cache_report(
+        ["summarize_full_document", "generate_paper_interesting_facts"]
+    ).items():
+        logger.info(
+            f"Prompt cache {process_id}: {stats['hit_ratio']:.1%} of input tokens read from cache "
+            f"({stats['cache_read_input_tokens']:,} read, "
+            f"{stats['cache_creation_input_tokens']:,} written, {stats['calls']} calls)."
+        )
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Summarize papers and extract facts")
+    parser.add_argument(
+        "--batch", action="store_true", help="Use the provider batch API (cheaper, slower)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Number of papers processed concurrently"
+    )
+    args = parser.parse_args()
+    main(batch=args.batch, workers=args.workers)
@@ -8,42 +8,12 @@ sys.path.append(PROJECT_PATH)
 
 os.chdir(PROJECT_PATH)
 
-import utils.vector_store as vs
-import utils.db.db_utils as db_utils
-import utils.db.paper_db as paper_db
-from utils.logging_utils import setup_logger
+## Narration now runs in the fused paper card stage; this keeps the old entry point.
+from workflow.e0_narrate_card import main as narrate_card
 
-logger = setup_logger(__name__, "e0_narrate.log")
 
 def main():
-    logger.info("Starting paper summary narration process.")
-    vs.validate_openai_env()
-
-    arxiv_codes = db_utils.get_arxiv_id_list("summary_notes")
-    title_map = db_utils.get_arxiv_title_dict()
-    done_codes = db_utils.get_arxiv_id_list("recursive_summaries")
-    arxiv_codes = list(set(arxiv_codes) - set(done_codes))
-    arxiv_codes = sorted(arxiv_codes)[::-1]
-    
-    total_papers = len(arxiv_codes)
-    logger.info(f"Found {total_papers} papers to narrate.")
-
-    for idx, arxiv_code in enumerate(arxiv_codes, 1):
-        paper_notes = paper_db.get_extended_notes(arxiv_code, expected_tokens=1200)
-        paper_title = title_map[arxiv_code]
-
-        logger.info(f"[{idx}/{total_papers}] Narrating: {arxiv_code} - '{paper_title}'")
-        narrative = vs.convert_notes_to_narrative(
-            paper_title, paper_notes, model="claude-3-7-sonnet-20250219"
-        )
-        
-        copywritten = vs.copywrite_summary(
-            paper_title, paper_notes, narrative, model="claude-3-7-sonnet-20250219"
-        )
-        
-        paper_db.insert_recursive_summary(arxiv_code, copywritten)
-
-    logger.info("Paper narration process completed.")
+    narrate_card(outputs=["narrative"])
 
 if __name__ == "__main__":
     main()
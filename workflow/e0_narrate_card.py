@@ -0,0 +1,199 @@
+import sys, os
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+PROJECT_PATH = os.getenv('PROJECT_PATH', '/app')
+load_dotenv(os.path.join(PROJECT_PATH, '.env'))
+sys.path.append(PROJECT_PATH)
+
+os.chdir(PROJECT_PATH)
+
+import utils.vector_store as vs
+import utils.db.db_utils as db_utils
+import utils.db.paper_db as paper_db
+from utils.instruct import run_instructor_batch
+from utils.llm_batch import BatchRequest
+from utils.logging_utils import setup_logger
+
+logger = setup_logger(__name__, "e0_narrate_card.log")
+
+llm_model = "claude-3-7-sonnet-20250219"
+
+## output: (table marking it done, notes token target)
+OUTPUTS = {
+    "narrative": ("recursive_summaries", 1200),
+    "bullets": ("bullet_list_summaries", 1200),
+    "punchline": ("summary_punchlines", 500),
+}
+## Outputs with a single LLM call, which can also go through the batch API.
+BATCH_QUERIES = {
+    "bullets": (vs.convert_notes_to_bullets_query, vs.parse_bullet_list),
+    "punchline": (vs.generate_paper_punchline_query, vs.parse_punchline),
+}
+
+executor = ThreadPoolExecutor(max_workers=len(OUTPUTS), thread_name_prefix="narrate_card")
+
+
+def narrate(paper_title, notes):
+    """Narrative from the notes, then its copywritten version (stored as the recursive summary)."""
+    narrative = vs.convert_notes_to_narrative(paper_title, notes, model=llm_model)
+    return vs.copywrite_summary(paper_title, notes, narrative, model=llm_model)
+
+
+def bullets(paper_title, notes):
+    return vs.convert_notes_to_bullets(paper_title, notes, model=llm_model)
+
+
+def punchline(paper_title, notes):
+    return vs.generate_paper_punchline(paper_title, notes, model=llm_model)
+
+
+GENERATORS = {"narrative": narrate, "bullets": bullets, "punchline": punchline}
+
+
+def store_outputs(arxiv_code, results):
+    """Write a paper's {output: text} in one transaction."""
+    if "bullets" in results:
+        results["bullets"] = results["bullets"].replace("\n\n", "\n")
+    return paper_db.insert_narrated_outputs(
+        arxiv_code,
+        recursive_summary=results.get("narrative"),
+        bullet_list=results.get("bullets"),
+        punchline=results.get("punchline"),
+    )
+
+
+def prefetch_notes(pending):
+    """{token target: {arxiv_code: notes}} for every pending paper, one query per target."""
+    targets = {}
+    for arxiv_code, outputs in pending.items():
+        for output in outputs:
+            targets.setdefault(OUTPUTS[output][1], []).append(arxiv_code)
+    return {
+        expected_tokens: paper_db.get_extended_notes(
+            sorted(set(arxiv_codes)), expected_tokens=expected_tokens
+        )
+        for expected_tokens, arxiv_codes in targets.items()
+    }
+
+
+def narrate_paper(arxiv_code, paper_title, outputs, notes):
+    """Generate the requested outputs concurrently from prefetched notes and store them.
+
+    An output that fails is logged and left for the next run; the others are still stored.
+    """
+    futures = {
+        output: executor.submit(
+            GENERATORS[output], paper_title, notes[OUTPUTS[output][1]].get(arxiv_code)
+        )
+        for output in outputs
+    }
+    results = {}
+    for output, future in futures.items():
+        try:
+            results[output] = future.result()
+        except Exception as e:
+            logger.warning(f"{arxiv_code}: {output} generation failed: {e}")
+    if not results:
+        return []
+    return store_outputs(arxiv_code, results)
+
+
+def pending_outputs(outputs):
+    """{arxiv_code: [outputs still missing]} over papers with summary notes, newest first."""
+    arxiv_codes = set(db_utils.get_arxiv_id_list("summary_notes"))
+    done = {
+        output: set(db_utils.get_arxiv_id_list(OUTPUTS[output][0]))
+        for output in outputs
+    }
+    pending = {}
+    for arxiv_code in sorted(arxiv_codes, reverse=True):
+        missing = [output for output in outputs if arxiv_code not in done[output]]
+        if missing:
+            pending[arxiv_code] = missing
+    return pending
+
+
+def run_batch(pending, title_map, notes, wait: bool = True):
+    """Submit the batchable outputs of every pending paper and store finished results per paper."""
+    results = {}
+    for output, (query_fn, parse_fn) in BATCH_QUERIES.items():
+        requests = [
+            BatchRequest(
+                key=arxiv_code,
+                **query_fn(
+                    title_map[arxiv_code],
+                    notes[OUTPUTS[output][1]].get(arxiv_code),
+                    model=llm_model,
+                ),
+            )
+            for arxiv_code, outputs in pending.items()
+            if output in outputs
+        ]
+        if not requests:
+            continue
+        ## Stage names are kept from the standalone scripts so in-flight jobs are still collected.
+        stage = "e1_narrate_bullet" if output == "bullets" else "e2_narrate_punchline"
+        for arxiv_code, result in run_instructor_batch(stage, requests, wait=wait).items():
+            if result.error is None:
+                results.setdefault(arxiv_code, {})[output] = parse_fn(result.response)
+
+    for arxiv_code, paper_results in results.items():
+        store_outputs(arxiv_code, paper_results)
+    logger.info(f"Stored batch results for {len(results)}/{len(pending)} papers")
+
+
+def main(outputs=None, batch: bool = False, wait: bool = True):
+    outputs = list(outputs or OUTPUTS)
+    logger.info(f"Starting paper card narration: {', '.join(outputs)}.")
+    vs.validate_openai_env()
+
+    title_map = db_utils.get_arxiv_title_dict()
+    pending = pending_outputs(outputs)
+    total_papers = len(pending)
+    logger.info(f"Found {total_papers} papers with missing outputs.")
+    notes = prefetch_notes(pending)
+
+    if batch:
+        run_batch(pending, title_map, notes, wait)
+        ## The narrative chains two calls, so it always runs online.
+        pending = {
+            arxiv_code: ["narrative"]
+            for arxiv_code, missing in pending.items()
+            if "narrative" in missing
+        }
+        total_papers = len(pending)
+
+    for idx, (arxiv_code, missing) in enumerate(pending.items(), 1):
+        paper_title = title_map[arxiv_code]
+        logger.info(f"[{idx}/{total_papers}] Narrating {', '.join(missing)}: {arxiv_code} - '{paper_title}'")
+        written = narrate_paper(arxiv_code, paper_title, missing, notes)
+        logger.info(f"[{idx}/{total_papers}] Stored {len(written)}/{len(missing)} outputs for {arxiv_code}")
+
+    logger.info("Paper card narration completed.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate narrative, bullet list and punchline for papers with summary notes"
+    )
+    parser.add_argument(
+        "--outputs",
+        nargs="+",
+        choices=list(OUTPUTS),
+        default=list(OUTPUTS),
+        help="Outputs to generate",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Use the provider batch API for bullets and punchlines (cheaper, slower)",
+    )
+    parser.add_argument(
+        "--no-wait",
+        action="store_true",
+        help="With --batch, store finished jobs and exit instead of polling",
+    )
+    args = parser.parse_args()
+    main(outputs=args.outputs, batch=args.batch, wait=not args.no_wait)
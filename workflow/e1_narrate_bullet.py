@@ -1,5 +1,5 @@
 import sys, os
-import pandas as pd
+import argparse
 from dotenv import load_dotenv
 
 PROJECT_PATH = os.getenv('PROJECT_PATH', '/app')
@@ -8,39 +8,23 @@ sys.path.append(PROJECT_PATH)
 
 os.chdir(PROJECT_PATH)
 
-import utils.vector_store as vs
-import utils.db.db_utils as db_utils
-import utils.db.paper_db as paper_db
-from utils.logging_utils import setup_logger
+## Runs only the bullets output of the fused paper card stage (workflow/e0_narrate_card.py).
+from workflow.e0_narrate_card import main as narrate_card
 
-logger = setup_logger(__name__, "e1_narrate_bullet.log")
 
-def main():
-    logger.info("Starting bullet list narration process")
-    vs.validate_openai_env()
+def main(batch: bool = False, wait: bool = True):
+    narrate_card(outputs=["bullets"], batch=batch, wait=wait)
 
-    arxiv_codes = db_utils.get_arxiv_id_list("summary_notes")
-    title_map = db_utils.get_arxiv_title_dict()
-    done_codes = db_utils.get_arxiv_id_list("bullet_list_summaries")
-    arxiv_codes = list(set(arxiv_codes) - set(done_codes))
-    arxiv_codes = sorted(arxiv_codes)[::-1]
-
-    total_papers = len(arxiv_codes)
-    logger.info(f"Found {total_papers} papers to process for bullet list summaries")
-
-    for idx, arxiv_code in enumerate(arxiv_codes, 1):
-        paper_notes = paper_db.get_extended_notes(arxiv_code, expected_tokens=1200)
-        paper_title = title_map[arxiv_code]
-
-        bullet_list = vs.convert_notes_to_bullets(
-            paper_title, paper_notes, model="claude-3-7-sonnet-20250219"
-        )
-        bullet_list = bullet_list.replace("\n\n", "\n")
-        
-        paper_db.insert_bullet_list_summary(arxiv_code, bullet_list)
-        logger.info(f"[{idx}/{total_papers}] Stored bullet list: {arxiv_code} - '{paper_title}'")
-
-    logger.info("Bullet list narration process completed")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate bullet list summaries")
+    parser.add_argument(
+        "--batch", action="store_true", help="Use the provider batch API (cheaper, slower)"
+    )
+    parser.add_argument(
+        "--no-wait",
+        action="store_true",
+        help="With --batch, store finished jobs and exit instead of polling",
+    )
+    args = parser.parse_args()
+    main(batch=args.batch, wait=not args.no_wait)
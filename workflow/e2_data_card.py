@@ -20,9 +20,12 @@ def main():
     arxiv_codes = list(set(arxiv_codes) - set(done_codes))
     arxiv_codes = sorted(arxiv_codes)[::-1][:20]
 
+    title_map = db_utils.get_arxiv_title_dict()
+    notes_map = paper_db.get_extended_notes(arxiv_codes, expected_tokens=3000)
+
     for arxiv_code in arxiv_codes:
-        title = paper_db.get_arxiv_title_dict()[arxiv_code]
-        content = paper_db.get_extended_notes(arxiv_code, expected_tokens=3000)
+        title = title_map[arxiv_code]
+        content = notes_map.get(arxiv_code)
         res_str = run_instructor_query(
             p.DATA_CARD_SYSTEM_PROMPT,
             p.PDATA_CARD_USER_PROMPT.format(title=title, content=content),
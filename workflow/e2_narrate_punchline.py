@@ -1,5 +1,5 @@
 import sys, os
-import pandas as pd
+import argparse
 from dotenv import load_dotenv
 
 PROJECT_PATH = os.getenv('PROJECT_PATH', '/app')
@@ -8,45 +8,23 @@ sys.path.append(PROJECT_PATH)
 
 os.chdir(PROJECT_PATH)
 
-import utils.vector_store as vs
-import utils.db.db_utils as db_utils
-import utils.db.paper_db as paper_db
-from utils.logging_utils import setup_logger
+## Runs only the punchline output of the fused paper card stage (workflow/e0_narrate_card.py).
+from workflow.e0_narrate_card import main as narrate_card
 
-logger = setup_logger(__name__, "e2_narrate_punchline.log")
 
-
-def main():
-    logger.info("Starting punchline generation process")
-    vs.validate_openai_env()
-
-    arxiv_codes = db_utils.get_arxiv_id_list("summary_notes")
-    title_map = db_utils.get_arxiv_title_dict()
-    done_codes = db_utils.get_arxiv_id_list("summary_punchlines")
-    arxiv_codes = list(set(arxiv_codes) - set(done_codes))
-    arxiv_codes = sorted(arxiv_codes)[::-1]
-
-    logger.info(f"Found {len(arxiv_codes)} papers to process for punchline summaries")
-
-    for arxiv_code in arxiv_codes:
-        paper_notes = paper_db.get_extended_notes(arxiv_code, expected_tokens=500)
-        paper_title = title_map[arxiv_code]
-
-        logger.info(f"Generating punchline for: {arxiv_code} - '{paper_title}'")
-        punchline = vs.generate_paper_punchline(
-            paper_title, paper_notes, model="claude-3-7-sonnet-20250219"
-        )
-
-        data = {
-            "arxiv_code": arxiv_code,
-            "punchline": punchline,
-            "tstp": pd.Timestamp.now(),
-        }
-        df = pd.DataFrame([data])
-        db_utils.upload_dataframe(df, "summary_punchlines")
-
-    logger.info("Punchline generation process completed")
+def main(batch: bool = False, wait: bool = True):
+    narrate_card(outputs=["punchline"], batch=batch, wait=wait)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate paper punchlines")
+    parser.add_argument(
+        "--batch", action="store_true", help="Use the provider batch API (cheaper, slower)"
+    )
+    parser.add_argument(
+        "--no-wait",
+        action="store_true",
+        help="With --batch, store finished jobs and exit instead of polling",
+    )
+    args = parser.parse_args()
+    main(batch=args.batch, wait=not args.no_wait)
@@ -37,10 +37,11 @@ def main():
     logger.info(f"Found {total_papers} papers to review")
     
     title_map = db_utils.get_arxiv_title_dict()
+    notes_map = paper_db.get_extended_notes(arxiv_codes, expected_tokens=4000)
 
     for idx, arxiv_code in enumerate(arxiv_codes, 1):
         paper_title = title_map.get(arxiv_code, "Unknown Title")
-        new_content = paper_db.get_extended_notes(arxiv_code, expected_tokens=4000)
+        new_content = notes_map.get(arxiv_code)
 
         ## Try to run LLM process up to 3 times.
         logger.info(f"[{idx}/{total_papers}] Reviewing: {arxiv_code} - '{paper_title}'")
@@ -1,6 +1,7 @@
 import json
 import sys, os
 import pandas as pd
+import numpy as np
 import warnings
 from dotenv import load_dotenv
 import voyageai
@@ -16,6 +17,7 @@ warnings.filterwarnings("ignore")
 from sentence_transformers import SentenceTransformer
 import utils.db.embedding_db as embedding_db
 import utils.db.paper_db as paper_db
+import utils.db.answer_cache_db as answer_cache_db
 from utils.logging_utils import setup_logger
 
 logger = setup_logger(__name__, "i0_generate_embeddings.log")
@@ -82,16 +84,14 @@ def process_and_store_batch(
     else:
         batch_embeddings = embedding_model.encode(batch_content)
 
-    ## Convert embeddings to list format.
-    embeddings_list = [
-        emb.tolist() if hasattr(emb, "tolist") else emb for emb in batch_embeddings
-    ]
+    ## Convert embeddings to a float32 matrix for binary transport.
+    embeddings_matrix = np.asarray(batch_embeddings, dtype=np.float32)
 
     embedding_db.store_embeddings_batch(
         arxiv_codes=list(batch_df.index),
         doc_type=doc_type,
         embedding_type=embedding_type,
-        embeddings=embeddings_list,
+        embeddings=embeddings_matrix,
     )
 
     all_content.extend(batch_content)
@@ -193,6 +193,17 @@ def main():
                     )
                     raise
 
+            ## New abstracts may make cached Q&A answers on their topic stale.
+            ## The cache is optional, so a failure here must not stop embedding generation.
+            if embedding_type == "voyage" and doc_type == "abstract":
+                try:
+                    answer_cache_db.invalidate_cached_answers(
+                        list(df_to_process.index), embedding_type=embedding_type
+                    )
+                    logger.info(f"Invalidated cached answers related to {len(df_to_process)} new papers")
+                except Exception as e:
+                    logger.warning(f"Could not invalidate cached answers: {e}")
+
             if content_by_type[doc_type]:
                 content_path = os.path.join(
                     PROJECT_PATH,
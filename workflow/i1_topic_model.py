@@ -187,6 +187,7 @@ def store_topics_and_embeddings(
         df[["arxiv_code", "topic", "dim1", "dim2"]],
         "topics",
         if_exists=if_exists_policy,
+        method="copy",
     )
 
 def create_and_fit_topic_model(
@@ -268,20 +269,21 @@ def main():
     df.set_index("arxiv_code", inplace=True)
     
     ## Load embeddings and generate content.
-    embeddings_map = embedding_db.load_embeddings(
-        arxiv_codes=list(df.index),
+    cached_embeddings, cached_codes = embedding_db.load_cached_embedding_matrix(
         doc_type=doc_type,
         embedding_type=embedding_type,
     )
+    positions = [i for i, code in enumerate(cached_codes) if code in df.index]
+    embeddings = np.asarray(cached_embeddings[positions])
+    arxiv_codes = [cached_codes[i] for i in positions]
 
     all_content = df[doc_type].to_dict()
 
     ## Align content and embeddings.
-    arxiv_codes = list(embeddings_map.keys())
+    df = df.loc[arxiv_codes]
     all_content = [all_content[code] for code in arxiv_codes]
-    embeddings = np.array([np.array(embeddings_map[code])for code in arxiv_codes])
     
-    logger.info(f"Loaded {len(embeddings_map)} embeddings and corresponding content")
+    logger.info(f"Loaded {len(arxiv_codes)} embeddings and corresponding content")
 
     topic_model, topics, reduced_embeddings, reduced_model = create_and_fit_topic_model(
         all_content, embeddings, refit=REFIT
@@ -2,7 +2,7 @@ import sys, os
 import pandas as pd
 from dotenv import load_dotenv
 import numpy as np
-from sklearn.neighbors import NearestNeighbors
+from sqlalchemy import text
 
 PROJECT_PATH = os.getenv('PROJECT_PATH', '/app')
 load_dotenv(os.path.join(PROJECT_PATH, '.env'))
@@ -14,6 +14,8 @@ import utils.paper_utils as pu
 import utils.db.db_utils as db_utils
 import utils.db.paper_db as paper_db
 import utils.db.embedding_db as embedding_db
+from utils.hnsw_index import HNSWIndex
+from utils.similarity import top_k_neighbors
 from utils.logging_utils import setup_logger
 logger = setup_logger(__name__, "i2_similar_docs.log")
 
@@ -21,6 +23,92 @@ logger = setup_logger(__name__, "i2_similar_docs.log")
 EMBEDDING_TYPE = "nv"
 DOC_TYPE = "recursive_summary"
 
+## Neighbour configuration.
+REBUILD = False
+N_NEIGHBORS = 10
+CANDIDATE_POOL = 50
+INDEX_PATH = os.path.join(PROJECT_PATH, "data", f"similar_docs_hnsw_{EMBEDDING_TYPE}_{DOC_TYPE}.pkl")
+
+
+def search_neighbors(index: HNSWIndex, code: str, k: int) -> list[tuple[str, float]]:
+    """Get up to `k` (code, cosine score) neighbours of an indexed paper, excluding itself."""
+    cand_ids, cand_dists = index.search(index.vector(code), k + 1)
+    return [(c, 1.0 - float(d)) for c, d in zip(cand_ids, cand_dists) if c != code][:k]
+
+
+def update_neighbors(
+    index: HNSWIndex, new_codes: list[str], current: dict[str, list[str]]
+) -> dict[str, list[tuple[str, float]]]:
+    """Get (code, cosine score) neighbour lists for new (or re-embedded) papers plus existing papers whose top-k they enter."""
+    new_set = set(new_codes)
+    updated: dict[str, list[tuple[str, float]]] = {}
+    for code in new_codes:
+        pairs = search_neighbors(index, code, CANDIDATE_POOL)
+        updated[code] = pairs[:N_NEIGHBORS]
+
+        ## Cosine similarity is symmetric, so only papers near the new one can gain it as a neighbour.
+        for other, score in pairs:
+            if other in new_set:
+                continue
+            ## The paper may already be listed (re-embedded, or found by a fresh search); re-rank it.
+            if other in updated:
+                other_pairs = [(c, s) for c, s in updated[other] if c != code]
+            else:
+                other_vec = index.vector(other)
+                other_pairs = [
+                    (c, float(index.vector(c) @ other_vec))
+                    for c in current.get(other, []) if c in index and c != code
+                ]
+                ## No row, or neighbours gone from the index: a short list can't be
+                ## merged into, so search afresh (the new paper is already indexed).
+                if len(other_pairs) < N_NEIGHBORS:
+                    updated[other] = search_neighbors(index, other, N_NEIGHBORS)
+                    continue
+            if len(other_pairs) >= N_NEIGHBORS and score <= min(s for _, s in other_pairs):
+                continue
+            merged = sorted(other_pairs + [(code, score)], key=lambda x: -x[1])
+            updated[other] = merged[:N_NEIGHBORS]
+    return updated
+
+
+def changed_embeddings(index: HNSWIndex, embeddings: np.ndarray, positions: dict[str, int]) -> list[str]:
+    """Get indexed codes whose embedding no longer matches the vector stored in the index."""
+    codes = [code for code in index.ids if code in positions]
+    if not codes:
+        return []
+    current = embeddings[[positions[code] for code in codes]].astype(np.float32)
+    current /= np.maximum(np.linalg.norm(current, axis=1, keepdims=True), 1e-12)
+    stored = index.vectors[[index.id_to_node[code] for code in codes]]
+    drift = 1.0 - np.einsum("ij,ij->i", current, stored)
+    return [code for code, d in zip(codes, drift) if d > 1e-5]
+
+
+def upload_neighbors(neighbors: dict[str, list[tuple[str, float]]], replace: bool) -> None:
+    """Write neighbour lists and scores, replacing every row or only the changed ones.
+
+    Rows are swapped in one transaction, so readers never see them missing, and
+    the table is never recreated, which keeps `similar_scores` a real[] column
+    (see sql/add_similar_scores.sql).
+    """
+    df = pd.DataFrame({
+        "arxiv_code": list(neighbors.keys()),
+        "similar_docs": [[c for c, _ in pairs] for pairs in neighbors.values()],
+        "similar_scores": [[round(s, 4) for _, s in pairs] for pairs in neighbors.values()],
+    })
+    df["similar_docs"] = df["similar_docs"].apply(db_utils.list_to_pg_array)
+    df["similar_scores"] = df["similar_scores"].apply(db_utils.list_to_pg_array)
+    df = df[["arxiv_code", "similar_docs", "similar_scores"]]
+    with db_utils.get_engine().begin() as conn:
+        if replace:
+            conn.execute(text("DELETE FROM similar_documents"))
+        else:
+            conn.execute(
+                text("DELETE FROM similar_documents WHERE arxiv_code = ANY(:codes)"),
+                {"codes": df["arxiv_code"].tolist()},
+            )
+        db_utils.copy_dataframe(conn, df, "similar_documents")
+
+
 def main():
     """Main function."""
     logger.info("Starting similar document finding process")
@@ -29,39 +117,59 @@ def main():
     arxiv_codes = arxiv_df.index.tolist()
     logger.info(f"Found {len(arxiv_codes)} papers to process")
 
-    embeddings_map = embedding_db.load_embeddings(
-        arxiv_codes=arxiv_codes,
+    ## Load document IDs and the row-aligned embeddings matrix (local cache, synced incrementally).
+    embeddings, doc_ids = embedding_db.load_cached_embedding_matrix(
         doc_type=DOC_TYPE,
         embedding_type=EMBEDDING_TYPE,
     )
-    logger.info(f"Loaded {len(embeddings_map)} embeddings")
-    
-    ## Build a list of document IDs and an embeddings matrix.
-    doc_ids: list[str] = list(embeddings_map.keys())
-    embeddings: np.ndarray = np.array([embeddings_map[doc_id] for doc_id in doc_ids])
-
-    ## Use NearestNeighbors with one extra neighbor to skip the self-match.
-    nbrs: NearestNeighbors = NearestNeighbors(n_neighbors=11, metric="euclidean")
-    nbrs.fit(embeddings)
-    distances, indices = nbrs.kneighbors(embeddings)
-
-    ## Build list of similar document IDs for each paper.
-    similar_docs_list: list[list[str]] = []
-    for i, neighbor_indices in enumerate(indices):
-        ## Skip first neighbor (it is self).
-        similar_docs = [doc_ids[j] for j in neighbor_indices[1:]]
-        similar_docs_list.append(similar_docs)
-
-    df = pd.DataFrame({"arxiv_code": doc_ids, "similar_docs": similar_docs_list})
-    
-    df["similar_docs"] = df["similar_docs"].apply(db_utils.list_to_pg_array)
-    
-    logger.info("Uploading similar documents to database")
-    db_utils.upload_dataframe(
-        df[["arxiv_code", "similar_docs"]],
-        "similar_documents",
-        if_exists="replace",
-    )
+    known_codes = set(arxiv_codes)
+    if not all(code in known_codes for code in doc_ids):
+        keep = [i for i, code in enumerate(doc_ids) if code in known_codes]
+        embeddings = embeddings[keep]
+        doc_ids = [doc_ids[i] for i in keep]
+    logger.info(f"Loaded {len(doc_ids)} embeddings")
+
+    ## Reuse the persisted index unless papers were removed or a rebuild is forced.
+    index = None
+    if not REBUILD and os.path.exists(INDEX_PATH):
+        index = HNSWIndex.load(INDEX_PATH)
+        if not set(index.ids).issubset(doc_ids):
+            logger.info("Index contains removed papers, rebuilding")
+            index = None
+
+    if index is None:
+        logger.info("Building similarity index from scratch")
+        index = HNSWIndex(dimension=embeddings.shape[1])
+        index.add_batch(embeddings, doc_ids)
+        ## NV embeddings are stored unit-normalised, so skip the normalising copy.
+        neighbors = top_k_neighbors(embeddings, doc_ids, k=N_NEIGHBORS, normalized=True)
+        replace = True
+    else:
+        positions = {code: i for i, code in enumerate(doc_ids)}
+        new_codes = [code for code in doc_ids if code not in index]
+        changed_codes = changed_embeddings(index, embeddings, positions)
+        if not new_codes and not changed_codes:
+            logger.info("No new or re-embedded papers to index")
+            return
+        logger.info(
+            f"Inserting {len(new_codes)} new and updating {len(changed_codes)} re-embedded papers in the index"
+        )
+        for code in new_codes:
+            index.add(embeddings[positions[code]], code)
+        for code in changed_codes:
+            index.update(embeddings[positions[code]], code)
+        current = paper_db.load_similar_documents()
+        current = current["similar_docs"].to_dict() if not current.empty else {}
+        ## Papers listing a re-embedded one hold a stale score for it, so re-search them too.
+        changed = set(changed_codes)
+        stale = [code for code, docs in current.items() if code in index and changed & set(docs)]
+        neighbors = update_neighbors(index, list(dict.fromkeys(new_codes + changed_codes + stale)), current)
+        replace = False
+
+    logger.info(f"Uploading {len(neighbors)} similar document rows to database")
+    upload_neighbors(neighbors, replace=replace)
+    os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+    index.save(INDEX_PATH)
     logger.info("Similar document finding process completed")
 
 if __name__ == "__main__":
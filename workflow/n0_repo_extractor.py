@@ -1,4 +1,5 @@
 import sys, os
+import argparse
 import pandas as pd
 from dotenv import load_dotenv
 from tqdm import tqdm
@@ -15,12 +16,67 @@ import utils.vector_store as vs
 import utils.db.db_utils as db_utils
 import utils.db.paper_db as paper_db
 import utils.paper_utils as pu
+from utils.instruct import run_instructor_batch
+from utils.llm_batch import BatchRequest
 from utils.logging_utils import setup_logger
 
 logger = setup_logger(__name__, "n0_repo_extractor.log")
 
+llm_model = "claude-3-7-sonnet-20250219"
 
-def main():
+# Define URL pattern to match any web links
+url_pattern = r"https?://[^\s<>\[\]]+|www\.[^\s<>\[\]]+"
+
+
+def empty_resource(arxiv_code: str) -> dict:
+    return {"arxiv_code": arxiv_code, "url": None, "title": None, "description": None}
+
+
+def store_resources(external_resources: list) -> None:
+    weekly_repos_df = pd.DataFrame(external_resources)
+    weekly_repos_df["tstp"] = pd.Timestamp.now()
+    db_utils.upload_dataframe(weekly_repos_df, "arxiv_repos")
+
+
+def run_batch(pending_arxiv_codes, wait: bool = True):
+    """Papers with links go to one batch job; the rest are stored as repo-less right away."""
+    requests, external_resources = [], []
+    content_map = paper_db.get_extended_content(pending_arxiv_codes)
+    for arxiv_code in pending_arxiv_codes:
+        content_df = content_map.get(arxiv_code)
+        if content_df is None:
+            continue
+        paper_markdown = pu.format_paper_summary(content_df.iloc[0])
+        if re.search(url_pattern, paper_markdown):
+            requests.append(
+                BatchRequest(
+                    key=arxiv_code,
+                    **vs.extract_document_repo_query(paper_markdown, llm_model=llm_model),
+                )
+            )
+        else:
+            external_resources.append(empty_resource(arxiv_code))
+
+    results = run_instructor_batch("n0_repo_extractor", requests, wait=wait)
+    for arxiv_code, result in results.items():
+        if result.error is not None:
+            continue
+        resources = result.response.resources
+        for r in resources:
+            r.arxiv_code = arxiv_code
+        external_resources.extend(
+            [r.model_dump() for r in resources] or [empty_resource(arxiv_code)]
+        )
+
+    if external_resources:
+        store_resources(external_resources)
+    logger.info(
+        f"Stored repos for {len({r['arxiv_code'] for r in external_resources})} papers "
+        f"({len(results)}/{len(requests)} batch results)"
+    )
+
+
+def main(batch: bool = False, wait: bool = True):
     vs.validate_openai_env()
 
     logger.info("Starting repo extraction process.")
@@ -33,16 +89,19 @@ def main():
     total_papers = len(pending_arxiv_codes)
     logger.info(f"Found {total_papers} papers to process for repo extraction")
 
+    if batch:
+        run_batch(pending_arxiv_codes, wait)
+        logger.info("Repo extraction process completed.")
+        return
+
     title_map = db_utils.get_arxiv_title_dict()
     external_resources = []
-
-    # Define URL pattern to match any web links
-    url_pattern = r"https?://[^\s<>\[\]]+|www\.[^\s<>\[\]]+"
+    content_map = paper_db.get_extended_content(pending_arxiv_codes)
 
     for idx, arxiv_code in enumerate(pending_arxiv_codes, 1):
         paper_title = title_map.get(arxiv_code, "Unknown Title")
-        content_df = paper_db.get_extended_content(arxiv_code)
-        if len(content_df) == 0:
+        content_df = content_map.get(arxiv_code)
+        if content_df is None:
             logger.warning(
                 f"[{idx}/{total_papers}] No content found: {arxiv_code} - '{paper_title}'"
             )
@@ -55,7 +114,7 @@ def main():
 
         if has_urls:
             tmp_resources = vs.extract_document_repo(
-                paper_markdown, llm_model="claude-3-7-sonnet-20250219"
+                paper_markdown, llm_model=llm_model
             )
             for r in tmp_resources.resources:
                 r.arxiv_code = arxiv_code
@@ -90,13 +149,21 @@ def main():
                 f"[{idx}/{total_papers}] No repos found: {arxiv_code} - '{paper_title}'"
             )
 
-        weekly_repos_df = pd.DataFrame(external_resources)
-        weekly_repos_df["tstp"] = pd.Timestamp.now()
-        db_utils.upload_dataframe(weekly_repos_df, "arxiv_repos")
+        store_resources(external_resources)
         external_resources.clear()
 
     logger.info("Repo extraction process completed.")
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Extract repositories from papers")
+    parser.add_argument(
+        "--batch", action="store_true", help="Use the provider batch API (cheaper, slower)"
+    )
+    parser.add_argument(
+        "--no-wait",
+        action="store_true",
+        help="With --batch, store finished jobs and exit instead of polling",
+    )
+    args = parser.parse_args()
+    main(batch=args.batch, wait=not args.no_wait)
@@ -85,8 +85,8 @@ def find_related_content(tweet_text: str) -> str:
         show_only_sources=False,
         max_sources=25,
         query_llm_model="gemini/gemini-2.5-pro-preview-05-06",
-        rerank_llm_model="gemini/gemini-2.0-flash",
         response_llm_model="gemini/gemini-2.5-pro-preview-05-06",
+        reranker="embedding",
     )
 
     llmpedia_analysis = result[0]